@@ -0,0 +1,110 @@
+"""
+Built-in Renderer and Exporter Backends
+Stage implementations behind the plugin registry. Each imports its heavy dependencies
+(PIL, matplotlib, python-docx) inside the function, so listing or selecting other
+backends never pays for them.
+"""
+
+import os
+
+
+def _write_text(path, content):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    return path
+
+
+def _write_document(name, questions, path):
+    from document_writer import write_document_files
+    write_document_files(questions, {name: path})
+    return [path]
+
+
+# Renderers: (output_dir) -> list of image paths
+
+def render_question_images(output_dir):
+    from generate_questions import MathQuestionGenerator
+    from render_cache import write_if_changed
+
+    generator = MathQuestionGenerator()
+    os.makedirs(output_dir, exist_ok=True)
+    paths = [os.path.join(output_dir, "lunch_special_menu.png"),
+             os.path.join(output_dir, "tennis_ball_container.png")]
+    write_if_changed(paths[0], generator.question_image_1_png())
+    write_if_changed(paths[1], generator.question_image_2_png())
+    return paths
+
+
+def render_container_matplotlib(output_dir):
+    from generate_questions import MathQuestionGenerator
+    from render_cache import write_if_changed
+
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, "tennis_ball_container.png")
+    write_if_changed(path, MathQuestionGenerator().question_image_2_png(renderer="matplotlib"))
+    return [path]
+
+
+def render_simple_images(output_dir):
+    from image_generator import SimpleImageGenerator
+
+    return SimpleImageGenerator(output_dir=output_dir).create_all_images()
+
+
+# Exporters: (questions, generator, output_dir) -> list of written paths
+
+def export_format(questions, generator, output_dir):
+    from document_writer import QuestionFormat, write_document_files
+    path = os.path.join(output_dir, "questions_formatted.txt")
+    write_document_files(questions, {QuestionFormat(generator.format_question_output): path})
+    return [path]
+
+
+def export_markdown(questions, generator, output_dir):
+    return _write_document("markdown", questions, os.path.join(output_dir, "Math_Questions_Assessment.md"))
+
+
+def export_text(questions, generator, output_dir):
+    return _write_document("text", questions, os.path.join(output_dir, "Math_Questions_Assessment.txt"))
+
+
+def export_word_text(questions, generator, output_dir):
+    return _write_document("word-like", questions,
+                           os.path.join(output_dir, "Math_Questions_Assessment_Word_Format.txt"))
+
+
+def export_curriculum(questions, generator, output_dir):
+    from final_generator import FinalMathQuestionGenerator
+    content = FinalMathQuestionGenerator().create_curriculum_analysis()
+    return [_write_text(os.path.join(output_dir, "Curriculum_Analysis.txt"), content)]
+
+
+def export_comprehensive(questions, generator, output_dir):
+    return _write_document("comprehensive", questions,
+                           os.path.join(output_dir, "Final_Comprehensive_Assessment.txt"))
+
+
+def export_docx(questions, generator, output_dir):
+    from docx_writer import write_docx
+    path = os.path.join(output_dir, "Math_Questions_Assessment.docx")
+    write_docx(questions, path)
+    return [path]
+
+
+def export_python_docx(questions, generator, output_dir):
+    if not hasattr(generator, "create_word_document"):
+        # Only the full generator builds Word documents; the text-only ones borrow its builder
+        from generate_questions import MathQuestionGenerator
+        generator = MathQuestionGenerator()
+    path = os.path.join(output_dir, "Math_Questions_Assessment.docx")
+    generator.create_word_document(questions).save(path)
+    return [path]
+
+
+def export_bank(questions, generator, output_dir):
+    from question_bank import QuestionBank
+    path = os.path.join(output_dir, "question_bank")
+    bank = QuestionBank()
+    bank.append(questions)
+    bank.save(path)
+    return [path]
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Batch Diagram Rendering
+Spreads a stream of diagram render jobs over a process pool in chunks. Workers encode
+PNGs and write them to disk themselves, so only paths or PNG bytes travel back to the
+parent, never PIL images.
+"""
+
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import chain, islice
+from typing import NamedTuple
+
+from render_cache import RENDER_CACHE_DIR, RenderCache, write_if_changed
+
+
+class RenderJob(NamedTuple):
+    """One diagram to render.
+
+    `render` must be importable by name (a module-level function or a staticmethod) so
+    that it pickles as a reference. With a `path` the PNG is written there and the path
+    is returned; without one the PNG bytes are returned.
+    """
+    kind: str
+    params: dict
+    render: object
+    version: int = 1
+    path: str = None
+
+
+_worker_cache = None    # per-process RenderCache, set up by _init_worker
+
+
+def _init_worker(cache_dir):
+    global _worker_cache
+    _worker_cache = RenderCache(cache_dir) if cache_dir else None
+
+
+def render_job(job, cache):
+    """Render one job through cache (or directly when cache is None); returns its path or PNG bytes"""
+    if cache is not None:
+        png = cache.get_or_render(job.kind, job.params, job.render, job.version)
+    else:
+        png = RenderCache.encode(job.render(**job.params))
+    if job.path is None:
+        return png
+    write_if_changed(job.path, png)
+    return job.path
+
+
+def _render_chunk(chunk):
+    """Worker entry point: render a list of (index, job) pairs"""
+    return [(index, render_job(job, _worker_cache)) for index, job in chunk]
+
+
+def _chunks(jobs, chunk_size):
+    numbered = enumerate(jobs)
+    while True:
+        chunk = list(islice(numbered, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def render_batch(jobs, workers=None, chunk_size=8, ordered=True, cache_dir=RENDER_CACHE_DIR,
+                 max_pending=None):
+    """Render an iterable of RenderJobs across a process pool, yielding (job index, path or PNG bytes).
+
+    Jobs are read lazily and dispatched `chunk_size` at a time, with at most `max_pending`
+    chunks in flight (default: four per worker), so arbitrarily long streams run in
+    bounded memory. With ordered=False results are yielded as chunks finish. Pass
+    cache_dir=None to bypass the render cache. A batch that fits in one chunk, or
+    workers=1, is rendered in this process without starting a pool.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 4 * workers
+    chunks = _chunks(jobs, chunk_size)
+    first = next(chunks, None)
+    if first is None:
+        return
+    second = next(chunks, None)
+    if second is None or workers == 1:
+        cache = RenderCache(cache_dir) if cache_dir else None
+        for chunk in chain([first], [second] if second else [], chunks):
+            for index, job in chunk:
+                yield index, render_job(job, cache)
+        return
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(cache_dir,)) as pool:
+        in_flight = deque()
+        for chunk in chain([first, second], chunks):
+            if len(in_flight) >= max_pending:
+                yield from _drain(in_flight, ordered)
+            in_flight.append(pool.submit(_render_chunk, chunk))
+        while in_flight:
+            yield from _drain(in_flight, ordered)
+
+
+def _drain(in_flight, ordered):
+    """Wait for the oldest chunk (ordered) or any chunk (unordered) and yield its results"""
+    if ordered:
+        yield from in_flight.popleft().result()
+        return
+    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+    for future in done:
+        in_flight.remove(future)
+        yield from future.result()
+
+
+def render_all(jobs, **options):
+    """Render every job and return the results in job order"""
+    return [result for _, result in render_batch(jobs, ordered=True, **options)]
+
+
+def main():
+    """Render the container diagram of every packing variant and report throughput"""
+    from diagrams import draw_packing_top_view
+    from packing import PackingVariants
+
+    parser = argparse.ArgumentParser(description="Benchmark batch diagram rendering")
+    parser.add_argument("--repeat", type=int, default=10, help="render the packing grid this many times")
+    parser.add_argument("--workers", type=int, nargs="*", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--chunk-size", type=int, default=8)
+    parser.add_argument("--unordered", action="store_true")
+    args = parser.parse_args()
+
+    batch = PackingVariants().enumerate()
+    params = [batch.diagram_params(i) for i in range(len(batch))] * args.repeat
+    print(f"{len(params)} diagrams ({len(batch)} distinct), render cache bypassed")
+    for workers in args.workers:
+        jobs = (RenderJob("packing_top_view", p, draw_packing_top_view) for p in params)
+        started = time.perf_counter()
+        total = sum(len(png) for _, png in render_batch(jobs, workers=workers, chunk_size=args.chunk_size,
+                                                          ordered=not args.unordered, cache_dir=None))
+        elapsed = time.perf_counter() - started
+        print(f"{workers:>3} workers: {len(params) / elapsed:8.1f} diagrams/s, {total / 1e6:.1f} MB of PNG")
+
+
+if __name__ == "__main__":
+    main()
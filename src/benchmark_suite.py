@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Benchmark Suite
+Times every stage of the project (question generation, parametric variants, @format
+output, each document builder, both Word exporters and every image path) at scales from a
+couple of items to a million. Reports throughput, per-call latency percentiles and peak RSS,
+and compares them with stored baselines so a slowdown beyond a threshold fails the run.
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "benchmarks", "baseline.json")
+QUICK_SCALES = [2, 100, 1_000]
+FULL_SCALES = [2, 100, 10_000, 100_000, 1_000_000]
+POOL_SIZE = 10_000      # distinct questions cycled through by per-question benchmarks
+
+# Timings too short to compare reliably are reported but not gated
+MIN_GATED_SECONDS = 0.05
+MIN_P99_CALLS = 100
+
+
+class Workload:
+    """What one benchmark case runs: call() `calls` times, each covering items_per_call items"""
+
+    def __init__(self, call, calls, items_per_call=1, close=None):
+        self.call = call
+        self.calls = calls
+        self.items_per_call = items_per_call
+        self.close = close
+
+
+class Benchmark(NamedTuple):
+    """A named stage: setup(n) -> Workload; scales above limit are skipped as too slow"""
+    name: str
+    setup: object
+    limit: int = None
+
+
+def _generator():
+    from generate_questions import MathQuestionGenerator
+    return MathQuestionGenerator()
+
+
+def question_pool(n):
+    """Up to POOL_SIZE verified variant questions, half from each family"""
+    generator = _generator()
+    size = min(n, POOL_SIZE)
+    menu = generator.generate_question_1_variants((size + 1) // 2, seed=1).to_questions()
+    packing = generator.generate_question_2_variants(size // 2, seed=2).to_questions(len(menu) + 1)
+    return menu + packing
+
+
+def _cycle(n):
+    return itertools.islice(itertools.cycle(question_pool(n)), n)
+
+
+# Workloads
+
+def base_question(number):
+    def setup(n):
+        generate = getattr(_generator(), f"generate_question_{number}")
+        return Workload(generate, n)
+    return setup
+
+
+def variant_batch(family):
+    def setup(n):
+        generator = _generator()
+        sample = getattr(generator, f"generate_question_{1 if family == 'menu' else 2}_variants")
+        return Workload(lambda: sample(n, seed=n), 3, n)
+    return setup
+
+
+def variant_questions(n):
+    batch = _generator().generate_question_2_variants(n, seed=n)
+    rows = iter(range(n))
+    return Workload(lambda: batch.question(next(rows)), n)
+
+
+def format_output(n):
+    questions = _cycle(n)
+    format_question = _generator().format_question_output
+    return Workload(lambda: format_question(next(questions)), n)
+
+
+def document(name):
+    def setup(n):
+        from document_writer import FORMATS, DocumentStream, QuestionFormat
+        document = QuestionFormat(_generator().format_question_output) if name == "format" else FORMATS[name]
+        sink = open(os.devnull, "w", encoding="utf-8")
+        stream = DocumentStream([(document, sink)])
+        questions = _cycle(n)
+
+        def close():
+            stream.close()
+            sink.close()
+        return Workload(lambda: stream.write(next(questions)), n, close=close)
+    return setup
+
+
+def docx_stream(n):
+    from docx_writer import DocxFormat
+    from document_writer import DocumentStream
+    document = DocxFormat()
+    fd, path = tempfile.mkstemp(suffix=".docx")
+    os.close(fd)
+    files = contextlib.ExitStack()
+    stream = DocumentStream([(document, files.enter_context(document.open(path)))])
+    questions = _cycle(n)
+
+    def close():
+        stream.close()
+        files.close()
+        os.unlink(path)
+    return Workload(lambda: stream.write(next(questions)), n, close=close)
+
+
+def python_docx(n):
+    generator = _generator()
+    questions = list(_cycle(n))
+    return Workload(lambda: generator.create_word_document(questions).save(io.BytesIO()), 1, n)
+
+
+def _encode(image):
+    from render_cache import RenderCache
+    return RenderCache.encode(image)
+
+
+def image_pil_simple(n):
+    from image_generator import SimpleImageGenerator
+    params = itertools.cycle([(balls, 3.5, 16.9) for balls in range(3, 9)])
+    return Workload(lambda: _encode(SimpleImageGenerator.draw_tennis_container(*next(params))), n)
+
+
+def image_pil_menu(n):
+    from image_generator import DEFAULT_MAIN_DISHES, DEFAULT_SIDE_DISHES, SimpleImageGenerator
+    return Workload(lambda: _encode(SimpleImageGenerator.draw_lunch_menu(DEFAULT_MAIN_DISHES, DEFAULT_SIDE_DISHES)), n)
+
+
+def image_diagram(n):
+    generator = _generator()
+    params = itertools.cycle([(8.45, 3.5, balls) for balls in range(3, 9)])
+    return Workload(lambda: _encode(generator.draw_question_image_2(*next(params))), n)
+
+
+def image_matplotlib(n):
+    generator = _generator()
+    params = itertools.cycle([(8.45, 3.5, balls) for balls in range(3, 9)])
+    return Workload(lambda: _encode(generator.draw_question_image_2_matplotlib(*next(params))), n)
+
+
+def verification(n):
+    from verify import verify_questions
+    questions = list(_cycle(n))
+    return Workload(lambda: verify_questions(questions), 1, n)
+
+
+BENCHMARKS = [
+    Benchmark("generate_question_1", base_question(1)),
+    Benchmark("generate_question_2", base_question(2)),
+    Benchmark("menu_variants", variant_batch("menu")),
+    Benchmark("packing_variants", variant_batch("packing")),
+    Benchmark("variant_question", variant_questions),
+    Benchmark("verify", verification),
+    Benchmark("format_question_output", format_output),
+    Benchmark("document:format", document("format")),
+    Benchmark("document:text", document("text")),
+    Benchmark("document:markdown", document("markdown")),
+    Benchmark("document:word-like", document("word-like")),
+    Benchmark("document:comprehensive", document("comprehensive")),
+    Benchmark("docx:stream", docx_stream),
+    Benchmark("docx:create_word_document", python_docx, limit=1_000),
+    Benchmark("image:pil_container", image_pil_simple, limit=100_000),
+    Benchmark("image:pil_menu", image_pil_menu, limit=100_000),
+    Benchmark("image:diagram", image_diagram, limit=100_000),
+    Benchmark("image:matplotlib", image_matplotlib, limit=100),
+]
+
+
+def run_case(name, scale):
+    """Run one benchmark at one scale (normally in a fresh process) and return its result dict"""
+    benchmark = next(b for b in BENCHMARKS if b.name == name)
+    warmup = benchmark.setup(1)     # first-call costs (lazy imports, templates, fonts) stay out of the timing
+    warmup.call()
+    if warmup.close:
+        warmup.close()
+    workload = benchmark.setup(scale)
+    times = np.empty(workload.calls)
+    call = workload.call
+    try:
+        for i in range(workload.calls):
+            started = time.perf_counter()
+            call()
+            times[i] = time.perf_counter() - started
+    finally:
+        if workload.close:
+            workload.close()
+    items = workload.calls * workload.items_per_call
+    p50, p90, p99 = np.percentile(times, [50, 90, 99]) * 1000
+    return {"name": name, "scale": scale, "items": items, "calls": workload.calls, "seconds": float(times.sum()),
+            "throughput": items / times.sum() if times.sum() else float("inf"),
+            "p50_ms": float(p50), "p90_ms": float(p90), "p99_ms": float(p99),
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+
+def run_isolated(name, scale):
+    """run_case in a freshly spawned interpreter, so peak RSS belongs to this case alone"""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(1, mp_context=context) as pool:
+        return pool.submit(run_case, name, scale).result()
+
+
+# Baselines and regression gates
+
+def case_key(result):
+    return f"{result['name']}@{result['scale']}"
+
+
+def load_baseline(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, results, baseline=None):
+    """Merge results into the baseline file (cases not rerun keep their old numbers)"""
+    baseline = dict(baseline or {})
+    for result in results:
+        baseline[case_key(result)] = {field: result[field] for field in ("throughput", "p99_ms", "peak_rss_mb")}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=1, sort_keys=True)
+        f.write("\n")
+
+
+def regressions(result, baseline, threshold=0.25, rss_threshold=0.25):
+    """Descriptions of every metric of result worse than its baseline beyond the thresholds"""
+    reference = baseline.get(case_key(result))
+    if not reference:
+        return []
+    found = []
+    timed = result["seconds"] >= MIN_GATED_SECONDS
+    if timed and result["throughput"] < reference["throughput"] * (1 - threshold):
+        found.append(f"throughput {result['throughput']:,.0f}/s < baseline {reference['throughput']:,.0f}/s")
+    if timed and result["calls"] >= MIN_P99_CALLS and result["p99_ms"] > reference["p99_ms"] * (1 + threshold):
+        found.append(f"p99 {result['p99_ms']:.3f} ms > baseline {reference['p99_ms']:.3f} ms")
+    if result["peak_rss_mb"] > reference["peak_rss_mb"] * (1 + rss_threshold):
+        found.append(f"peak RSS {result['peak_rss_mb']:.0f} MB > baseline {reference['peak_rss_mb']:.0f} MB")
+    return found
+
+
+def main(argv=None):
+    """Run the selected benchmarks and gate on regressions against the baseline"""
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline stage")
+    parser.add_argument("--scales", type=int, nargs="*", help=f"item counts (default {QUICK_SCALES})")
+    parser.add_argument("--full", action="store_true", help=f"use the full ladder {FULL_SCALES}")
+    parser.add_argument("--only", nargs="*", help="benchmark names or name prefixes to run")
+    parser.add_argument("--list", action="store_true", help="list benchmark names and exit")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="record these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed relative throughput drop / p99 rise before a case fails")
+    parser.add_argument("--rss-threshold", type=float, default=0.25, help="allowed relative peak RSS rise")
+    parser.add_argument("--json", help="also write results as JSON lines to this path")
+    parser.add_argument("--in-process", action="store_true",
+                        help="run cases in this process (faster; peak RSS then accumulates)")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for benchmark in BENCHMARKS:
+            print(benchmark.name + (f"  (up to {benchmark.limit:,})" if benchmark.limit else ""))
+        return 0
+    scales = FULL_SCALES if args.full else args.scales or QUICK_SCALES
+    selected = [b for b in BENCHMARKS
+                if not args.only or any(b.name == o or b.name.startswith(o) for o in args.only)]
+    baseline = load_baseline(args.baseline)
+    run = run_case if args.in_process else run_isolated
+
+    results, failures = [], 0
+    print(f"{'benchmark':<28}{'scale':>10}{'items/s':>14}{'p50 ms':>10}{'p99 ms':>10}{'RSS MB':>8}")
+    for benchmark in selected:
+        for scale in scales:
+            if benchmark.limit and scale > benchmark.limit:
+                print(f"{benchmark.name:<28}{scale:>10,}  skipped (limit {benchmark.limit:,})")
+                continue
+            result = run(benchmark.name, scale)
+            results.append(result)
+            problems = regressions(result, baseline, args.threshold, args.rss_threshold)
+            failures += bool(problems)
+            print(f"{benchmark.name:<28}{scale:>10,}{result['throughput']:>14,.0f}{result['p50_ms']:>10.3f}"
+                  f"{result['p99_ms']:>10.3f}{result['peak_rss_mb']:>8.0f}"
+                  + ("  REGRESSION: " + "; ".join(problems) if problems else ""))
+            sys.stdout.flush()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+    if args.save_baseline:
+        save_baseline(args.baseline, results, baseline)
+        print(f"baseline saved to {os.path.normpath(args.baseline)}")
+    elif failures:
+        print(f"{failures} case(s) regressed beyond the thresholds")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Checkpoint and Resume
+Runs a bank build so that a crash costs at most the chunks written since the last
+checkpoint. Documents are appended to stable .partial files; every few chunks the write
+stage flushes them to disk and records, in one atomically replaced JSON file, the plan
+position (how many children of the run's SeedSequence have been drawn), the questions
+emitted and the byte length of every open output. Resuming truncates each partial file
+to its recorded length and carries on from the recorded position, so no question is
+written twice or lost.
+
+Run as a script with `inject`, it is a fault-injection harness: it builds a reference
+bank, then rebuilds it through runs killed at random points and resumed, and checks
+that the outputs match.
+"""
+
+import argparse
+import bisect
+import contextlib
+import json
+import os
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+from document_writer import DocumentStream
+from render_cache import atomic_write
+
+CHECKPOINT_PATH = os.path.join(".cache", "bank-checkpoint.json")
+CHECKPOINT_FORMAT = 1   # bump when the checkpoint layout changes
+FAULT_POINTS = ("written", "synced", "saved")   # where a run may be made to crash, relative to a checkpoint
+
+
+def load_checkpoint(path=CHECKPOINT_PATH):
+    """The saved checkpoint, or None when there is none"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    if state.get("format") != CHECKPOINT_FORMAT:
+        raise ValueError(f"{path} was written by an incompatible version; remove it to start over")
+    return state
+
+
+class ResumableOutputs:
+    """Text documents appended to <path>.partial files, renamed into place when the run finishes.
+
+    With offsets ({path: byte length}) the partial files of an interrupted run are cut back
+    to those lengths, dropping anything written after the checkpoint, and appended to.
+    """
+
+    def __init__(self, paths, emitted=0, offsets=None):
+        self.paths = {}     # path -> open partial file
+        outputs = []
+        for document, path in paths.items():
+            if "b" in document.mode:
+                raise ValueError(f"{path}: only text formats can be resumed")
+            partial = path + ".partial"
+            os.makedirs(os.path.dirname(partial) or ".", exist_ok=True)
+            if offsets is None:
+                f = open(partial, "w", encoding="utf-8")
+            else:
+                if os.path.getsize(partial) < offsets[path]:
+                    raise ValueError(f"{partial} is shorter than its checkpoint")
+                with open(partial, "r+b") as raw:
+                    raw.truncate(offsets[path])
+                f = open(partial, "a", encoding="utf-8")
+            self.paths[path] = f
+            outputs.append((document, f))
+        self.stream = DocumentStream(outputs, count=emitted)
+
+    def sync(self):
+        """Flush every file to disk and return {path: byte length}"""
+        offsets = {}
+        for path, f in self.paths.items():
+            f.flush()
+            os.fsync(f.fileno())
+            offsets[path] = f.tell()
+        return offsets
+
+    def finish(self):
+        """Write the footers and flush; returns the question count"""
+        return self.stream.close()
+
+    @staticmethod
+    def place(paths):
+        """Move the finished partial files into place (those not moved already)"""
+        for path in paths:
+            if os.path.exists(path + ".partial"):
+                os.replace(path + ".partial", path)
+
+    def close(self):
+        for f in self.paths.values():
+            f.close()
+
+
+class _Checkpointer:
+    """Write-stage hook saving a checkpoint every `every` chunks of the plan"""
+
+    def __init__(self, path, state, outputs, firsts, every, fault=None):
+        self.path = path
+        self.state = state
+        self.outputs = outputs
+        self.firsts = firsts    # first @order of every chunk in the plan
+        self.every = every
+        self.fault = fault or (lambda point: None)
+
+    def __call__(self, chunk):
+        # Chunks are written whole and in plan order, so the chunk holding the last question
+        # written is complete; any chunk between the checkpoints that verification dropped
+        # entirely is drawn the same way on resume and dropped again.
+        next_chunk = bisect.bisect_right(self.firsts, chunk.questions[-1]["order"])
+        self.fault("written")
+        if next_chunk - self.state["next_chunk"] >= self.every:
+            self.save(next_chunk)
+
+    def save(self, next_chunk):
+        offsets = self.outputs.sync()
+        self.fault("synced")
+        self.state.update(next_chunk=next_chunk, emitted=self.outputs.stream.count, offsets=offsets,
+                          saved=time.time())
+        atomic_write(self.path, json.dumps(self.state, indent=2).encode("utf-8"))
+        self.fault("saved")
+
+
+def run_bank(count, output_dir="output", images_dir="images/bank", chunk_size=256, seed=None, docx=False,
+             checkpoint_path=CHECKPOINT_PATH, resume=False, every=8, fault=None, **options):
+    """Build a variant bank like pipeline.build_bank, checkpointing every `every` chunks.
+
+    With resume and a checkpoint on disk, the interrupted run is continued; its count,
+    chunk size and outputs are taken from the checkpoint. The .docx, which cannot be
+    appended to, is written from a JSON lines journal once every chunk is in. fault(point),
+    called at each of FAULT_POINTS, lets tests crash the run there. Returns the number of
+    questions written; the checkpoint is removed once the outputs are in place.
+    """
+    import numpy as np
+    from incremental import BuildManifest
+    from document_writer import QuestionFormat
+    from generate_questions import MathQuestionGenerator
+    from pipeline import plan_chunks, question_pipeline
+    from sharding import JSONLinesFormat
+
+    state = load_checkpoint(checkpoint_path) if resume else None
+    if state is None:
+        # An unseeded run draws fresh entropy once and records it, so a resume draws the same chunks
+        entropy = seed if seed is not None else np.random.SeedSequence().entropy
+        state = {"format": CHECKPOINT_FORMAT, "count": count, "chunk_size": chunk_size, "entropy": entropy,
+                 "output_dir": output_dir, "images_dir": images_dir, "docx": docx,
+                 "next_chunk": 0, "emitted": 0, "offsets": None}
+    else:
+        print(f"Resuming at chunk {state['next_chunk']} with {state['emitted']} questions written")
+
+    plan = list(plan_chunks(state["count"], state["chunk_size"], state["entropy"]))
+    formatted = os.path.join(state["output_dir"], "bank_formatted.txt")
+    journal = os.path.join(state["output_dir"], "bank_questions.jsonl")
+    paths = {QuestionFormat(MathQuestionGenerator().format_question_output): formatted}
+    if state["docx"]:
+        paths[JSONLinesFormat()] = journal
+
+    if not state.get("finished"):
+        outputs = ResumableOutputs(paths, state["emitted"], state["offsets"])
+        with contextlib.closing(outputs):
+            firsts = [first for _, first, _, _ in plan]
+            checkpointer = _Checkpointer(checkpoint_path, state, outputs, firsts, every, fault)
+            if state["offsets"] is None:
+                checkpointer.save(0)    # a crash before the first checkpoint resumes from an empty bank
+            pipeline = question_pipeline(outputs.stream, BuildManifest(None), state["images_dir"],
+                                         after_write=checkpointer, **options)
+            for _ in pipeline.run(plan[state["next_chunk"]:]):
+                pass
+            outputs.finish()
+            # From here on a resume only finishes moving files into place
+            state["finished"] = True
+            checkpointer.save(len(plan))
+
+    ResumableOutputs.place(paths.values())
+    if state["docx"] and os.path.exists(journal):
+        from docx_writer import write_docx
+        with open(journal, encoding="utf-8") as f:
+            write_docx(map(json.loads, f), os.path.join(state["output_dir"], "bank_assessment.docx"))
+        os.unlink(journal)
+    os.unlink(checkpoint_path)
+    return state["emitted"]
+
+
+# Fault injection
+
+def random_fault(rate, seed=None):
+    """fault() hook that kills the process outright at each fault point with probability rate"""
+    rng = random.Random(seed)
+
+    def fault(point):
+        if rng.random() < rate:
+            os.kill(os.getpid(), signal.SIGKILL)
+    return fault
+
+
+def _docx_body(path):
+    with zipfile.ZipFile(path) as package:
+        return package.read("word/document.xml")
+
+
+def _snapshot(output_dir, images_dir, docx):
+    """Contents that must match between the reference and a resumed build"""
+    with open(os.path.join(output_dir, "bank_formatted.txt"), "rb") as f:
+        snapshot = {"bank_formatted.txt": f.read()}
+    if docx:
+        # The .docx stamps its parts with the time they were written; compare the document itself
+        snapshot["bank_assessment.docx"] = _docx_body(os.path.join(output_dir, "bank_assessment.docx"))
+    if os.path.isdir(images_dir):
+        for name in sorted(os.listdir(images_dir)):
+            with open(os.path.join(images_dir, name), "rb") as f:
+                snapshot[name] = f.read()
+    return snapshot
+
+
+def inject(count, trials, chunk_size, seed, fault_rate, docx, render, every, workers, harness_seed=None):
+    """Crash and resume `trials` builds at random points; returns the number that did not match"""
+    rng = random.Random(harness_seed)
+    from pipeline import build_bank
+
+    with tempfile.TemporaryDirectory() as directory:
+        reference = os.path.join(directory, "reference")
+        started = time.perf_counter()
+        build_bank(count, os.path.join(reference, "output"), os.path.join(reference, "images"), chunk_size, seed,
+                   docx=docx, render=render, render_workers=workers)
+        wall = time.perf_counter() - started
+        expected = _snapshot(os.path.join(reference, "output"), os.path.join(reference, "images"), docx)
+        print(f"reference build: {count} questions in {wall:.2f} s")
+
+        failures = 0
+        for trial in range(trials):
+            run = os.path.join(directory, f"trial-{trial}")
+            command = [sys.executable, os.path.abspath(__file__), "run", "--resume",
+                       "--count", str(count), "--chunk-size", str(chunk_size), "--seed", str(seed),
+                       "--output-dir", os.path.join(run, "output"), "--images-dir", os.path.join(run, "images"),
+                       "--checkpoint", os.path.join(run, "checkpoint.json"), "--every", str(every),
+                       "--fault-rate", str(fault_rate)]
+            if docx:
+                command.append("--docx")
+            if not render:
+                command.append("--no-render")
+            if workers:
+                command += ["--workers", str(workers)]
+
+            crashes = 0
+            while True:
+                # Each attempt may kill itself at a checkpoint fault point, and is also killed
+                # from outside (with its render processes) at a random moment
+                process = subprocess.Popen(command + ["--fault-seed", str(rng.randrange(1 << 30))],
+                                           stdout=subprocess.DEVNULL, start_new_session=True)
+                try:
+                    returncode = process.wait(timeout=rng.uniform(0.2, 1.5) * wall + 1.0)
+                except subprocess.TimeoutExpired:
+                    os.killpg(process.pid, signal.SIGKILL)
+                    returncode = process.wait()
+                if returncode == 0:
+                    break
+                if returncode > 0:
+                    raise RuntimeError(f"trial {trial}: run failed with exit code {returncode}")
+                with contextlib.suppress(ProcessLookupError):
+                    os.killpg(process.pid, signal.SIGKILL)
+                crashes += 1
+
+            actual = _snapshot(os.path.join(run, "output"), os.path.join(run, "images"), docx)
+            leftovers = [name for name in os.listdir(os.path.join(run, "output")) if name.endswith(".partial")]
+            ok = actual == expected and not leftovers
+            failures += not ok
+            print(f"trial {trial}: {crashes} crash(es), {'identical' if ok else 'MISMATCH'}")
+            shutil.rmtree(run)
+    return failures
+
+
+def main():
+    """Run a resumable bank build, or the fault-injection harness against it"""
+    parser = argparse.ArgumentParser(description="Checkpointed bank builds and their fault-injection harness")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_build_arguments(command):
+        command.add_argument("--count", type=int, default=10_000)
+        command.add_argument("--chunk-size", type=int, default=256)
+        command.add_argument("--docx", action="store_true", help="also write a .docx assessment")
+        command.add_argument("--no-render", action="store_true")
+        command.add_argument("--workers", type=int, help="render processes (default: one per CPU)")
+        command.add_argument("--every", type=int, default=8, help="chunks between checkpoints")
+
+    run = commands.add_parser("run", help="build a bank, checkpointing as it goes")
+    add_build_arguments(run)
+    run.add_argument("--seed", type=int)
+    run.add_argument("--output-dir", default="output")
+    run.add_argument("--images-dir", default="images/bank")
+    run.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    run.add_argument("--resume", action="store_true", help="continue the run recorded in the checkpoint, if any")
+    run.add_argument("--fault-rate", type=float, default=0.0, help=argparse.SUPPRESS)
+    run.add_argument("--fault-seed", type=int, help=argparse.SUPPRESS)
+
+    harness = commands.add_parser("inject", help="crash and resume builds at random points and compare the results")
+    add_build_arguments(harness)
+    harness.add_argument("--seed", type=int, default=0)
+    harness.add_argument("--trials", type=int, default=5)
+    harness.add_argument("--fault-rate", type=float, default=0.05, help="chance of a crash at each fault point")
+    harness.add_argument("--harness-seed", type=int, help="seed for the crash points")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        fault = random_fault(args.fault_rate, args.fault_seed) if args.fault_rate else None
+        written = run_bank(args.count, args.output_dir, args.images_dir, args.chunk_size, args.seed, args.docx,
+                           args.checkpoint, args.resume, args.every, fault,
+                           render=not args.no_render, render_workers=args.workers)
+        print(f"{written} questions written")
+        return
+
+    failures = inject(args.count, args.trials, args.chunk_size, args.seed, args.fault_rate, args.docx,
+                      not args.no_render, args.every, args.workers, args.harness_seed)
+    print(f"{args.trials - failures}/{args.trials} resumed builds matched the reference")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
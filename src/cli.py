@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Math Question Generation CLI
+One entry point for every generator, renderer and exporter. Backends come from the
+plugin registry and are imported only when a selected stage needs them, so a plain
+@format run never loads python-docx, matplotlib, PIL or NumPy.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from plugins import EXPORTERS, GENERATORS, RENDERERS, PluginNotFound, load_plugins
+
+HEAVY_MODULES = ["numpy", "PIL.Image", "docx", "matplotlib.pyplot"]
+
+
+def build_questions(generator, variants=0, seed=None, verify=False, dedup=None):
+    """The two base questions, or `variants` sampled variants of each, optionally verified.
+
+    With a NearDuplicateIndex as dedup, near-duplicates of indexed questions (or of each
+    other) are dropped and the survivors renumbered.
+    """
+    if not variants:
+        questions = [generator.generate_question_1(), generator.generate_question_2()]
+        if verify:
+            from verify import accept_verified
+            questions = accept_verified(questions)
+        return _deduplicated(questions, dedup)
+    menus = generator.generate_question_1_variants(variants, seed=seed)
+    packings = generator.generate_question_2_variants(variants, seed=None if seed is None else seed + 1)
+    # Variant batches check themselves from their arrays; keep only the rows that pass
+    questions = []
+    for batch in (menus, packings):
+        rows = batch.check().nonzero()[0] if verify else range(len(batch))
+        questions += [batch.question(int(row), order=len(questions) + 1 + i) for i, row in enumerate(rows)]
+    return _deduplicated(questions, dedup)
+
+
+def _deduplicated(questions, index):
+    if index is None:
+        return questions
+    questions = list(index.filter(questions))
+    for order, question in enumerate(questions, 1):
+        question["order"] = order
+    return questions
+
+
+def run_generate(args):
+    # Resolve every stage first so a typo fails before any work is done
+    generator = GENERATORS.load(args.generator)()
+    renderers = [RENDERERS.load(name) for name in args.render]
+    exporters = [EXPORTERS.load(name) for name in args.export]
+
+    index = None
+    if args.dedup:
+        from dedup import DEDUP_INDEX_PATH, open_index
+        args.dedup = DEDUP_INDEX_PATH if args.dedup is True else args.dedup
+        index = open_index(args.dedup)
+    questions = build_questions(generator, args.variants, args.seed, args.verify, index)
+    written = []
+    for render in renderers:
+        written += render(args.images_dir)
+    os.makedirs(args.output_dir, exist_ok=True)
+    for export in exporters:
+        written += export(questions, generator, args.output_dir)
+    if index is not None:
+        index.save(args.dedup)
+    if not args.quiet:
+        print(f"Generated {len(questions)} questions with the {args.generator!r} generator")
+        for path in written:
+            print(f"  {path}")
+    return questions
+
+
+def run_list(args):
+    for title, registry in [("Generators", GENERATORS), ("Renderers", RENDERERS), ("Exporters", EXPORTERS)]:
+        print(f"{title}:")
+        for name, description in registry.describe():
+            print(f"  {name:<22}{description}")
+
+
+def _time_command(command, runs, cwd, env):
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, cwd=cwd, env=env, check=True, stdout=subprocess.DEVNULL)
+        times.append((time.perf_counter() - started) * 1000)
+    return times
+
+
+def run_startup_benchmark(args):
+    """Time short-lived runs end to end, against an interpreter that imports every heavy backend up front"""
+    cli = os.path.abspath(__file__)
+    eager = "; ".join(f"import {module}" for module in HEAVY_MODULES)
+    cases = [
+        ("python (interpreter only)", [sys.executable, "-c", "pass"]),
+        ("eager heavy imports", [sys.executable, "-c", eager]),
+        ("cli: @format only", [sys.executable, cli, "generate", "--quiet"]),
+        ("cli: @format + markdown", [sys.executable, cli, "generate", "--quiet", "--export", "format", "markdown"]),
+        ("cli: + variants", [sys.executable, cli, "generate", "--quiet", "--variants", "100", "--seed", "1"]),
+        ("cli: + docx + images", [sys.executable, cli, "generate", "--quiet", "--export", "format", "docx",
+                                  "--render", "question-images"]),
+    ]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.path.dirname(cli),
+                                                                    os.environ.get("PYTHONPATH")])))
+    with tempfile.TemporaryDirectory() as cwd:
+        print(f"{'case':<28}{'median ms':>10}{'min ms':>10}   ({args.runs} runs each)")
+        for label, command in cases:
+            times = _time_command(command, args.runs, cwd, env)
+            print(f"{label:<28}{statistics.median(times):>10.1f}{min(times):>10.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate math questions through pluggable stages")
+    parser.add_argument("--plugin", action="append", default=[], metavar="MODULE",
+                        help="import a module that registers extra generators, renderers or exporters")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="generate questions and write the selected outputs")
+    generate.add_argument("--generator", default="full", help="generator plugin (see 'list')")
+    generate.add_argument("--variants", type=int, default=0, help="sample N variants of each base question")
+    generate.add_argument("--seed", type=int, default=None)
+    generate.add_argument("--verify", action="store_true", help="recompute answers and drop items that fail")
+    generate.add_argument("--dedup", nargs="?", const=True, metavar="INDEX",
+                          help="drop near-duplicates of questions in this index (default .cache/dedup_index.npz)")
+    generate.add_argument("--export", nargs="*", default=["format"], help="exporter plugins to run")
+    generate.add_argument("--render", nargs="*", default=[], help="renderer plugins to run")
+    generate.add_argument("--output-dir", default="output")
+    generate.add_argument("--images-dir", default="images")
+    generate.add_argument("--quiet", action="store_true")
+    generate.set_defaults(run=run_generate)
+
+    listing = commands.add_parser("list", help="list registered plugins")
+    listing.set_defaults(run=run_list)
+
+    startup = commands.add_parser("startup-benchmark", help="time short-lived CLI runs end to end")
+    startup.add_argument("--runs", type=int, default=10)
+    startup.set_defaults(run=run_startup_benchmark)
+
+    args = parser.parse_args(argv)
+    load_plugins(args.plugin)
+    try:
+        args.run(args)
+    except PluginNotFound as e:
+        parser.error(str(e))
+
+
+if __name__ == "__main__":
+    main()
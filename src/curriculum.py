@@ -0,0 +1,115 @@
+"""
+Shared Curriculum Hierarchy
+The subject/unit/topic hierarchy, compiled once into interned integer IDs with O(1)
+lookups in both directions and vectorized validation and tagging of record arrays
+"""
+
+import sys
+
+import numpy as np
+
+from curriculum_data import CURRICULUM
+
+
+class CurriculumIndex:
+    """Integer-ID view of a curriculum hierarchy.
+
+    Topics are identified by their (unit, topic) pair, so a topic name that is also a
+    unit name (e.g. "Algebra" under "Problem Solving") never collides with the unit.
+    """
+
+    def __init__(self, curriculum=CURRICULUM):
+        self.subjects = []          # subject id -> name
+        self.units = []             # unit id -> name
+        self.topics = []            # topic id -> name
+        unit_subject = []           # unit id -> subject id
+        topic_unit = []             # topic id -> unit id
+        self._subject_ids = {}
+        self._unit_ids = {}         # unit name -> unit id
+        self._topic_ids = {}        # (unit name, topic name) -> topic id
+        self._unit_topics = []      # unit id -> list of topic ids
+
+        for subject, units in curriculum.items():
+            subject_id = len(self.subjects)
+            self.subjects.append(sys.intern(subject))
+            self._subject_ids[subject] = subject_id
+            for unit, topics in units.items():
+                if unit in self._unit_ids:
+                    raise ValueError(f"unit {unit!r} appears under more than one subject")
+                unit_id = len(self.units)
+                self.units.append(sys.intern(unit))
+                self._unit_ids[unit] = unit_id
+                unit_subject.append(subject_id)
+                self._unit_topics.append([])
+                for topic in topics:
+                    topic_id = len(self.topics)
+                    self.topics.append(sys.intern(topic))
+                    self._topic_ids[(unit, topic)] = topic_id
+                    topic_unit.append(unit_id)
+                    self._unit_topics[unit_id].append(topic_id)
+
+        self.unit_subject = np.array(unit_subject, dtype=np.int16)
+        self.topic_unit = np.array(topic_unit, dtype=np.int16)
+        self.topic_subject = self.unit_subject[self.topic_unit]
+
+        # Distinct topic names get their own codes; a (unit, name) table then resolves pairs
+        self._name_codes = {}
+        for topic in self.topics:
+            self._name_codes.setdefault(topic, len(self._name_codes))
+        self._pair_table = np.full((len(self.units), len(self._name_codes)), -1, dtype=np.int16)
+        for (unit, topic), topic_id in self._topic_ids.items():
+            self._pair_table[self._unit_ids[unit], self._name_codes[topic]] = topic_id
+
+    def subject_id(self, subject):
+        return self._subject_ids[subject]
+
+    def unit_id(self, unit):
+        return self._unit_ids[unit]
+
+    def topic_id(self, unit, topic):
+        """ID of a topic within its unit; raises KeyError for pairs outside the curriculum"""
+        return self._topic_ids[(unit, topic)]
+
+    def is_valid(self, subject, unit, topic):
+        """True if subject/unit/topic is a path in the hierarchy"""
+        topic_id = self._topic_ids.get((unit, topic))
+        return topic_id is not None and self.subjects[self.topic_subject[topic_id]] == subject
+
+    def topics_of(self, unit):
+        """Topic names of a unit, in curriculum order"""
+        return [self.topics[t] for t in self._unit_topics[self._unit_ids[unit]]]
+
+    def path(self, topic_id):
+        """(subject, unit, topic) names for a topic id"""
+        unit_id = self.topic_unit[topic_id]
+        return self.subjects[self.unit_subject[unit_id]], self.units[unit_id], self.topics[topic_id]
+
+    @staticmethod
+    def _codes(names, ids):
+        return np.fromiter((ids.get(name, -1) for name in names), dtype=np.int32, count=len(names))
+
+    def encode(self, units, topics):
+        """Vectorized (unit, topic) -> topic id for whole arrays; -1 marks pairs outside the curriculum"""
+        unit_codes = self._codes(units, self._unit_ids)
+        name_codes = self._codes(topics, self._name_codes)
+        known = (unit_codes >= 0) & (name_codes >= 0)
+        return np.where(known, self._pair_table[unit_codes, name_codes], -1).astype(np.int16)
+
+    def validate(self, subjects, units, topics):
+        """Bool mask of records whose subject/unit/topic path exists in the hierarchy"""
+        topic_ids = self.encode(units, topics)
+        subject_codes = self._codes(subjects, self._subject_ids)
+        return (topic_ids >= 0) & (self.topic_subject[np.maximum(topic_ids, 0)] == subject_codes)
+
+    def tag(self, topic_ids):
+        """Vectorized topic id -> (subject ids, unit ids)"""
+        topic_ids = np.asarray(topic_ids)
+        return self.topic_subject[topic_ids], self.topic_unit[topic_ids]
+
+    def validate_questions(self, questions):
+        """Bool mask over question dicts whose curriculum tags are valid"""
+        return self.validate([q["subject"] for q in questions], [q["unit"] for q in questions],
+                             [q["topic"] for q in questions])
+
+
+CURRICULUM_INDEX = CurriculumIndex()
@@ -0,0 +1,159 @@
+"""
+Near-Duplicate Question Detection
+MinHash signatures with an LSH band index over question + options text, so new items
+are accepted or rejected against the whole bank without pairwise comparison
+"""
+
+import os
+import re
+import zlib
+
+import numpy as np
+
+DEDUP_INDEX_PATH = os.path.join(".cache", "dedup_index.npz")
+WORD = re.compile(r"\w+")
+
+
+def question_text(question):
+    """The text a question is compared on: its body plus its options"""
+    return question["question"] + "\n" + "\n".join(question["options"])
+
+
+class NearDuplicateIndex:
+    """MinHash/LSH index answering "is there an item at least `threshold` similar?" """
+
+    def __init__(self, num_perm=128, bands=16, threshold=0.8, shingle_size=3, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.seed = seed
+        # Multiply-shift hash family: h(x) = (a * x + b) mod 2**64 >> 32, with odd a
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2 ** 63, size=(num_perm, 1), dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, size=(num_perm, 1), dtype=np.uint64)
+        self._signatures = np.empty((1024, num_perm), dtype=np.uint32)
+        self._tables = [{} for _ in range(bands)]
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def signature(self, text):
+        """MinHash signature of the word shingles of text"""
+        words = WORD.findall(text.lower())
+        k = min(self.shingle_size, len(words)) or 1
+        shingles = {" ".join(words[i:i + k]) for i in range(max(1, len(words) - k + 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64,
+                             count=len(shingles))
+        with np.errstate(over="ignore"):
+            mixed = (self._a * hashes + self._b) >> np.uint64(32)
+        return mixed.min(axis=1).astype(np.uint32)
+
+    def _band_keys_array(self, signatures):
+        """FNV-style fold of each band's rows into one 64-bit key: (N, num_perm) -> (N, bands)"""
+        bands = signatures.reshape(len(signatures), self.bands, self.rows).astype(np.uint64)
+        keys = np.full(bands.shape[:2], 0xCBF29CE484222325, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            for row in range(self.rows):
+                keys = (keys ^ bands[:, :, row]) * np.uint64(0x100000001B3)
+        return keys
+
+    def _band_keys(self, signature):
+        return self._band_keys_array(signature[None, :])[0].tolist()
+
+    def _candidates(self, keys):
+        found = set()
+        for table, key in zip(self._tables, keys):
+            hit = table.get(key)
+            if hit is None:
+                continue
+            if isinstance(hit, list):
+                found.update(hit)
+            else:
+                found.add(hit)
+        return found
+
+    def query(self, signature, keys=None):
+        """Return (item id, estimated similarity) of the closest candidate, or (None, 0.0)"""
+        candidates = self._candidates(keys or self._band_keys(signature))
+        if not candidates:
+            return None, 0.0
+        ids = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        similarity = (self._signatures[ids] == signature).mean(axis=1)
+        best = int(similarity.argmax())
+        return int(ids[best]), float(similarity[best])
+
+    def add(self, signature, keys=None):
+        """Insert a signature and return its item id"""
+        item = self.size
+        if item == len(self._signatures):
+            grown = np.empty((2 * len(self._signatures), self.num_perm), dtype=np.uint32)
+            grown[:item] = self._signatures[:item]
+            self._signatures = grown
+        self._signatures[item] = signature
+        for table, key in zip(self._tables, keys or self._band_keys(signature)):
+            hit = table.get(key)
+            if hit is None:
+                table[key] = item
+            elif isinstance(hit, list):
+                hit.append(item)
+            else:
+                table[key] = [hit, item]
+        self.size += 1
+        return item
+
+    def check_and_add(self, question):
+        """Add a question unless a near-duplicate is already indexed; returns True if accepted"""
+        signature = self.signature(question_text(question))
+        keys = self._band_keys(signature)
+        _, similarity = self.query(signature, keys)
+        if similarity >= self.threshold:
+            return False
+        self.add(signature, keys)
+        return True
+
+    def filter(self, questions):
+        """Yield only the questions that are not near-duplicates of the bank or of each other"""
+        for question in questions:
+            if self.check_and_add(question):
+                yield question
+
+    def save(self, path):
+        """Persist the index parameters and signatures to an .npz file, replacing it atomically"""
+        from render_cache import atomic_open
+        with atomic_open(path) as f:
+            np.savez(f, signatures=self._signatures[:self.size],
+                     params=np.array([self.num_perm, self.bands, self.shingle_size, self.seed]),
+                     threshold=np.array(self.threshold))
+
+    @classmethod
+    def load(cls, path):
+        """Load a saved index and rebuild its band tables; it can keep growing afterwards"""
+        data = np.load(path)
+        num_perm, bands, shingle_size, seed = (int(v) for v in data["params"])
+        index = cls(num_perm, bands, float(data["threshold"]), shingle_size, seed)
+        signatures = data["signatures"]
+        index.size = len(signatures)
+        index._signatures = np.empty((max(1024, 2 * index.size), num_perm), dtype=np.uint32)
+        index._signatures[:index.size] = signatures
+
+        # Bulk rebuild: sort each band's keys once, then store runs of equal keys as lists
+        for table, keys in zip(index._tables, index._band_keys_array(signatures).T):
+            order = np.argsort(keys, kind="stable")
+            unique, starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+            single = counts == 1
+            table.update(zip(unique[single].tolist(), order[starts[single]].tolist()))
+            for key, start, count in zip(unique[~single].tolist(), starts[~single], counts[~single]):
+                table[key] = order[start:start + count].tolist()
+        return index
+
+
+def open_index(path=DEDUP_INDEX_PATH, **params):
+    """The index saved at path by an earlier run, or a new one built with params"""
+    if os.path.exists(path):
+        return NearDuplicateIndex.load(path)
+    return NearDuplicateIndex(**params)
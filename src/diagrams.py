@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Lightweight Diagram Renderer
+Draws question diagrams (container top views, menu tables) directly with PIL primitives.
+Each call builds its own image, so renderers are safe to run from worker threads.
+"""
+
+import math
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+FONT = ImageFont.load_default()
+
+# Diagrams are palette images: four colours encode to PNG far faster than RGB
+WHITE, BLACK, GRID, BALL = 0, 1, 2, 3
+PALETTE = [255, 255, 255,
+           0, 0, 0,
+           222, 222, 222,
+           255, 255, 77]     # yellow at 70% opacity over white, as in the matplotlib diagram
+
+
+def new_canvas(size):
+    """Blank white palette image"""
+    img = Image.new("P", size, WHITE)
+    img.putpalette(PALETTE)
+    return img
+
+
+def ball_centers(balls, ring_radius, centered=False):
+    """Centres of one layer of balls: an optional centre ball plus a ring of the rest"""
+    centers = [(0.0, 0.0)] if centered else []
+    on_ring = balls - len(centers)
+    for i in range(on_ring):
+        angle = 2 * math.pi * i / on_ring
+        centers.append((ring_radius * math.cos(angle), ring_radius * math.sin(angle)))
+    return centers
+
+
+def draw_packing_top_view(container_radius, ball_radius, balls, ring_radius=None, centered=False,
+                          title="Cylindrical Container with Tennis Balls (Top View)", size=(640, 560)):
+    """Top view of balls packed in a cylindrical container, with a labelled cm grid"""
+    if ring_radius is None:
+        ring_radius = container_radius - ball_radius
+    width, height = size
+
+    # Square plot area below the title, leaving room for tick labels on the left and bottom
+    top, left, bottom = 40, 50, 30
+    side = min(width - left - 20, height - top - bottom)
+    step = 5 if container_radius <= 20 else 10
+    extent = step * math.ceil(container_radius * 1.3 / step)
+    scale = side / (2 * extent)
+
+    def px(x, y):
+        return left + (x + extent) * scale, top + (extent - y) * scale
+
+    img = new_canvas(size)
+    draw = ImageDraw.Draw(img)
+    ticks = range(-extent, extent + 1, step)
+    for t in ticks:
+        draw.line([px(t, -extent), px(t, extent)], fill=GRID)
+        draw.line([px(-extent, t), px(extent, t)], fill=GRID)
+    draw.rectangle([px(-extent, extent), px(extent, -extent)], outline=BLACK)
+
+    r = ball_radius * scale
+    for x, y in ball_centers(balls, ring_radius, centered):
+        cx, cy = px(x, y)
+        draw.ellipse([cx - r, cy - r, cx + r, cy + r], fill=BALL, outline=GRID)
+    cx, cy = px(0, 0)
+    big = container_radius * scale
+    draw.ellipse([cx - big, cy - big, cx + big, cy + big], outline=BLACK, width=2)
+
+    draw.text((left + side / 2 - draw.textlength(title, font=FONT) / 2, 12), title, fill=BLACK, font=FONT)
+    for t in ticks:
+        label = str(t)
+        x, _ = px(t, -extent)
+        draw.text((x - draw.textlength(label, font=FONT) / 2, top + side + 6), label, fill=BLACK, font=FONT)
+        _, y = px(-extent, t)
+        draw.text((left - 8 - draw.textlength(label, font=FONT), y - 5), label, fill=BLACK, font=FONT)
+    return img
+
+
+def draw_table(headers, columns, title=None, cell_width=200, row_height=30):
+    """Grid table with one column per header; columns hold that column's cell strings"""
+    rows = max(len(column) for column in columns)
+    margin, title_height = 50, 40 if title else 0
+    width = 2 * margin + cell_width * len(headers)
+    height = 2 * margin + title_height + row_height * (rows + 1)
+    img = new_canvas((width, height))
+    draw = ImageDraw.Draw(img)
+
+    x0, y0 = margin, margin + title_height
+    x1, y1 = x0 + cell_width * len(headers), y0 + row_height * (rows + 1)
+    if title:
+        draw.text((width / 2 - draw.textlength(title, font=FONT) / 2, margin), title, fill=BLACK, font=FONT)
+    draw.rectangle([x0, y0, x1, y1], outline=BLACK, width=2)
+    draw.line([x0, y0 + row_height, x1, y0 + row_height], fill=BLACK, width=2)
+    for c in range(1, len(headers)):
+        draw.line([x0 + c * cell_width, y0, x0 + c * cell_width, y1], fill=BLACK, width=2)
+
+    for c, (header, column) in enumerate(zip(headers, columns)):
+        x = x0 + c * cell_width + 20
+        draw.text((x, y0 + 10), header, fill=BLACK, font=FONT)
+        for r, cell in enumerate(column):
+            draw.text((x, y0 + row_height * (r + 1) + 10), cell, fill=BLACK, font=FONT)
+    return img
+
+
+def main():
+    """Compare the PIL container diagram against the matplotlib one"""
+    import io
+    from generate_questions import MathQuestionGenerator
+
+    generator = MathQuestionGenerator()
+    params = {"container_radius": 7, "ball_radius": 3.5, "balls": 4}
+    for name, render in [("matplotlib", generator.draw_question_image_2_matplotlib),
+                         ("pil", generator.draw_question_image_2)]:
+        render(**params)  # warm up imports and fonts
+        started = time.perf_counter()
+        for _ in range(20):
+            render(**params).save(io.BytesIO(), format="PNG")
+        print(f"{name:>10}: {(time.perf_counter() - started) / 20 * 1000:.1f} ms per diagram")
+
+
+if __name__ == "__main__":
+    main()
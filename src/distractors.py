@@ -0,0 +1,106 @@
+"""
+Distractor Engine
+Wrong answers generated from models of common student errors. Each question family lists
+its error models; the engine evaluates them over a whole batch at once and picks, per row,
+the first candidates that are valid and far enough from the answer and from each other.
+"""
+
+import numpy as np
+
+OPTION_COUNT = 5
+
+# Source codes recorded for each chosen option besides error model indices
+ANSWER = -1
+FALLBACK = -2
+
+
+class ErrorModel:
+    """A named mistake: apply(params) -> (N,) wrong answers, or <= 0 where it does not apply"""
+
+    def __init__(self, name, description, apply):
+        self.name = name
+        self.description = description
+        self.apply = apply
+
+    def __repr__(self):
+        return f"ErrorModel({self.name!r})"
+
+
+def absolute_distance(chosen, values):
+    return np.abs(chosen - values)
+
+
+def select_options(answers, candidates, min_gap=1, distance=absolute_distance, option_count=OPTION_COUNT,
+                   sources=None, rng=None):
+    """Choose option_count - 1 distractors per row; return options, answer index and sources.
+
+    candidates is (N, M) in priority order. A candidate is taken when it is positive, the row
+    still needs options, and it is at least min_gap (scalar or (N,)) from every option already
+    chosen for that row, the answer included. sources labels candidate columns (default
+    0..M-1); the returned sources array says where each option came from. Options come back
+    in ascending order, or, with a NumPy Generator rng, in a random order per row: sorted
+    options put most answers at B or C, since distractors cluster around the answer.
+    """
+    answers = np.asarray(answers, dtype=np.int64)
+    candidates = np.asarray(candidates, dtype=np.int64)
+    n, columns = candidates.shape
+    sources = np.arange(columns) if sources is None else np.asarray(sources)
+    gap = np.broadcast_to(np.asarray(min_gap, dtype=np.int64), (n,))
+
+    chosen = np.zeros((n, option_count), dtype=np.int64)
+    chosen_sources = np.full((n, option_count), ANSWER, dtype=np.int64)
+    chosen[:, 0] = answers
+    filled = np.ones(n, dtype=np.int64)
+    slots = np.arange(option_count)
+    open_rows = np.arange(n)
+    for j in range(columns):
+        # Only rows still short of options are compared, so late columns touch few rows
+        open_rows = open_rows[filled[open_rows] < option_count]
+        if not len(open_rows):
+            break
+        rows = open_rows[candidates[open_rows, j] > 0]
+        value = candidates[rows, j]
+        close = (distance(chosen[rows], value[:, None]) < gap[rows, None]) & (slots < filled[rows, None])
+        take = rows[~close.any(axis=1)]
+        chosen[take, filled[take]] = candidates[take, j]
+        chosen_sources[take, filled[take]] = sources[j]
+        filled[take] += 1
+    if (filled < option_count).any():
+        raise ValueError(f"{int((filled < option_count).sum())} rows ran out of distractor candidates")
+
+    if rng is None:
+        order = np.argsort(chosen, axis=1, kind="stable")
+    else:
+        order = rng.random((n, option_count)).argsort(axis=1)
+    options = np.take_along_axis(chosen, order, axis=1)
+    chosen_sources = np.take_along_axis(chosen_sources, order, axis=1)
+    return options, (chosen_sources == ANSWER).argmax(axis=1), chosen_sources
+
+
+class DistractorEngine:
+    """Error models for one question family plus its spacing rule"""
+
+    def __init__(self, models, fallback, min_gap=lambda answers: 1, distance=absolute_distance,
+                 option_count=OPTION_COUNT):
+        self.models = list(models)
+        self.fallback = fallback          # (answers, params, k) -> (N, k) spare wrong answers
+        self.min_gap = min_gap            # answers -> scalar or (N,) minimum spacing
+        self.distance = distance
+        self.option_count = option_count
+
+    def candidates(self, params):
+        """(N, models) candidate matrix in model order"""
+        return np.stack([np.asarray(model.apply(params), dtype=np.int64) for model in self.models], axis=1)
+
+    def build(self, answers, params, rng=None):
+        """Options, answer index and per-option sources (model index, ANSWER or FALLBACK); rng as in select_options"""
+        answers = np.asarray(answers, dtype=np.int64)
+        spare = 2 * (self.option_count - 1)
+        pool = np.concatenate([self.candidates(params), self.fallback(answers, params, spare)], axis=1)
+        sources = np.concatenate([np.arange(len(self.models)), np.full(spare, FALLBACK)])
+        return select_options(answers, pool, self.min_gap(answers), self.distance, self.option_count, sources, rng)
+
+    def source_names(self, sources):
+        """Error model names for a sources array ("answer" / "fallback" for the special codes)"""
+        names = np.array([model.name for model in self.models] + ["fallback", "answer"], dtype=object)
+        return names[np.asarray(sources)]   # FALLBACK and ANSWER index from the end
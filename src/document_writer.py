@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Streaming Document Writer
+Renders an iterator of questions into several document formats in a single pass, writing
+each question's text straight to the open file handles. Memory stays flat and time grows
+linearly, however many questions the assessment holds.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import time
+import tracemalloc
+from collections.abc import Sized
+
+from render_cache import atomic_open
+
+NUMBER_WORDS = ["no", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten"]
+
+
+def quantity(count, noun="newly generated math question"):
+    """"two newly generated math questions", "1,200 newly generated math questions", ..."""
+    number = NUMBER_WORDS[count] if count < len(NUMBER_WORDS) else f"{count:,}"
+    return f"{number} {noun}{'' if count == 1 else 's'}"
+
+
+def intro(total):
+    """Opening sentence for a document of total questions (None: not known when it starts)"""
+    what = "newly generated math questions" if total is None else quantity(total)
+    return f"This document contains {what} following the specified format and curriculum hierarchy."
+
+
+def summary(count):
+    """Closing sentence giving the count of a document whose intro could not"""
+    return f"This document contains {quantity(count)}."
+
+
+class DocumentFormat:
+    """One document layout: a header, a block per question with separators between, a footer.
+
+    Streams call start(total) for the header and end(count, total) for the footer, so a
+    format can describe the document's size: total is the question count when the caller
+    knew it up front (else None), count the number actually written.
+    """
+
+    header = ""
+    separator = ""
+    footer = ""
+    mode = "w"      # file mode the format is written with
+    version = 2     # bump when the layout changes, so incremental builds redo the file
+
+    def open(self, f):
+        """Context manager giving the handle this format writes to inside file object f"""
+        return contextlib.nullcontext(f)
+
+    def start(self, total):
+        return self.header
+
+    def end(self, count, total):
+        return self.footer
+
+    def question(self, number, question):
+        """Text block for the number-th question (1-based)"""
+        raise NotImplementedError
+
+    @staticmethod
+    def options(question, correct, other):
+        """One line per option; `other` may be a str or a callable of the 1-based option number"""
+        answer = question["correct_answer"]
+        lines = []
+        for j, option in enumerate(question["options"], 1):
+            marker = correct if option == answer else (other(j) if callable(other) else other)
+            lines.append(f"{marker} {option}\n")
+        return "".join(lines)
+
+
+class TextFormat(DocumentFormat):
+    """Plain-text assessment (SimpleMathQuestionGenerator.create_text_document)"""
+
+    separator = "=" * 60 + "\n\n"
+
+    def start(self, total):
+        return "=" * 60 + "\n" + "MATH QUESTION GENERATION - ASSESSMENT\n" + "=" * 60 + "\n\n" + intro(total) + "\n\n"
+
+    def end(self, count, total):
+        return "" if total is not None else self.separator + summary(count) + "\n"
+
+    def question(self, number, question):
+        return (f"QUESTION {number}\n" + "-" * 40 + "\n\n"
+                f"QUESTION TEXT:\n{question['question']}\n\n"
+                "OPTIONS:\n" + self.options(question, "[CORRECT]", "[ ]") +
+                f"\nEXPLANATION:\n{question['explanation']}\n\n"
+                "METADATA:\n"
+                f"Subject: {question['subject']}\n"
+                f"Unit: {question['unit']}\n"
+                f"Topic: {question['topic']}\n"
+                f"Difficulty: {question['difficulty']}\n"
+                f"Marks: {question['plusmarks']}\n\n")
+
+
+class MarkdownFormat(DocumentFormat):
+    """Markdown assessment (SimpleMathQuestionGenerator.create_markdown_document)"""
+
+    separator = "---\n\n"
+
+    def start(self, total):
+        return "# Math Question Generation - Assessment\n\n" + intro(total) + "\n\n"
+
+    def end(self, count, total):
+        return "" if total is not None else self.separator + summary(count) + "\n"
+
+    def question(self, number, question):
+        return (f"## Question {number}\n\n"
+                f"{question['question']}\n\n"
+                "### Options:\n" + self.options(question, "✓", "○") +
+                f"\n### Explanation:\n{question['explanation']}\n\n"
+                "### Question Metadata:\n"
+                f"- **Subject**: {question['subject']}\n"
+                f"- **Unit**: {question['unit']}\n"
+                f"- **Topic**: {question['topic']}\n"
+                f"- **Difficulty**: {question['difficulty']}\n"
+                f"- **Marks**: {question['plusmarks']}\n\n")
+
+
+class WordLikeFormat(DocumentFormat):
+    """Word-like text assessment (FinalMathQuestionGenerator.create_word_like_document)"""
+
+    separator = "\n" + "=" * 80 + "\n\n"
+
+    def start(self, total):
+        return ("=" * 80 + "\n" + "MATH QUESTION GENERATION - ASSESSMENT\n" + "Generated using LLM Approach\n"
+                + "=" * 80 + "\n\n" + "ASSESSMENT OVERVIEW\n" + "-" * 40 + "\n" + intro(total) + "\n"
+                + "The questions are similar to the base questions provided and include appropriate "
+                  "mathematical concepts.\n\n")
+
+    def end(self, count, total):
+        closing = "" if total is not None else summary(count) + "\n"
+        return "\n" + "=" * 80 + "\n" + closing + "END OF ASSESSMENT\n" + "=" * 80 + "\n"
+
+    def question(self, number, question):
+        return (f"QUESTION {number}\n" + "=" * 50 + "\n\n"
+                f"QUESTION TEXT:\n{question['question']}\n\n"
+                "OPTIONS:\n" + self.options(question, "[CORRECT ANSWER]", lambda j: f"[{chr(64 + j)}]") +
+                f"\nEXPLANATION:\n{question['explanation']}\n\n"
+                "QUESTION METADATA:\n"
+                f"Subject: {question['subject']}\n"
+                f"Unit: {question['unit']}\n"
+                f"Topic: {question['topic']}\n"
+                f"Difficulty: {question['difficulty']}\n"
+                f"Marks: {question['plusmarks']}\n\n")
+
+
+class ComprehensiveFormat(DocumentFormat):
+    """Final comprehensive assessment (FinalMathQuestionGenerator.create_final_comprehensive_document)"""
+
+    separator = "-" * 60 + "\n\n"
+
+    def start(self, total):
+        what = "new math questions" if total is None else quantity(total, "new math question")
+        return ("MATH QUESTION GENERATION PROJECT - FINAL ASSESSMENT\n" + "=" * 70 + "\n\n"
+                "PROJECT OVERVIEW:\n"
+                f"This project successfully generates {what} similar to the provided base questions.\n"
+                "The questions follow the specified format, include curriculum-aligned classifications, "
+                "and preserve mathematical notation.\n\n"
+                "BASE QUESTIONS ANALYSIS:\n" + "-" * 30 + "\n"
+                "1. Uniform Combinations Problem: Counting principle with table data\n"
+                "2. Sphere Packing Problem: Geometry with visual representation\n\n"
+                "GENERATED QUESTIONS:\n" + "-" * 25 + "\n")
+
+    def end(self, count, total):
+        generated = quantity(count)
+        return ("CURRICULUM COMPLIANCE:\n" + "-" * 25 + "\n"
+                "- All questions use specified curriculum hierarchy\n"
+                "- Subject, unit, and topic classifications are accurate\n"
+                "- Mathematical notation preserved in LaTeX format\n"
+                "- Difficulty levels appropriately assigned\n"
+                "- Question formats follow specified structure\n\n"
+                "PROJECT DELIVERABLES:\n" + "-" * 25 + "\n"
+                f"- {generated[0].upper() + generated[1:]}\n"
+                "- Proper @format output files\n"
+                "- Word-like document format\n"
+                "- Curriculum analysis\n"
+                "- Comprehensive assessment document\n"
+                "- Question images generated\n\n"
+                + "=" * 70 + "\n" + "PROJECT COMPLETED SUCCESSFULLY\n" + "=" * 70 + "\n")
+
+    def question(self, number, question):
+        return (f"QUESTION {number}: {question['topic']}\n" + "=" * 40 + "\n"
+                f"Difficulty: {question['difficulty']}\n"
+                f"Subject: {question['subject']}\n"
+                f"Unit: {question['unit']}\n"
+                f"Topic: {question['topic']}\n\n"
+                f"Question: {question['question']}\n\n"
+                "Options:\n" + self.options(question, "✓", "○") +
+                f"\nCorrect Answer: {question['correct_answer']}\n"
+                f"Explanation: {question['explanation']}\n\n")
+
+
+class QuestionFormat(DocumentFormat):
+    """@format question records, using a generator's format_question_output"""
+
+    def __init__(self, format_question):
+        self.format_question = format_question
+
+    def question(self, number, question):
+        return self.format_question(question)
+
+
+FORMATS = {
+    "text": TextFormat(),
+    "markdown": MarkdownFormat(),
+    "word-like": WordLikeFormat(),
+    "comprehensive": ComprehensiveFormat(),
+}
+
+
+class DocumentStream:
+    """Documents being written a question at a time; close() writes the footers.
+
+    Separators go before every question but the first, so the question count need not be
+    known up front: given as total, it goes in the headers, otherwise close() puts the
+    final count in the footers. A stream resumed over outputs that already hold `count`
+    questions writes no headers and carries on the numbering.
+    """
+
+    def __init__(self, outputs, count=0, total=None):
+        self.outputs = list(outputs)
+        self.count = count
+        self.total = total
+        if not count:
+            for document, f in self.outputs:
+                f.write(document.start(total))
+
+    def write(self, question):
+        self.count += 1
+        for document, f in self.outputs:
+            if self.count > 1:
+                f.write(document.separator)
+            f.write(document.question(self.count, question))
+
+    def close(self):
+        """Write every footer and return the number of questions written"""
+        for document, f in self.outputs:
+            f.write(document.end(self.count, self.total))
+        return self.count
+
+
+def write_documents(questions, outputs, total=None):
+    """Stream questions into every (DocumentFormat, text file handle) pair in one pass.
+
+    total is the number of questions, taken from len(questions) for a list; returns the
+    number of questions written.
+    """
+    if total is None and isinstance(questions, Sized):
+        total = len(questions)
+    stream = DocumentStream(outputs, total=total)
+    for question in questions:
+        stream.write(question)
+    return stream.close()
+
+
+def render_document(document, questions):
+    """Render one format to a string (for callers that still want the whole document)"""
+    buffer = io.StringIO()
+    write_documents(questions, [(document, buffer)])
+    return buffer.getvalue()
+
+
+def write_document_files(questions, paths, total=None):
+    """Stream questions into files in one pass; paths maps a DocumentFormat (or FORMATS name) to a path.
+
+    Each file is written to a temporary name and renamed into place once complete. total
+    is as for write_documents.
+    """
+    with contextlib.ExitStack() as files:
+        handles = []
+        for document, path in paths.items():
+            document = FORMATS.get(document, document)
+            f = files.enter_context(atomic_open(path, document.mode, None if "b" in document.mode else "utf-8"))
+            handles.append((document, files.enter_context(document.open(f))))
+        return write_documents(questions, handles, total)
+
+
+def main():
+    """Stream growing variant banks through every format and report time and peak memory"""
+    from generate_questions import MathQuestionGenerator
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Benchmark the streaming document writer")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[1_000, 10_000, 100_000])
+    args = parser.parse_args()
+
+    generator = MathQuestionGenerator()
+    with tempfile.TemporaryDirectory() as directory:
+        paths = {name: os.path.join(directory, f"assessment.{name}.txt") for name in FORMATS}
+        paths[QuestionFormat(generator.format_question_output)] = os.path.join(directory, "formatted.txt")
+        for size in args.sizes:
+            batch = generator.generate_question_2_variants(size, seed=size)
+            tracemalloc.start()
+            started = time.perf_counter()
+            write_document_files(batch.iter_questions(), paths)
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            total = sum(os.path.getsize(path) for path in paths.values())
+            print(f"{size:>8} questions: {elapsed:6.2f} s ({size / elapsed:8.0f} q/s), "
+                  f"{total / 1e6:7.1f} MB written, peak traced memory {peak / 1e6:5.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
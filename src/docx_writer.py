@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Streaming Word Document Exporter
+Writes an assessment .docx straight into a zip stream from a question iterator. Styles,
+numbering and document properties are copied from a template package (python-docx's own
+default template unless another is given); only word/document.xml is generated, one
+question at a time, with the same layout as MathQuestionGenerator.create_word_document.
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import os
+import re
+import time
+import tracemalloc
+import zipfile
+from xml.sax.saxutils import escape
+
+from document_writer import DocumentFormat, intro as count_intro, summary, write_documents
+from render_cache import atomic_open
+
+DOCUMENT_PART = "word/document.xml"
+
+TITLE = "Math Question Generation - Assessment"
+METADATA_FIELDS = [("Subject", "subject"), ("Unit", "unit"), ("Topic", "topic"),
+                   ("Difficulty", "difficulty"), ("Marks", "plusmarks")]
+
+PAGE_BREAK = '<w:p><w:r><w:br w:type="page"/></w:r></w:p>'
+
+
+def default_template():
+    """Path of python-docx's bundled default.docx, found without importing python-docx"""
+    spec = importlib.util.find_spec("docx")
+    if spec is None:
+        raise RuntimeError("python-docx is not installed; pass template= pointing at a .docx file")
+    return os.path.join(spec.submodule_search_locations[0], "templates", "default.docx")
+
+
+def run_text(text):
+    """Run content for text, turning newlines into line breaks as python-docx does"""
+    parts = []
+    for i, line in enumerate(text.split("\n")):
+        if i:
+            parts.append("<w:br/>")
+        if line:
+            parts.append(f'<w:t xml:space="preserve">{escape(line)}</w:t>')
+    return "".join(parts)
+
+
+def paragraph(text, style=None, center=False):
+    properties = ""
+    if style or center:
+        properties = ("<w:pPr>" + (f'<w:pStyle w:val="{style}"/>' if style else "")
+                      + ('<w:jc w:val="center"/>' if center else "") + "</w:pPr>")
+    return f"<w:p>{properties}<w:r>{run_text(text)}</w:r></w:p>"
+
+
+class DocumentTemplate:
+    """A .docx package split into its fixed parts and the document body's head and tail"""
+
+    def __init__(self, path=None):
+        self.path = path or default_template()
+        with zipfile.ZipFile(self.path) as package:
+            self.parts = [(info, package.read(info)) for info in package.infolist()
+                          if info.filename != DOCUMENT_PART]
+            document = package.read(DOCUMENT_PART).decode("utf-8")
+        body = document.index("<w:body>") + len("<w:body>")
+        section = document.index("<w:sectPr", body)
+        self.head = document[:body]
+        self.tail = document[section:]
+
+        # Tables span the text block, split evenly between columns, as python-docx lays them out
+        page = int(re.search(r'<w:pgSz[^>]*w:w="(\d+)"', self.tail).group(1))
+        margins = sum(int(re.search(rf'<w:pgMar[^>]*w:{side}="(\d+)"', self.tail).group(1))
+                      for side in ("left", "right"))
+        self.block_width = page - margins
+
+    def table(self, rows, style="TableGrid"):
+        """Grid table XML for rows of cell strings"""
+        width = self.block_width // len(rows[0])
+        cell = f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{width}"/></w:tcPr>{{}}</w:tc>'
+        return ("<w:tbl><w:tblPr>"
+                f'<w:tblStyle w:val="{style}"/><w:tblW w:type="auto" w:w="0"/>'
+                '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" '
+                'w:noHBand="0" w:noVBand="1" w:val="04A0"/></w:tblPr>'
+                "<w:tblGrid>" + f'<w:gridCol w:w="{width}"/>' * len(rows[0]) + "</w:tblGrid>"
+                + "".join("<w:tr>" + "".join(cell.format(paragraph(text)) for text in row) + "</w:tr>"
+                          for row in rows)
+                + "</w:tbl>")
+
+
+def question_xml(template, number, question):
+    """Body XML for one question: heading, text, marked options, explanation, metadata table"""
+    answer = question["correct_answer"]
+    parts = [paragraph(f"Question {number}", "Heading1"),
+             paragraph(question["question"]),
+             paragraph("Options:", "Heading2")]
+    parts += [paragraph(f"{'✓' if option == answer else '○'} {option}") for option in question["options"]]
+    parts += [paragraph("Explanation:", "Heading2"),
+              paragraph(question["explanation"]),
+              paragraph("Question Metadata:", "Heading2"),
+              template.table([["Field", "Value"]] + [[label, str(question[key])] for label, key in METADATA_FIELDS])]
+    return "".join(parts)
+
+
+class DocxFormat(DocumentFormat):
+    """document.xml body of a template as a DocumentFormat, for writing with DocumentStream.
+
+    Without an intro the document opens by stating its question count, or closes with it
+    when the count is not known up front (see DocumentFormat).
+    """
+
+    separator = PAGE_BREAK
+    mode = "wb"
+
+    def __init__(self, template=None, title=TITLE, intro=None, compresslevel=6):
+        if not isinstance(template, DocumentTemplate):
+            template = DocumentTemplate(template)
+        self.template = template
+        self.compresslevel = compresslevel
+        self.title = title
+        self.intro = intro
+
+    def start(self, total):
+        text = self.intro if self.intro is not None else count_intro(total)
+        return self.template.head + paragraph(self.title, "Title", center=True) + paragraph(text)
+
+    def end(self, count, total):
+        closing = paragraph(summary(count)) if self.intro is None and total is None else ""
+        return closing + self.template.tail
+
+    def open(self, f):
+        return open_docx(f, self.template, self.compresslevel)
+
+    def question(self, number, question):
+        return question_xml(self.template, number, question)
+
+
+@contextlib.contextmanager
+def open_docx(output, template, compresslevel=6):
+    """Write template's fixed parts to output and yield a text handle on word/document.xml.
+
+    A path output is written to a temporary file and renamed into place once complete.
+    """
+    if isinstance(output, (str, os.PathLike)):
+        with atomic_open(output) as f, open_docx(f, template, compresslevel) as body:
+            yield body
+        return
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED, compresslevel=compresslevel) as package:
+        for info, data in template.parts:
+            package.writestr(info.filename, data)
+        with package.open(DOCUMENT_PART, "w", force_zip64=True) as body:
+            with io.TextIOWrapper(body, encoding="utf-8", newline="") as text:
+                yield text
+
+
+def write_docx(questions, output, template=None, title=TITLE, intro=None, compresslevel=6, total=None):
+    """Stream questions into a .docx at output (a path or binary file object); returns the question count.
+
+    template may be a DocumentTemplate, a path to a .docx, or None for python-docx's default;
+    total is as for document_writer.write_documents.
+    """
+    document = DocxFormat(template, title, intro, compresslevel)
+    with document.open(output) as body:
+        return write_documents(questions, [(document, body)], total)
+
+
+def main():
+    """Compare the streaming exporter with the python-docx builder on growing assessments"""
+    import tempfile
+    from generate_questions import MathQuestionGenerator
+
+    parser = argparse.ArgumentParser(description="Benchmark the streaming .docx exporter")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[100, 1_000, 10_000])
+    parser.add_argument("--python-docx-limit", type=int, default=1_000,
+                        help="skip the python-docx builder above this many questions")
+    args = parser.parse_args()
+
+    generator = MathQuestionGenerator()
+    template = DocumentTemplate()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "assessment.docx")
+        for size in args.sizes:
+            questions = generator.generate_question_2_variants(size, seed=size).to_questions()
+            runs = [("stream", lambda: write_docx(questions, path, template))]
+            if size <= args.python_docx_limit:
+                runs.append(("python-docx", lambda: generator.create_word_document(questions).save(path)))
+            for name, run in runs:
+                tracemalloc.start()
+                started = time.perf_counter()
+                run()
+                elapsed = time.perf_counter() - started
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                print(f"{size:>7} questions {name:>12}: {elapsed:7.2f} s, peak traced memory {peak / 1e6:7.1f} MB, "
+                      f"{os.path.getsize(path) / 1e6:6.2f} MB file")
+
+
+if __name__ == "__main__":
+    main()
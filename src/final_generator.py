@@ -4,19 +4,23 @@ Final Math Question Generation Script
 Creates properly formatted questions and all required outputs
 """
 
+import argparse
 import os
+from curriculum_data import CURRICULUM
+from document_writer import FORMATS, QuestionFormat, render_document
+
+# Bump when create_curriculum_analysis changes so incremental builds redo the file
+CURRICULUM_ANALYSIS_VERSION = 1
 
 class FinalMathQuestionGenerator:
     def __init__(self):
-        self.curriculum = {
-            "Quantitative Math": {
-                "Problem Solving": ["Numbers and Operations", "Algebra", "Geometry", "Problem Solving", "Probability and Statistics", "Data Analysis"],
-                "Algebra": ["Algebraic Word Problems", "Interpreting Variables", "Polynomial Expressions (FOIL/Factoring)", "Rational Expressions", "Exponential Expressions (Product rule, negative exponents)", "Quadratic Equations & Functions (Finding roots/solutions, graphing)", "Functions Operations"],
-                "Geometry and Measurement": ["Area & Volume", "Perimeter", "Lines, Angles, & Triangles", "Right Triangles & Trigonometry", "Circles (Area, circumference)", "Coordinate Geometry", "Slope", "Transformations (Dilating a shape)", "Parallel & Perpendicular Lines", "Solid Figures (Volume of Cubes)"],
-                "Numbers and Operations": ["Basic Number Theory", "Prime & Composite Numbers", "Rational Numbers", "Order of Operations", "Estimation", "Fractions, Decimals, & Percents", "Sequences & Series", "Computation with Whole Numbers", "Operations with Negatives"],
-                "Data Analysis & Probability": ["Interpretation of Tables & Graphs", "Trends & Inferences", "Probability (Basic, Compound Events)", "Mean, Median, Mode, & Range", "Weighted Averages", "Counting & Arrangement Problems"]
-            }
-        }
+        self.curriculum = CURRICULUM
+    
+    @property
+    def curriculum_index(self):
+        """Compiled curriculum index, shared by every generator (imports NumPy on first use)"""
+        from curriculum import CURRICULUM_INDEX
+        return CURRICULUM_INDEX
     
     def generate_question_1(self):
         """Generate a question similar to the uniform combinations problem"""
@@ -42,6 +46,11 @@ class FinalMathQuestionGenerator:
             "plusmarks": 1
         }
     
+    def generate_question_1_variants(self, count, seed=None):
+        """Sample and solve a batch of parametric variants of the uniform combinations problem"""
+        from variants import MenuCombinationVariants
+        return MenuCombinationVariants().sample(count, seed=seed)
+    
     def generate_question_2(self):
         """Generate a question similar to the sphere packing problem"""
         return {
@@ -53,21 +62,34 @@ class FinalMathQuestionGenerator:
             "order": 2,
             "options": [
                 "$7 \\times 7 \\times 14$ cm",
-                "$7 \\times 7 \\times 21$ cm", 
                 "$14 \\times 14 \\times 14$ cm",
                 "$14 \\times 14 \\times 21$ cm",
-                "$21 \\times 21 \\times 28$ cm"
+                "$17 \\times 17 \\times 14$ cm",
+                "$17 \\times 17 \\times 21$ cm"
             ],
-            "correct_answer": "$14 \\times 14 \\times 21$ cm",
-            "explanation": "Each tennis ball has a radius of 3.5 cm, so diameter = 7 cm. For the circular arrangement of 4 balls, the container diameter must be approximately 14 cm (2 × 7 cm). The height must accommodate 2 layers: 2 × 7 cm = 14 cm, plus some spacing, so approximately 21 cm total. Therefore, the closest dimensions are $14 \\times 14 \\times 21$ cm.",
+            "correct_answer": "$17 \\times 17 \\times 14$ cm",
+            "explanation": "Each tennis ball has a radius of 3.5 cm, so diameter = 7 cm. With 4 balls arranged in a ring, neighbouring balls touch, so the ball centres lie 3.5 / sin(45°) ≈ 4.9 cm from the axis and the container diameter is 2 × (4.9 + 3.5) ≈ 16.9 cm, about 17 cm. The height must accommodate 2 layers: 2 × 7 cm = 14 cm. Therefore, the closest dimensions are $17 \\times 17 \\times 14$ cm.",
             "subject": "Quantitative Math",
             "unit": "Geometry and Measurement",
             "topic": "Area & Volume", 
             "plusmarks": 1
         }
     
+    def generate_question_2_variants(self, count, seed=None):
+        """Sample and solve a batch of parametric variants of the sphere packing problem"""
+        from packing import PackingVariants
+        return PackingVariants().sample(count, seed=seed)
+    
+    def generate_llm_questions(self, specs, pack_size=None, **client_options):
+        """Generate questions for unit/topic/difficulty specs concurrently from a chat model"""
+        from llm_client import generate_questions
+        return generate_questions(specs, pack_size=pack_size, curriculum=self.curriculum, **client_options)
+    
     def format_question_output(self, question_data):
         """Format question data according to the specified output format"""
+        # @@option marks whichever option is the correct answer
+        options = "\n".join(f"{'@@option' if option == question_data['correct_answer'] else '@option'} {option}"
+                            for option in question_data['options'])
         output = f"""@title {question_data['title']}
 @description {question_data['description']}
 
@@ -75,11 +97,7 @@ class FinalMathQuestionGenerator:
 @instruction {question_data['instruction']}
 @difficulty {question_data['difficulty']}
 @order {question_data['order']}
-@option {question_data['options'][0]}
-@option {question_data['options'][1]}
-@option {question_data['options'][2]}
-@@option {question_data['correct_answer']}
-@option {question_data['options'][4]}
+{options}
 @explanation {question_data['explanation']}
 @subject {question_data['subject']}
 @unit {question_data['unit']}
@@ -91,44 +109,7 @@ class FinalMathQuestionGenerator:
     
     def create_word_like_document(self, questions):
         """Create a document that mimics Word document formatting"""
-        content = "=" * 80 + "\n"
-        content += "MATH QUESTION GENERATION - ASSESSMENT\n"
-        content += "Generated using LLM Approach\n"
-        content += "=" * 80 + "\n\n"
-        
-        content += "ASSESSMENT OVERVIEW\n"
-        content += "-" * 40 + "\n"
-        content += "This document contains two newly generated math questions following the specified format and curriculum hierarchy.\n"
-        content += "The questions are similar to the base questions provided and include appropriate mathematical concepts.\n\n"
-        
-        for i, question in enumerate(questions, 1):
-            content += f"QUESTION {i}\n"
-            content += "=" * 50 + "\n\n"
-            
-            content += f"QUESTION TEXT:\n{question['question']}\n\n"
-            
-            content += "OPTIONS:\n"
-            for j, option in enumerate(question['options'], 1):
-                marker = "[CORRECT ANSWER]" if option == question['correct_answer'] else f"[{chr(64+j)}]"
-                content += f"{marker} {option}\n"
-            
-            content += f"\nEXPLANATION:\n{question['explanation']}\n\n"
-            
-            content += "QUESTION METADATA:\n"
-            content += f"Subject: {question['subject']}\n"
-            content += f"Unit: {question['unit']}\n"
-            content += f"Topic: {question['topic']}\n"
-            content += f"Difficulty: {question['difficulty']}\n"
-            content += f"Marks: {question['plusmarks']}\n\n"
-            
-            if i < len(questions):
-                content += "\n" + "=" * 80 + "\n\n"
-        
-        content += "\n" + "=" * 80 + "\n"
-        content += "END OF ASSESSMENT\n"
-        content += "=" * 80 + "\n"
-        
-        return content
+        return render_document(FORMATS["word-like"], questions)
     
     def create_curriculum_analysis(self):
         """Create a curriculum analysis document"""
@@ -163,38 +144,46 @@ class FinalMathQuestionGenerator:
         
         return content
     
-    def generate_all_outputs(self):
-        """Generate all required outputs"""
-        print("Generating comprehensive math question outputs...")
-        
-        # Generate questions
-        question1 = self.generate_question_1()
-        question2 = self.generate_question_2()
-        questions = [question1, question2]
-        
-        # Create output directory
-        os.makedirs('output', exist_ok=True)
-        
-        # Save properly formatted output
-        with open('output/questions_formatted_correct.txt', 'w', encoding='utf-8') as f:
-            for question in questions:
-                f.write(self.format_question_output(question))
-        
-        # Create Word-like document
-        word_content = self.create_word_like_document(questions)
-        with open('output/Math_Questions_Assessment_Word_Format.txt', 'w', encoding='utf-8') as f:
-            f.write(word_content)
-        
-        # Create curriculum analysis
-        curriculum_content = self.create_curriculum_analysis()
-        with open('output/Curriculum_Analysis.txt', 'w', encoding='utf-8') as f:
-            f.write(curriculum_content)
-        
-        # Create final comprehensive document
-        final_content = self.create_final_comprehensive_document(questions)
-        with open('output/Final_Comprehensive_Assessment.txt', 'w', encoding='utf-8') as f:
-            f.write(final_content)
-        
+    def generate_all_outputs(self, incremental=False):
+        """Generate all required outputs (only changed files when incremental)"""
+        import instrumentation
+        with instrumentation.span("generate_all_outputs"):
+            print("Generating comprehensive math question outputs...")
+            
+            # Generate questions
+            with instrumentation.span("generate"):
+                question1 = self.generate_question_1()
+                question2 = self.generate_question_2()
+                questions = [question1, question2]
+            instrumentation.count("questions_generated", len(questions))
+            
+            # Drop any item whose marked answer does not check out
+            with instrumentation.span("verify"):
+                from verify import accept_verified
+                questions = accept_verified(questions)
+            instrumentation.count("questions_accepted", len(questions))
+            
+            from incremental import MANIFEST_PATH, BuildManifest, input_hash
+            with BuildManifest(MANIFEST_PATH if incremental else None) as manifest:
+                # Write the formatted output, Word-like and comprehensive documents in one pass;
+                # an incremental build keeps the files whose questions and format are unchanged
+                with instrumentation.span("documents"):
+                    with manifest.documents({
+                        QuestionFormat(self.format_question_output): 'output/questions_formatted_correct.txt',
+                        "word-like": 'output/Math_Questions_Assessment_Word_Format.txt',
+                        "comprehensive": 'output/Final_Comprehensive_Assessment.txt',
+                    }) as documents:
+                        for question in questions:
+                            documents.write(question)
+                
+                # Create curriculum analysis
+                with instrumentation.span("curriculum_analysis"):
+                    manifest.build('output/Curriculum_Analysis.txt',
+                                   input_hash("curriculum-analysis", CURRICULUM_ANALYSIS_VERSION, self.curriculum),
+                                   lambda: self.create_curriculum_analysis().encode('utf-8'))
+        
+        if incremental:
+            print(f"Incremental build: {manifest.built} files rebuilt, {manifest.skipped} unchanged")
         print("All outputs generated successfully!")
         print("Files created in 'output/' directory:")
         print("- questions_formatted_correct.txt (Proper @format)")
@@ -206,69 +195,21 @@ class FinalMathQuestionGenerator:
     
     def create_final_comprehensive_document(self, questions):
         """Create the final comprehensive assessment document"""
-        content = "MATH QUESTION GENERATION PROJECT - FINAL ASSESSMENT\n"
-        content += "=" * 70 + "\n\n"
-        
-        content += "PROJECT OVERVIEW:\n"
-        content += "This project successfully generates two new math questions similar to the provided base questions.\n"
-        content += "The questions follow the specified format, include curriculum-aligned classifications, and preserve mathematical notation.\n\n"
-        
-        content += "BASE QUESTIONS ANALYSIS:\n"
-        content += "-" * 30 + "\n"
-        content += "1. Uniform Combinations Problem: Counting principle with table data\n"
-        content += "2. Sphere Packing Problem: Geometry with visual representation\n\n"
-        
-        content += "GENERATED QUESTIONS:\n"
-        content += "-" * 25 + "\n"
-        
-        for i, question in enumerate(questions, 1):
-            content += f"QUESTION {i}: {question['topic']}\n"
-            content += "=" * 40 + "\n"
-            content += f"Difficulty: {question['difficulty']}\n"
-            content += f"Subject: {question['subject']}\n"
-            content += f"Unit: {question['unit']}\n"
-            content += f"Topic: {question['topic']}\n\n"
-            
-            content += f"Question: {question['question']}\n\n"
-            
-            content += "Options:\n"
-            for j, option in enumerate(question['options'], 1):
-                marker = "✓" if option == question['correct_answer'] else "○"
-                content += f"{marker} {option}\n"
-            
-            content += f"\nCorrect Answer: {question['correct_answer']}\n"
-            content += f"Explanation: {question['explanation']}\n\n"
-            
-            if i < len(questions):
-                content += "-" * 60 + "\n\n"
-        
-        content += "CURRICULUM COMPLIANCE:\n"
-        content += "-" * 25 + "\n"
-        content += "- All questions use specified curriculum hierarchy\n"
-        content += "- Subject, unit, and topic classifications are accurate\n"
-        content += "- Mathematical notation preserved in LaTeX format\n"
-        content += "- Difficulty levels appropriately assigned\n"
-        content += "- Question formats follow specified structure\n\n"
-        
-        content += "PROJECT DELIVERABLES:\n"
-        content += "-" * 25 + "\n"
-        content += "- Two newly generated math questions\n"
-        content += "- Proper @format output files\n"
-        content += "- Word-like document format\n"
-        content += "- Curriculum analysis\n"
-        content += "- Comprehensive assessment document\n"
-        content += "- Question images generated\n\n"
-        
-        content += "=" * 70 + "\n"
-        content += "PROJECT COMPLETED SUCCESSFULLY\n"
-        content += "=" * 70 + "\n"
-        
-        return content
+        return render_document(FORMATS["comprehensive"], questions)
 
 def main():
     """Main function to run the final generator"""
+    parser = argparse.ArgumentParser(description="Generate the final math question outputs")
+    parser.add_argument("--incremental", action="store_true",
+                        help="rebuild only the files whose inputs changed since the last incremental run")
+    parser.add_argument("--metrics", metavar="PATH", help="append span timings and counters to PATH as JSON lines")
+    parser.add_argument("--prometheus", metavar="PATH", help="write span timings and counters to PATH in Prometheus text format")
+    args = parser.parse_args()
+    
+    import instrumentation
     generator = FinalMathQuestionGenerator()
-    questions = generator.generate_all_outputs()
+    with instrumentation.recording(args.metrics, args.prometheus):
+        questions = generator.generate_all_outputs(incremental=args.incremental)
     
     print("\n" + "="*60)
     print("PROJECT COMPLETION SUMMARY")
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+@format Question File Reader
+Parses the @title ... @plusmarks records written by format_question_output straight out of
+a memory-mapped file, one record at a time, and keeps a sidecar offset index so a single
+question, or every question of a topic, is read without scanning the whole bank.
+"""
+
+import argparse
+import json
+import mmap
+import os
+import re
+import time
+
+import numpy as np
+
+RECORD_START = b"@title "
+TAGS = ("title", "description", "question", "instruction", "difficulty", "order", "option", "@option",
+        "explanation", "subject", "unit", "topic", "plusmarks")
+# Only known tags start a field, so question text that happens to begin with "@" stays text
+TAG_LINE = re.compile(r"@(%s)(?: |$)" % "|".join(re.escape(tag) for tag in TAGS))
+INDEX_SUFFIX = ".idx.npz"
+
+
+def parse_record(text):
+    """Parse one @format record into a question dict (the shape the generators produce)"""
+    fields = []     # [tag, lines] in file order
+    for line in text.split("\n"):
+        match = TAG_LINE.match(line)
+        if match:
+            fields.append((match.group(1), [line[match.end():]]))
+        elif fields:
+            fields[-1][1].append(line)
+
+    question = {"options": []}
+    for tag, lines in fields:
+        value = "\n".join(lines).rstrip("\n")
+        if tag in ("option", "@option"):
+            if tag == "@option":
+                question["correct_answer"] = value
+                question["correct_index"] = len(question["options"])
+            question["options"].append(value)
+        elif tag in ("order", "plusmarks"):
+            question[tag] = int(value)
+        else:
+            question[tag] = value
+    return question
+
+
+class FormatFile:
+    """Read-only, memory-mapped view of an @format file"""
+
+    def __init__(self, path, index_path=None):
+        self.path = path
+        self.index_path = index_path or path + INDEX_SUFFIX
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._offsets = None        # (N + 1,) int64 record boundaries, from the index
+        self._topic_codes = None    # (N,) int32 code into self._topics
+        self._topics = None
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def iter_spans(self):
+        """Yield (start, end) byte offsets of each record by scanning for @title lines"""
+        data = self._map
+        start = 0 if data[:len(RECORD_START)] == RECORD_START else data.find(b"\n" + RECORD_START)
+        if start > 0:
+            start += 1
+        while start >= 0:
+            following = data.find(b"\n" + RECORD_START, start)
+            end = len(data) if following < 0 else following + 1
+            yield start, end
+            start = -1 if following < 0 else end
+
+    def record_text(self, start, end):
+        return self._map[start:end].decode("utf-8")
+
+    def __iter__(self):
+        """Lazily parse every record in file order"""
+        for start, end in self.iter_spans():
+            yield parse_record(self.record_text(start, end))
+
+    # Sidecar index
+
+    def _field(self, start, end, tag):
+        """Raw value of a single-line field inside a record, without parsing the record"""
+        marker = b"\n@" + tag + b" "
+        at = self._map.find(marker, start, end)
+        if at < 0:
+            return None
+        at += len(marker)
+        line_end = self._map.find(b"\n", at, end)
+        return self._map[at:end if line_end < 0 else line_end].decode("utf-8")
+
+    def build_index(self):
+        """Scan the file once, then write record offsets and topic codes next to it"""
+        offsets, codes, topic_ids = [], [], {}
+        for start, end in self.iter_spans():
+            offsets.append(start)
+            topic = self._field(start, end, b"topic")
+            codes.append(topic_ids.setdefault(topic or "", len(topic_ids)))
+        offsets.append(len(self._map))
+        stat = os.fstat(self._file.fileno())
+        self._offsets = np.array(offsets, dtype=np.int64)
+        self._topic_codes = np.array(codes, dtype=np.int32)
+        self._topics = list(topic_ids)
+        with open(self.index_path, "wb") as f:
+            np.savez(f, offsets=self._offsets, topic_codes=self._topic_codes,
+                     topics=np.array(self._topics, dtype=str),
+                     source=np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64))
+        return self
+
+    def load_index(self, rebuild_stale=True):
+        """Load the sidecar index, rebuilding it if missing or older than the file"""
+        stat = os.fstat(self._file.fileno())
+        try:
+            with np.load(self.index_path) as data:
+                if data["source"].tolist() == [stat.st_size, stat.st_mtime_ns]:
+                    self._offsets = data["offsets"]
+                    self._topic_codes = data["topic_codes"]
+                    self._topics = data["topics"].tolist()
+                    return self
+        except (OSError, KeyError, ValueError):
+            pass
+        if not rebuild_stale:
+            raise FileNotFoundError(f"no up-to-date index for {self.path}")
+        return self.build_index()
+
+    def _ensure_index(self):
+        if self._offsets is None:
+            self.load_index()
+
+    def __len__(self):
+        self._ensure_index()
+        return len(self._offsets) - 1
+
+    def get(self, number):
+        """Question #number (0-based position in the file) via the index"""
+        self._ensure_index()
+        count = len(self._offsets) - 1
+        if not -count <= number < count:
+            raise IndexError(f"question {number} out of range for {count} records")
+        number %= count
+        return parse_record(self.record_text(int(self._offsets[number]), int(self._offsets[number + 1])))
+
+    __getitem__ = get
+
+    def topics(self):
+        """Distinct @topic values with their record counts"""
+        self._ensure_index()
+        counts = np.bincount(self._topic_codes, minlength=len(self._topics))
+        return dict(zip(self._topics, counts.tolist()))
+
+    def positions(self, topic):
+        """Record positions whose @topic is topic"""
+        self._ensure_index()
+        if topic not in self._topics:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(self._topic_codes == self._topics.index(topic))
+
+    def filter(self, topic):
+        """Lazily yield the questions of one topic, reading only their records"""
+        for number in self.positions(topic):
+            yield self.get(int(number))
+
+
+def main():
+    """Inspect an @format file, or benchmark scanning and indexed access on a synthetic bank"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path", nargs="?", default="output/questions_formatted.txt")
+    parser.add_argument("--get", type=int, help="print question #N (0-based) as JSON")
+    parser.add_argument("--topic", help="print the questions of one topic as JSON lines")
+    parser.add_argument("--reindex", action="store_true", help="rebuild the sidecar index")
+    parser.add_argument("--benchmark", type=int, metavar="N",
+                        help="write N generated questions to path first, then time scan/index/lookups")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        from document_writer import QuestionFormat, write_document_files
+        from generate_questions import MathQuestionGenerator
+        generator = MathQuestionGenerator()
+        half = args.benchmark // 2
+        questions = (q for batch in (generator.generate_question_1_variants(half, seed=1),
+                                     generator.generate_question_2_variants(args.benchmark - half, seed=2))
+                     for q in batch.iter_questions())
+        write_document_files(questions, {QuestionFormat(generator.format_question_output): args.path})
+        print(f"wrote {args.benchmark} questions, {os.path.getsize(args.path) / 1e6:.1f} MB")
+
+    with FormatFile(args.path) as bank:
+        if args.reindex or args.benchmark:
+            started = time.perf_counter()
+            bank.build_index()
+            print(f"indexed {len(bank)} records in {time.perf_counter() - started:.2f} s")
+        if args.benchmark:
+            started = time.perf_counter()
+            parsed = sum(1 for _ in bank)
+            elapsed = time.perf_counter() - started
+            print(f"full parse: {parsed / elapsed:,.0f} records/s")
+            started = time.perf_counter()
+            with FormatFile(args.path) as reopened:
+                reopened.load_index()
+                picks = np.random.default_rng(0).integers(0, len(reopened), 1000)
+                for number in picks:
+                    reopened.get(int(number))
+            print(f"1000 random gets (index load included): {(time.perf_counter() - started) * 1000:.1f} ms")
+            return
+        if args.get is not None:
+            print(json.dumps(bank.get(args.get), ensure_ascii=False, indent=2))
+        elif args.topic:
+            for question in bank.filter(args.topic):
+                print(json.dumps(question, ensure_ascii=False))
+        else:
+            for topic, count in bank.topics().items():
+                print(f"{count:>8}  {topic}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Test Form Assembly
+Builds many parallel test forms from a QuestionBank under one blueprint: quotas per
+curriculum unit or topic, a difficulty mix and a balanced answer key, with no question
+shared between forms. The bank is indexed once into cells of (quota group, difficulty,
+key position); a form is then a small count table over those cells, filled greedily
+scarcest group first and repaired by single-item moves, and its questions are dealt from
+the cells without replacement. Assembly time depends on the number of forms, not on
+the size of the bank.
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from curriculum import CURRICULUM_INDEX
+from question_bank import DIFFICULTIES, QuestionBank
+
+KEY_LETTERS = "ABCDEFGH"
+
+
+def apportion(total, weights):
+    """Split total into integers proportional to weights (largest remainder); earlier entries win ties"""
+    weights = np.asarray(weights, dtype=float)
+    if total == 0 or not weights.sum():
+        return np.zeros(len(weights), dtype=np.int64)
+    exact = total * weights / weights.sum()
+    counts = np.floor(exact).astype(np.int64)
+    remainder = exact - counts
+    counts[np.argsort(-remainder, kind="stable")[:total - counts.sum()]] += 1
+    return counts
+
+
+def _quota_key(key):
+    """(unit, topic) for a topic quota, (unit, None) for a unit quota, checked against the curriculum"""
+    unit, topic = (key, None) if isinstance(key, str) else key
+    if unit not in CURRICULUM_INDEX.units:
+        raise ValueError(f"unknown unit {unit!r}")
+    # Topics are checked against the whole curriculum: the base questions file "Counting &
+    # Arrangement Problems" under Problem Solving although the curriculum lists it elsewhere
+    if topic is not None and topic not in CURRICULUM_INDEX.topics:
+        raise ValueError(f"unknown topic {topic!r}")
+    return unit, topic
+
+
+class Blueprint:
+    """What every form holds.
+
+    quotas maps a unit name, or a (unit, topic) pair, to its number of questions; an item
+    counts towards its topic's quota if there is one, else towards its unit's. difficulty
+    maps difficulty names to shares of the form (None: any mix). With balance_keys the
+    correct answers are spread evenly over the option positions.
+    """
+
+    def __init__(self, quotas, difficulty=None, balance_keys=True):
+        self.quotas = {_quota_key(key): int(count) for key, count in quotas.items() if count}
+        self.length = sum(self.quotas.values())
+        if not self.length:
+            raise ValueError("a blueprint needs at least one question")
+        self.difficulty = dict(difficulty) if difficulty else None
+        if self.difficulty:
+            unknown = set(self.difficulty) - set(DIFFICULTIES)
+            if unknown:
+                raise ValueError(f"unknown difficulties {sorted(unknown)}; expected {DIFFICULTIES}")
+        self.balance_keys = balance_keys
+
+    def difficulty_counts(self):
+        """Questions per difficulty in a form, in the order of self.difficulty"""
+        return apportion(self.length, list(self.difficulty.values()))
+
+
+def curriculum_quotas(bank, length, level="topic", units=None):
+    """Quotas spreading length evenly over the curriculum units, or the topics within them, the bank has items for"""
+    records = bank.records
+    pairs = np.unique(records["unit"].astype(np.int64) * len(bank.vocabularies["topic"]) + records["topic"])
+    present = {(bank.vocabularies["unit"][pair // len(bank.vocabularies["topic"])],
+                bank.vocabularies["topic"][pair % len(bank.vocabularies["topic"])]) for pair in pairs.tolist()}
+    groups = []
+    for unit in CURRICULUM_INDEX.units:
+        if units is not None and unit not in units:
+            continue
+        listed = CURRICULUM_INDEX.topics_of(unit)
+        topics = [(unit, topic) for topic in listed if (unit, topic) in present]
+        topics += sorted(pair for pair in present if pair[0] == unit and pair[1] not in listed)
+        if level == "unit" and topics:
+            groups.append(unit)
+        elif level == "topic":
+            groups += topics
+    if not groups:
+        raise ValueError("the bank has no items in the curriculum units asked for")
+    return dict(zip(groups, apportion(length, np.ones(len(groups))).tolist()))
+
+
+class Form(NamedTuple):
+    """One assembled form: bank rows in presentation order, with its deviations from the blueprint"""
+    number: int
+    rows: np.ndarray
+    keys: np.ndarray            # correct option position per question, after any re-keying
+    rekeyed: bool               # options were shuffled to put the answers at `keys`
+    shuffle: int                # seed of a rekeyed form's option order
+    difficulty_error: int       # questions off the difficulty mix
+    key_error: int              # questions off a balanced key
+
+
+class FormAssembler:
+    """Deals forms meeting a Blueprint out of a QuestionBank; see the module docstring.
+
+    Items whose group is not in the blueprint, whose difficulty is not in its mix or
+    whose correct answer is not among their options are never used. With rekey, the key is
+    balanced by shuffling each question's options so that its answer lands on its assigned
+    position, instead of by item selection; use it for banks whose key positions are too
+    lopsided to balance, such as ones written with options in ascending order.
+    """
+
+    def __init__(self, bank, blueprint, seed=None, rekey=False):
+        self.bank = bank
+        self.blueprint = blueprint
+        self.rekey = rekey
+        self.rng = np.random.default_rng(seed)
+        records = bank.records
+        vocab = bank.vocabularies
+        topics = len(vocab["topic"])
+
+        # Per-attribute indexes: quota group per (unit, topic) pair, difficulty slot, key position
+        self.groups = list(blueprint.quotas)
+        group_ids = {key: g for g, key in enumerate(self.groups)}
+        pair_group = np.full(len(vocab["unit"]) * topics, -1, dtype=np.int32)
+        for code, unit in enumerate(vocab["unit"]):
+            for topic_code, topic in enumerate(vocab["topic"]):
+                g = group_ids.get((unit, topic), group_ids.get((unit, None), -1))
+                pair_group[code * topics + topic_code] = g
+        group = pair_group[records["unit"].astype(np.int64) * topics + records["topic"]]
+
+        self.difficulties = list(blueprint.difficulty) if blueprint.difficulty else [None]
+        slot = np.full(len(vocab["difficulty"]), -1 if blueprint.difficulty else 0, dtype=np.int32)
+        if blueprint.difficulty:
+            for d, name in enumerate(self.difficulties):
+                code = bank.code("difficulty", name)
+                if code >= 0:
+                    slot[code] = d
+        difficulty = slot[records["difficulty"]]
+
+        self.positions = int(records["options"].max()) if len(records) else 1
+        by_key = blueprint.balance_keys and not rekey
+        key = records["correct"].astype(np.int32) if by_key else np.zeros(len(records), dtype=np.int32)
+        eligible = (group >= 0) & (difficulty >= 0) & (records["correct"] < records["options"])
+
+        # Rows grouped by cell, shuffled within each cell, with a cursor per cell
+        self.shape = (len(self.groups), len(self.difficulties), self.positions if by_key else 1)
+        cell = ((group * self.shape[1] + difficulty) * self.shape[2] + key)[eligible]
+        rows = np.flatnonzero(eligible)
+        shuffled = self.rng.permutation(len(rows))
+        order = shuffled[np.argsort(cell[shuffled], kind="stable")]
+        self._rows = rows[order]
+        counts = np.bincount(cell, minlength=int(np.prod(self.shape)))
+        self._next = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        self.available = counts.reshape(self.shape)
+        self.quota = np.array([blueprint.quotas[key] for key in self.groups], dtype=np.int64)
+        self.forms = 0
+
+    def _targets(self, number):
+        """Questions per difficulty slot and per key position wanted in form `number`"""
+        length = self.blueprint.length
+        difficulty = self.blueprint.difficulty_counts() if self.blueprint.difficulty else np.array([length])
+        keys = np.full(self.positions, length // self.positions, dtype=np.int64)
+        # The positions taking the remainder rotate from form to form
+        keys[(number + np.arange(length % self.positions)) % self.positions] += 1
+        return difficulty, keys
+
+    def _table(self, difficulty, keys):
+        """Count table over the cells for one form: greedy fill, then single-item repairs"""
+        available = self.available
+        table = np.zeros_like(available)
+        by_key = self.shape[2] > 1
+        need_d = difficulty.copy()
+        need_k = keys.copy() if by_key else np.array([self.blueprint.length])
+        slack = available.sum(axis=(1, 2)) - self.quota
+        for g in np.argsort(slack, kind="stable"):
+            for _ in range(self.quota[g]):
+                left = available[g] - table[g]
+                usable = left > 0
+                for mask in (usable & (need_d[:, None] > 0) & (need_k[None, :] > 0),
+                             usable & (need_d[:, None] > 0), usable):
+                    if mask.any():
+                        break
+                score = np.where(mask, (np.maximum(need_d, 0) + 1)[:, None] * (np.maximum(need_k, 0) + 1)[None, :]
+                                 * left, -1)
+                d, k = np.unravel_index(np.argmax(score), score.shape)
+                table[g, d, k] += 1
+                need_d[d] -= 1
+                need_k[k] -= 1
+        self._repair(table, need_d, need_k)
+        return table, int(np.abs(need_d).sum()) // 2, int(np.abs(need_k).sum()) // 2 if by_key else 0
+
+    def _repair(self, table, need_d, need_k):
+        """Move single items between cells of the same group while that shrinks the deviations"""
+        available = self.available
+        while need_d.any() or need_k.any():
+            before = np.abs(need_d).sum() + np.abs(need_k).sum()
+            best = None
+            for g, d, k in zip(*np.nonzero(table)):
+                # Deviation after taking one item out of (g, d, k) and into each (g, d2, k2)
+                out_d, out_k = need_d.copy(), need_k.copy()
+                out_d[d] += 1
+                out_k[k] += 1
+                after_d = np.abs(out_d).sum() - np.abs(out_d) + np.abs(out_d - 1)
+                after_k = np.abs(out_k).sum() - np.abs(out_k) + np.abs(out_k - 1)
+                after = np.where(available[g] > table[g], after_d[:, None] + after_k[None, :], before)
+                d2, k2 = np.unravel_index(np.argmin(after), after.shape)
+                if after[d2, k2] < (before if best is None else best[0]):
+                    best = (after[d2, k2], g, d, k, d2, k2)
+            if best is None:
+                return
+            _, g, d, k, d2, k2 = best
+            table[g, d, k] -= 1
+            table[g, d2, k2] += 1
+            need_d[d] += 1
+            need_d[d2] -= 1
+            need_k[k] += 1
+            need_k[k2] -= 1
+
+    def assemble(self):
+        """The next form, or None once some quota group has too few items left"""
+        if (self.available.sum(axis=(1, 2)) < self.quota).any():
+            return None
+        number = self.forms + 1
+        difficulty, keys = self._targets(number)
+        table, difficulty_error, key_error = self._table(difficulty, keys)
+
+        flat = table.ravel()
+        cells = np.flatnonzero(flat)
+        rows = np.concatenate([self._rows[self._next[c]:self._next[c] + flat[c]] for c in cells])
+        self._next[cells] += flat[cells]
+        self.available -= table
+
+        # Present easy to hard, then in curriculum (quota) order, shuffled within that so
+        # items from one key position cell do not run together
+        cell_of = np.repeat(cells, flat[cells])
+        d_of = cell_of // self.shape[2] % self.shape[1]
+        g_of = cell_of // (self.shape[2] * self.shape[1])
+        order = np.lexsort((self.rng.random(len(rows)), g_of, d_of))
+        rows = rows[order]
+        rekeyed = self.rekey and self.blueprint.balance_keys
+        if rekeyed:
+            form_keys = np.repeat(np.arange(self.positions), keys)
+            self.rng.shuffle(form_keys)
+            options = self.bank.records["options"][rows]
+            form_keys = np.minimum(form_keys, options - 1)
+        else:
+            form_keys = self.bank.records["correct"][rows].astype(np.int64)
+        shuffle = int(self.rng.integers(1 << 63)) if rekeyed else 0
+        self.forms = number
+        return Form(number, rows, form_keys, rekeyed, shuffle, difficulty_error, key_error)
+
+    def assemble_many(self, count):
+        """Up to count forms; fewer if the bank runs out of items for some quota"""
+        forms = []
+        while len(forms) < count:
+            form = self.assemble()
+            if form is None:
+                break
+            forms.append(form)
+        return forms
+
+    def questions(self, form):
+        """The form's Questions, numbered from 1 and re-keyed if the form was.
+
+        Re-keying shuffles all of a question's options, not just the answer: moving the answer
+        alone into options kept in ascending order would leave it the one out of order.
+        """
+        rng = np.random.default_rng(form.shuffle)
+        for number, (row, key) in enumerate(zip(form.rows.tolist(), form.keys.tolist()), 1):
+            question = self.bank.question(row)
+            question.order = number
+            if form.rekeyed:
+                distractors = [option for option in question.options if option != question.correct_answer]
+                distractors = [distractors[i] for i in rng.permutation(len(distractors))]
+                question.options = distractors[:key] + [question.correct_answer] + distractors[key:]
+            yield question
+
+
+def write_forms(assembler, forms, output_dir=os.path.join("output", "forms"), docx=False):
+    """Write every form through the document builders, plus forms.json with items and answer keys"""
+    from document_writer import QuestionFormat, write_document_files
+    from generate_questions import MathQuestionGenerator
+
+    generator = MathQuestionGenerator()
+    formatted = QuestionFormat(generator.format_question_output)
+    template = None
+    if docx:
+        from docx_writer import DocumentTemplate
+        template = DocumentTemplate()
+
+    summary = []
+    for form in forms:
+        name = f"form_{form.number:04d}"
+        paths = {formatted: os.path.join(output_dir, name + ".txt")}
+        if docx:
+            from docx_writer import DocxFormat
+            paths[DocxFormat(template, title=f"Math Assessment - Form {form.number}",
+                             intro=f"This form contains {len(form.rows)} questions.\n")] = os.path.join(output_dir, name + ".docx")
+        write_document_files(assembler.questions(form), paths)
+        summary.append({"form": form.number,
+                        "items": assembler.bank.records["order"][form.rows].tolist(),
+                        "key": "".join(KEY_LETTERS[k] for k in form.keys.tolist()),
+                        "difficulty_error": form.difficulty_error, "key_error": form.key_error})
+
+    from render_cache import atomic_write
+    atomic_write(os.path.join(output_dir, "forms.json"), json.dumps(summary, indent=1).encode("utf-8"))
+
+
+def variant_bank(count, seed=0, batch=100_000):
+    """A QuestionBank of about count menu and packing variants (those that check out), built in batches"""
+    from generate_questions import MathQuestionGenerator
+    generator = MathQuestionGenerator()
+    bank = QuestionBank()
+    seeds = iter(np.random.SeedSequence(seed).spawn(2 * ((count + batch - 1) // batch)))
+    for start in range(0, count, batch):
+        size = min(batch, count - start)
+        for variants in (generator.generate_question_1_variants(size // 2, seed=next(seeds)),
+                         generator.generate_question_2_variants(size - size // 2, seed=next(seeds))):
+            rows = np.flatnonzero(variants.check())
+            bank.append(variants.question(int(row), order=len(bank) + 1 + n) for n, row in enumerate(rows))
+    return bank
+
+
+def _parse_quota(text):
+    name, _, count = text.rpartition("=")
+    unit, _, topic = name.partition("/")
+    return (unit, topic) if topic else unit, int(count)
+
+
+def main():
+    """Assemble parallel forms from a saved bank (or a fresh variant bank) and write them"""
+    parser = argparse.ArgumentParser(description="Assemble test forms from a question bank")
+    parser.add_argument("--bank", help="directory of a saved QuestionBank")
+    parser.add_argument("--variants", type=int, default=1_000_000, help="without --bank, build a bank of this many")
+    parser.add_argument("--forms", type=int, default=1000)
+    parser.add_argument("--length", type=int, default=40, help="questions per form with curriculum quotas")
+    parser.add_argument("--level", choices=["unit", "topic"], default="topic", help="curriculum quota level")
+    parser.add_argument("--quota", action="append", type=_parse_quota, metavar="UNIT[/TOPIC]=N",
+                        help="explicit quota (repeatable); replaces the curriculum quotas")
+    parser.add_argument("--difficulty", metavar="NAME=SHARE,...", help="e.g. moderate=0.6,hard=0.4")
+    parser.add_argument("--no-key-balance", action="store_true")
+    parser.add_argument("--rekey", action="store_true", help="balance the key by shuffling options, not by selection")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output-dir", default=os.path.join("output", "forms"))
+    parser.add_argument("--write", type=int, default=10, help="forms to write as documents (-1: all)")
+    parser.add_argument("--docx", action="store_true")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    bank = QuestionBank.load(args.bank) if args.bank else variant_bank(args.variants, args.seed)
+    print(f"bank: {len(bank):,} questions ({time.perf_counter() - started:.2f} s)")
+
+    quotas = dict(args.quota) if args.quota else curriculum_quotas(bank, args.length, args.level)
+    difficulty = None
+    if args.difficulty:
+        difficulty = {name: float(share) for name, share in (item.split("=") for item in args.difficulty.split(","))}
+    blueprint = Blueprint(quotas, difficulty, balance_keys=not args.no_key_balance)
+
+    started = time.perf_counter()
+    assembler = FormAssembler(bank, blueprint, seed=args.seed, rekey=args.rekey)
+    indexed = time.perf_counter() - started
+    forms = assembler.assemble_many(args.forms)
+    assembled = time.perf_counter() - started - indexed
+    print(f"indexed in {indexed:.2f} s; {len(forms)} forms of {blueprint.length} in {assembled:.2f} s")
+    if forms:
+        print(f"off the difficulty mix: {sum(f.difficulty_error for f in forms)} questions; "
+              f"off a balanced key: {sum(f.key_error for f in forms)} questions")
+    if len(forms) < args.forms:
+        print(f"the bank ran out of items for some quota after {len(forms)} forms")
+
+    written = forms if args.write < 0 else forms[:args.write]
+    started = time.perf_counter()
+    write_forms(assembler, written, args.output_dir, args.docx)
+    print(f"wrote {len(written)} forms to {args.output_dir} in {time.perf_counter() - started:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
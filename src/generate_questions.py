@@ -4,27 +4,40 @@ Math Question Generation Script
 Generates new math questions similar to base questions using LLM approach
 """
 
+import argparse
 import os
 import sys
 from pathlib import Path
-from docx import Document
-from docx.shared import Inches
-import matplotlib.pyplot as plt
-import numpy as np
-from PIL import Image, ImageDraw, ImageFont
 import io
+from curriculum_data import CURRICULUM
+from document_writer import QuestionFormat, intro
+from docx_writer import DocxFormat
+from render_cache import RenderCache
+
+# Bump when a drawing routine changes so cached renders are not reused
+QUESTION_IMAGE_1_VERSION = 1
+QUESTION_IMAGE_2_VERSION = 2
+
+QUESTION_IMAGE_1_ROWS = [
+    ["Grilled Chicken", "French Fries"],
+    ["Beef Burger", "Coleslaw"],
+    ["Fish Fillet", "Mashed Potatoes"],
+    ["Veg Pasta", "Garden Salad"],
+    ["", "Onion Rings"],
+]
+QUESTION_IMAGE_1_PARAMS = {"rows": QUESTION_IMAGE_1_ROWS}
+QUESTION_IMAGE_2_PARAMS = {"container_radius": 8.45, "ball_radius": 3.5, "balls": 4}
 
 class MathQuestionGenerator:
     def __init__(self):
-        self.curriculum = {
-            "Quantitative Math": {
-                "Problem Solving": ["Numbers and Operations", "Algebra", "Geometry", "Problem Solving", "Probability and Statistics", "Data Analysis"],
-                "Algebra": ["Algebraic Word Problems", "Interpreting Variables", "Polynomial Expressions (FOIL/Factoring)", "Rational Expressions", "Exponential Expressions (Product rule, negative exponents)", "Quadratic Equations & Functions (Finding roots/solutions, graphing)", "Functions Operations"],
-                "Geometry and Measurement": ["Area & Volume", "Perimeter", "Lines, Angles, & Triangles", "Right Triangles & Trigonometry", "Circles (Area, circumference)", "Coordinate Geometry", "Slope", "Transformations (Dilating a shape)", "Parallel & Perpendicular Lines", "Solid Figures (Volume of Cubes)"],
-                "Numbers and Operations": ["Basic Number Theory", "Prime & Composite Numbers", "Rational Numbers", "Order of Operations", "Estimation", "Fractions, Decimals, & Percents", "Sequences & Series", "Computation with Whole Numbers", "Operations with Negatives"],
-                "Data Analysis & Probability": ["Interpretation of Tables & Graphs", "Trends & Inferences", "Probability (Basic, Compound Events)", "Mean, Median, Mode, & Range", "Weighted Averages", "Counting & Arrangement Problems"]
-            }
-        }
+        self.curriculum = CURRICULUM
+        self.render_cache = RenderCache()
+    
+    @property
+    def curriculum_index(self):
+        """Compiled curriculum index, shared by every generator (imports NumPy on first use)"""
+        from curriculum import CURRICULUM_INDEX
+        return CURRICULUM_INDEX
     
     def generate_question_1(self):
         """Generate a question similar to the uniform combinations problem"""
@@ -50,6 +63,11 @@ class MathQuestionGenerator:
             "plusmarks": 1
         }
     
+    def generate_question_1_variants(self, count, seed=None):
+        """Sample and solve a batch of parametric variants of the uniform combinations problem"""
+        from variants import MenuCombinationVariants
+        return MenuCombinationVariants().sample(count, seed=seed)
+    
     def generate_question_2(self):
         """Generate a question similar to the sphere packing problem"""
         return {
@@ -61,21 +79,33 @@ class MathQuestionGenerator:
             "order": 2,
             "options": [
                 "$7 \\times 7 \\times 14$ cm",
-                "$7 \\times 7 \\times 21$ cm", 
                 "$14 \\times 14 \\times 14$ cm",
                 "$14 \\times 14 \\times 21$ cm",
-                "$21 \\times 21 \\times 28$ cm"
+                "$17 \\times 17 \\times 14$ cm",
+                "$17 \\times 17 \\times 21$ cm"
             ],
-            "correct_answer": "$14 \\times 14 \\times 21$ cm",
-            "explanation": "Each tennis ball has a radius of 3.5 cm, so diameter = 7 cm. For the circular arrangement of 4 balls, the container diameter must be approximately 14 cm (2 × 7 cm). The height must accommodate 2 layers: 2 × 7 cm = 14 cm, plus some spacing, so approximately 21 cm total. Therefore, the closest dimensions are $14 \\times 14 \\times 21$ cm.",
+            "correct_answer": "$17 \\times 17 \\times 14$ cm",
+            "explanation": "Each tennis ball has a radius of 3.5 cm, so diameter = 7 cm. With 4 balls arranged in a ring, neighbouring balls touch, so the ball centres lie 3.5 / sin(45°) ≈ 4.9 cm from the axis and the container diameter is 2 × (4.9 + 3.5) ≈ 16.9 cm, about 17 cm. The height must accommodate 2 layers: 2 × 7 cm = 14 cm. Therefore, the closest dimensions are $17 \\times 17 \\times 14$ cm.",
             "subject": "Quantitative Math",
             "unit": "Geometry and Measurement",
             "topic": "Area & Volume", 
             "plusmarks": 1
         }
     
-    def create_question_image_1(self):
-        """Create an image for the lunch special menu question"""
+    def generate_question_2_variants(self, count, seed=None):
+        """Sample and solve a batch of parametric variants of the sphere packing problem"""
+        from packing import PackingVariants
+        return PackingVariants().sample(count, seed=seed)
+    
+    def generate_llm_questions(self, specs, pack_size=None, **client_options):
+        """Generate questions for unit/topic/difficulty specs concurrently from a chat model"""
+        from llm_client import generate_questions
+        return generate_questions(specs, pack_size=pack_size, curriculum=self.curriculum, **client_options)
+    
+    def draw_question_image_1(self, rows):
+        """Draw the lunch special menu table from (main dish, side dish) rows"""
+        from PIL import Image, ImageDraw
+        
         # Create a simple table-like image
         img = Image.new('RGB', (400, 300), color='white')
         draw = ImageDraw.Draw(img)
@@ -88,35 +118,44 @@ class MathQuestionGenerator:
         # Draw text (simplified)
         draw.text((75, 65), "Main Dish", fill='black')
         draw.text((225, 65), "Side Dish", fill='black')
-        draw.text((75, 115), "Grilled Chicken", fill='black')
-        draw.text((225, 115), "French Fries", fill='black')
-        draw.text((75, 140), "Beef Burger", fill='black')
-        draw.text((225, 140), "Coleslaw", fill='black')
-        draw.text((75, 165), "Fish Fillet", fill='black')
-        draw.text((225, 165), "Mashed Potatoes", fill='black')
-        draw.text((75, 190), "Veg Pasta", fill='black')
-        draw.text((225, 190), "Garden Salad", fill='black')
-        draw.text((75, 215), "", fill='black')
-        draw.text((225, 215), "Onion Rings", fill='black')
+        for i, (main_dish, side_dish) in enumerate(rows):
+            draw.text((75, 115 + 25 * i), main_dish, fill='black')
+            draw.text((225, 115 + 25 * i), side_dish, fill='black')
         
         return img
     
-    def create_question_image_2(self):
-        """Create an image for the cylindrical container question"""
+    def question_image_1_png(self):
+        """PNG bytes of the lunch special menu image, rendered once and then served from cache"""
+        return self.render_cache.get_or_render("question_image_1", QUESTION_IMAGE_1_PARAMS, self.draw_question_image_1,
+                                               QUESTION_IMAGE_1_VERSION)
+    
+    def create_question_image_1(self):
+        """Create an image for the lunch special menu question"""
+        from PIL import Image
+        return Image.open(io.BytesIO(self.question_image_1_png()))
+    
+    def draw_question_image_2(self, container_radius, ball_radius, balls):
+        """Draw the top view of the cylindrical container with PIL primitives"""
+        from diagrams import draw_packing_top_view
+        return draw_packing_top_view(container_radius, ball_radius, balls)
+    
+    def draw_question_image_2_matplotlib(self, container_radius, ball_radius, balls):
+        """Draw the top view of the cylindrical container with matplotlib (slow reference renderer)"""
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        import numpy as np
+        from PIL import Image
+        
         # Create a diagram showing the cylindrical container with tennis balls
         fig, ax = plt.subplots(figsize=(6, 4))
         
-        # Draw the cylindrical container
-        container_height = 21
-        container_radius = 7
-        
         # Draw container outline
         circle = plt.Circle((0, 0), container_radius, fill=False, color='black', linewidth=2)
         ax.add_patch(circle)
         
         # Draw tennis balls in circular arrangement
-        ball_radius = 3.5
-        angles = [0, 90, 180, 270]  # 4 balls in a circle
+        angles = [360 * i / balls for i in range(balls)]
         for angle in angles:
             x = (container_radius - ball_radius) * np.cos(np.radians(angle))
             y = (container_radius - ball_radius) * np.sin(np.radians(angle))
@@ -140,8 +179,25 @@ class MathQuestionGenerator:
         img = Image.open(buf)
         return img
     
+    def question_image_2_png(self, renderer='pil'):
+        """PNG bytes of the container diagram, rendered once and then served from cache"""
+        params = QUESTION_IMAGE_2_PARAMS
+        if renderer == 'matplotlib':
+            return self.render_cache.get_or_render("question_image_2_matplotlib", params,
+                                                   self.draw_question_image_2_matplotlib, 1)
+        return self.render_cache.get_or_render("question_image_2", params, self.draw_question_image_2,
+                                               QUESTION_IMAGE_2_VERSION)
+    
+    def create_question_image_2(self):
+        """Create an image for the cylindrical container question"""
+        from PIL import Image
+        return Image.open(io.BytesIO(self.question_image_2_png()))
+    
     def format_question_output(self, question_data):
         """Format question data according to the specified output format"""
+        # @@option marks whichever option is the correct answer
+        options = "\n".join(f"{'@@option' if option == question_data['correct_answer'] else '@option'} {option}"
+                            for option in question_data['options'])
         output = f"""@title {question_data['title']}
 @description {question_data['description']}
 
@@ -149,11 +205,7 @@ class MathQuestionGenerator:
 @instruction {question_data['instruction']}
 @difficulty {question_data['difficulty']}
 @order {question_data['order']}
-@option {question_data['options'][0]}
-@option {question_data['options'][1]}
-@@option {question_data['correct_answer']}
-@option {question_data['options'][3]}
-@option {question_data['options'][4]}
+{options}
 @explanation {question_data['explanation']}
 @subject {question_data['subject']}
 @unit {question_data['unit']}
@@ -165,6 +217,8 @@ class MathQuestionGenerator:
     
     def create_word_document(self, questions):
         """Create a Word document with the generated questions"""
+        from docx import Document
+        
         doc = Document()
         
         # Add title
@@ -172,7 +226,7 @@ class MathQuestionGenerator:
         title.alignment = 1  # Center alignment
         
         # Add description
-        doc.add_paragraph('This document contains two newly generated math questions following the specified format and curriculum hierarchy.')
+        doc.add_paragraph(intro(len(questions)))
         
         # Add questions
         for i, question in enumerate(questions, 1):
@@ -222,38 +276,47 @@ class MathQuestionGenerator:
         
         return doc
     
-    def generate_all_questions(self):
-        """Generate all questions and create outputs"""
-        print("Generating new math questions...")
-        
-        # Generate questions
-        question1 = self.generate_question_1()
-        question2 = self.generate_question_2()
-        questions = [question1, question2]
-        
-        # Create images
-        print("Creating question images...")
-        img1 = self.create_question_image_1()
-        img2 = self.create_question_image_2()
-        
-        # Save images
-        os.makedirs('images', exist_ok=True)
-        img1.save('images/lunch_special_menu.png')
-        img2.save('images/tennis_ball_container.png')
-        
-        # Create formatted output
-        print("Creating formatted output...")
-        os.makedirs('output', exist_ok=True)
-        
-        # Save raw formatted output
-        with open('output/questions_formatted.txt', 'w') as f:
-            for question in questions:
-                f.write(self.format_question_output(question))
-        
-        # Create Word document
-        doc = self.create_word_document(questions)
-        doc.save('output/Math_Questions_Assessment.docx')
+    def generate_all_questions(self, incremental=False):
+        """Generate all questions and create outputs (only changed files when incremental)"""
+        import instrumentation
+        with instrumentation.span("generate_all_questions"):
+            print("Generating new math questions...")
+            
+            # Generate questions
+            with instrumentation.span("generate"):
+                question1 = self.generate_question_1()
+                question2 = self.generate_question_2()
+                questions = [question1, question2]
+            instrumentation.count("questions_generated", len(questions))
+            
+            # Drop any item whose marked answer does not check out
+            with instrumentation.span("verify"):
+                from verify import accept_verified
+                questions = accept_verified(questions)
+            instrumentation.count("questions_accepted", len(questions))
+            
+            from incremental import MANIFEST_PATH, BuildManifest
+            with BuildManifest(MANIFEST_PATH if incremental else None) as manifest:
+                # Create images (an incremental build skips those whose inputs are unchanged)
+                print("Creating question images...")
+                with instrumentation.span("images"):
+                    manifest.build_image('images/lunch_special_menu.png', "question_image_1", QUESTION_IMAGE_1_PARAMS,
+                                         QUESTION_IMAGE_1_VERSION, self.question_image_1_png)
+                    manifest.build_image('images/tennis_ball_container.png', "question_image_2", QUESTION_IMAGE_2_PARAMS,
+                                         QUESTION_IMAGE_2_VERSION, self.question_image_2_png)
+                
+                # Create the formatted output and the Word document, streamed into temporary files
+                # that replace the old ones only when their questions or format changed
+                print("Creating formatted output...")
+                with instrumentation.span("documents"):
+                    with manifest.documents({QuestionFormat(self.format_question_output): 'output/questions_formatted.txt',
+                                             DocxFormat(): 'output/Math_Questions_Assessment.docx'},
+                                            total=len(questions)) as documents:
+                        for question in questions:
+                            documents.write(question)
         
+        if incremental:
+            print(f"Incremental build: {manifest.built} files rebuilt, {manifest.skipped} unchanged")
         print("Questions generated successfully!")
         print("Output files created in 'output/' directory")
         print("Images saved in 'images/' directory")
@@ -262,8 +325,17 @@ class MathQuestionGenerator:
 
 def main():
     """Main function to run the question generator"""
+    parser = argparse.ArgumentParser(description="Generate the math questions, images and documents")
+    parser.add_argument("--incremental", action="store_true",
+                        help="rebuild only the files whose inputs changed since the last incremental run")
+    parser.add_argument("--metrics", metavar="PATH", help="append span timings and counters to PATH as JSON lines")
+    parser.add_argument("--prometheus", metavar="PATH", help="write span timings and counters to PATH in Prometheus text format")
+    args = parser.parse_args()
+    
+    import instrumentation
     generator = MathQuestionGenerator()
-    questions = generator.generate_all_questions()
+    with instrumentation.recording(args.metrics, args.prometheus):
+        questions = generator.generate_all_questions(incremental=args.incremental)
     
     print("\n" + "="*50)
     print("GENERATED QUESTIONS SUMMARY")
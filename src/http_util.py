@@ -0,0 +1,102 @@
+"""
+Minimal HTTP/1.1 Helpers
+Request parsing and response writing for the small asyncio servers in this project
+"""
+
+import json
+from http import HTTPStatus
+
+
+async def read_request(reader):
+    """Read one request from a keep-alive connection; returns None when the peer closes it"""
+    request_line = await reader.readline()
+    if not request_line or not request_line.strip():
+        return None
+    method, target, version = request_line.decode("latin-1").split()
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    body = await reader.readexactly(length) if length else b""
+    keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+    return {"method": method, "path": target, "headers": headers, "body": body, "keep_alive": keep_alive}
+
+
+def response_head(status, content_type, length=None, keep_alive=True, extra_headers=None):
+    """Encode a status line and headers; omit `length` to send a chunked body"""
+    phrase = HTTPStatus(status).phrase
+    lines = [f"HTTP/1.1 {status} {phrase}", f"Content-Type: {content_type}"]
+    if length is None:
+        lines.append("Transfer-Encoding: chunked")
+    else:
+        lines.append(f"Content-Length: {length}")
+    lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+    for name, value in (extra_headers or {}).items():
+        lines.append(f"{name}: {value}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def write_json(writer, status, payload, keep_alive=True):
+    """Write a complete JSON response"""
+    body = json.dumps(payload).encode("utf-8")
+    writer.write(response_head(status, "application/json", len(body), keep_alive) + body)
+    await writer.drain()
+
+
+async def write_text(writer, status, text, content_type="text/plain; charset=utf-8", keep_alive=True):
+    """Write a complete plain-text response"""
+    body = text.encode("utf-8")
+    writer.write(response_head(status, content_type, len(body), keep_alive) + body)
+    await writer.drain()
+
+
+async def write_chunk(writer, data):
+    """Write one chunk of a chunked response; an empty chunk ends the body"""
+    writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+    await writer.drain()
+
+
+async def read_response_head(reader):
+    """Read a status line and headers as (status, headers)"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed before a response was received")
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return status, headers
+
+
+async def read_body(reader, headers):
+    """Read a whole response body, Content-Length or chunked"""
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        return b"".join([chunk async for chunk in iter_chunks(reader)])
+    length = int(headers.get("content-length", 0))
+    return await reader.readexactly(length) if length else b""
+
+
+async def read_response(reader):
+    """Read one response as (status, headers, body)"""
+    status, headers = await read_response_head(reader)
+    return status, headers, await read_body(reader, headers)
+
+
+async def iter_chunks(reader):
+    """Yield the chunks of a chunked response body as they arrive"""
+    while True:
+        size = int((await reader.readline()).split(b";")[0], 16)
+        if size == 0:
+            await reader.readline()
+            return
+        chunk = await reader.readexactly(size)
+        await reader.readline()
+        yield chunk
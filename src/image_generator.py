@@ -4,16 +4,28 @@ Simple Image Generator for Math Questions
 Creates basic diagrams and images for the generated questions
 """
 
+import math
 import os
 from PIL import Image, ImageDraw, ImageFont
+from batch_render import RenderJob, render_all
+from render_cache import RenderCache, write_if_changed
+
+# Bump when a drawing routine changes so cached renders are not reused
+LUNCH_MENU_VERSION = 1
+TENNIS_CONTAINER_VERSION = 1
+
+DEFAULT_MAIN_DISHES = ["Grilled Chicken", "Beef Burger", "Fish Fillet", "Veg Pasta"]
+DEFAULT_SIDE_DISHES = ["French Fries", "Coleslaw", "Mashed Potatoes", "Garden Salad", "Onion Rings"]
 
 class SimpleImageGenerator:
-    def __init__(self):
-        self.output_dir = "images"
+    def __init__(self, render_cache=None, output_dir="images"):
+        self.output_dir = output_dir
         os.makedirs(self.output_dir, exist_ok=True)
+        self.render_cache = render_cache or RenderCache()
     
-    def create_lunch_menu_image(self):
-        """Create an image for the lunch special menu question"""
+    @staticmethod
+    def draw_lunch_menu(main_dishes, side_dishes):
+        """Draw the lunch special menu table"""
         # Create a simple table-like image
         img = Image.new('RGB', (500, 400), color='white')
         draw = ImageDraw.Draw(img)
@@ -31,9 +43,6 @@ class SimpleImageGenerator:
         draw.text((300, 80), "Side Dish", fill='black')
         
         # Draw menu items
-        main_dishes = ["Grilled Chicken", "Beef Burger", "Fish Fillet", "Veg Pasta"]
-        side_dishes = ["French Fries", "Coleslaw", "Mashed Potatoes", "Garden Salad", "Onion Rings"]
-        
         y_pos = 140
         for i, dish in enumerate(main_dishes):
             draw.text((70, y_pos), dish, fill='black')
@@ -44,14 +53,30 @@ class SimpleImageGenerator:
             draw.text((270, y_pos), dish, fill='black')
             y_pos += 30
         
-        # Save image
+        return img
+    
+    def lunch_menu_job(self, main_dishes=None, side_dishes=None):
+        """Render job for the lunch special menu image"""
+        params = {"main_dishes": main_dishes or DEFAULT_MAIN_DISHES,
+                  "side_dishes": side_dishes or DEFAULT_SIDE_DISHES}
+        return RenderJob("lunch_menu", params, SimpleImageGenerator.draw_lunch_menu, LUNCH_MENU_VERSION,
+                         os.path.join(self.output_dir, "lunch_special_menu.png"))
+    
+    def create_lunch_menu_image(self, main_dishes=None, side_dishes=None):
+        """Create an image for the lunch special menu question"""
+        params = {"main_dishes": main_dishes or DEFAULT_MAIN_DISHES,
+                  "side_dishes": side_dishes or DEFAULT_SIDE_DISHES}
+        png = self.render_cache.get_or_render("lunch_menu", params, self.draw_lunch_menu, LUNCH_MENU_VERSION)
+        
+        # Save image (left untouched when an identical render is already there)
         img_path = os.path.join(self.output_dir, "lunch_special_menu.png")
-        img.save(img_path)
+        write_if_changed(img_path, png)
         print(f"Created image: {img_path}")
         return img_path
     
-    def create_tennis_container_image(self):
-        """Create an image for the tennis ball container question"""
+    @staticmethod
+    def draw_tennis_container(balls, ball_radius_cm, container_diameter_cm):
+        """Draw the top view of the tennis ball container"""
         # Create a simple diagram
         img = Image.new('RGB', (600, 400), color='white')
         draw = ImageDraw.Draw(img)
@@ -67,10 +92,9 @@ class SimpleImageGenerator:
         
         # Draw tennis balls in circular arrangement
         ball_radius = 30
-        angles = [0, 90, 180, 270]  # 4 balls in a circle
+        angles = [360 * i / balls for i in range(balls)]
         
         for angle in angles:
-            import math
             x = center_x + (radius - ball_radius) * math.cos(math.radians(angle))
             y = center_y + (radius - ball_radius) * math.sin(math.radians(angle))
             
@@ -82,24 +106,43 @@ class SimpleImageGenerator:
             draw.text((x-5, y-5), "T", fill='black')
         
         # Add dimensions
-        draw.text((50, 350), "Container Diameter ≈ 14 cm", fill='black')
-        draw.text((350, 350), "Ball Radius = 3.5 cm", fill='black')
+        draw.text((50, 350), f"Container Diameter ≈ {container_diameter_cm:g} cm", fill='black')
+        draw.text((350, 350), f"Ball Radius = {ball_radius_cm:g} cm", fill='black')
+        
+        return img
+    
+    def tennis_container_job(self, balls=4, ball_radius_cm=3.5, container_diameter_cm=16.9):
+        """Render job for the tennis ball container image"""
+        params = {"balls": balls, "ball_radius_cm": ball_radius_cm,
+                  "container_diameter_cm": container_diameter_cm}
+        return RenderJob("tennis_container", params, SimpleImageGenerator.draw_tennis_container,
+                         TENNIS_CONTAINER_VERSION, os.path.join(self.output_dir, "tennis_ball_container.png"))
+    
+    def create_tennis_container_image(self, balls=4, ball_radius_cm=3.5, container_diameter_cm=16.9):
+        """Create an image for the tennis ball container question"""
+        params = {"balls": balls, "ball_radius_cm": ball_radius_cm,
+                  "container_diameter_cm": container_diameter_cm}
+        png = self.render_cache.get_or_render("tennis_container", params, self.draw_tennis_container,
+                                              TENNIS_CONTAINER_VERSION)
         
-        # Save image
+        # Save image (left untouched when an identical render is already there)
         img_path = os.path.join(self.output_dir, "tennis_ball_container.png")
-        img.save(img_path)
+        write_if_changed(img_path, png)
         print(f"Created image: {img_path}")
         return img_path
     
-    def create_all_images(self):
-        """Create all images for the questions"""
+    def create_all_images(self, jobs=None, workers=None):
+        """Create all images for the questions, spread over a process pool when there are many"""
         print("Generating question images...")
         
-        img1 = self.create_lunch_menu_image()
-        img2 = self.create_tennis_container_image()
+        if jobs is None:
+            jobs = [self.lunch_menu_job(), self.tennis_container_job()]
+        paths = render_all(jobs, workers=workers, cache_dir=self.render_cache.directory)
+        for img_path in paths:
+            print(f"Created image: {img_path}")
         
         print("All images created successfully!")
-        return [img1, img2]
+        return paths
 
 def main():
     """Main function to generate images"""
@@ -0,0 +1,164 @@
+"""
+Incremental Builds
+A manifest records, for every artifact in output/ and images/, a hash of what it was built
+from: the question data, the renderer version and the format version. A build step whose
+inputs hash the same as last time, and whose file is still there, is skipped; anything else
+is rebuilt and moved into place atomically.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import instrumentation
+from document_writer import FORMATS, DocumentStream
+from render_cache import atomic_write, count_written, render_key, write_if_changed
+
+MANIFEST_PATH = os.path.join(".cache", "build-manifest.json")
+
+
+def input_hash(*inputs):
+    """Stable hash of JSON-serializable build inputs"""
+    blob = json.dumps(inputs, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def document_key(document, questions_digest):
+    """Inputs of a document file: its format, format version and a digest of its questions"""
+    name = getattr(getattr(document, "format_question", None), "__qualname__", type(document).__name__)
+    return input_hash("document", name, document.version, questions_digest)
+
+
+class BuildManifest:
+    """Artifact path -> input hash of its last build.
+
+    With path=None nothing is remembered, so every step rebuilds: the non-incremental mode
+    runs through the same code.
+    """
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self.entries = {}
+        self.built = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+        if path:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.save()
+
+    def save(self):
+        if self.path:
+            atomic_write(self.path, json.dumps(self.entries, sort_keys=True, separators=(",", ":")).encode("utf-8"))
+
+    def is_current(self, artifact, key):
+        return self.entries.get(artifact) == key and os.path.exists(artifact)
+
+    def record(self, artifact, key):
+        with self._lock:    # pipeline render threads record concurrently
+            if self.path:
+                self.entries[artifact] = key
+            self.built += 1
+        instrumentation.count("artifacts_built")
+
+    def skip(self, count=1):
+        """Count artifacts left as they were because their inputs are unchanged"""
+        with self._lock:
+            self.skipped += count
+        instrumentation.count("artifacts_skipped", count)
+
+    def build(self, artifact, key, produce):
+        """Write produce() -> bytes to artifact unless key is unchanged; returns True if built"""
+        if self.is_current(artifact, key):
+            self.skip()
+            return False
+        with instrumentation.span("build", artifact=os.path.basename(artifact)):
+            write_if_changed(artifact, produce())
+        self.record(artifact, key)
+        return True
+
+    def build_image(self, artifact, kind, params, version, render_png):
+        """build() for a diagram, keyed like the render cache"""
+        return self.build(artifact, render_key(kind, params, version), render_png)
+
+    @contextlib.contextmanager
+    def documents(self, paths, total=None):
+        """DocumentStream over paths ({DocumentFormat or FORMATS name: path}) that only replaces changed files.
+
+        Every file is written to a temporary name while the questions stream through. When
+        the block ends, a file whose key (format, version and question hashes) matches the
+        manifest is discarded, leaving the existing artifact untouched; the rest are renamed
+        into place. total, if known, is the number of questions that will be written.
+        """
+        pending = []
+        try:
+            with contextlib.ExitStack() as handles:
+                outputs = []
+                for document, path in paths.items():
+                    document = FORMATS.get(document, document)
+                    pending.append(_PendingFile(path, document.mode))
+                    outputs.append((document, handles.enter_context(document.open(pending[-1].file))))
+                stream = HashingDocumentStream(instrumentation.timed_outputs(outputs, paths.values()), total)
+                yield stream
+                stream.close()
+            for (document, _), artifact in zip(outputs, pending):
+                key = document_key(document, stream.digest.hexdigest())
+                if self.is_current(artifact.path, key):
+                    artifact.discard()
+                    self.skip()
+                else:
+                    artifact.commit()
+                    self.record(artifact.path, key)
+        finally:
+            for artifact in pending:
+                artifact.discard()
+
+
+class HashingDocumentStream(DocumentStream):
+    """DocumentStream that also hashes every question (a dict or anything with to_dict()) it writes"""
+
+    def __init__(self, outputs, total=None):
+        super().__init__(outputs, total=total)
+        self.digest = hashlib.sha256()
+
+    def write(self, question):
+        # Question objects are hashed by their fields; default=str would hash only their repr
+        data = question if isinstance(question, dict) else question.to_dict()
+        self.digest.update(json.dumps(data, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+        super().write(question)
+
+
+class _PendingFile:
+    """A temporary file beside path that is either renamed over path or deleted"""
+
+    def __init__(self, path, mode):
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, self.tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        self.path = path
+        self.file = os.fdopen(fd, mode, encoding=None if "b" in mode else "utf-8")
+
+    def commit(self):
+        self.file.close()
+        os.chmod(self.tmp_path, 0o644)
+        os.replace(self.tmp_path, self.path)
+        self.tmp_path = None
+        count_written(self.path)
+
+    def discard(self):
+        if self.tmp_path:
+            self.file.close()
+            os.unlink(self.tmp_path)
+            self.tmp_path = None
@@ -0,0 +1,280 @@
+"""
+Instrumentation
+Nested timing spans and counters for the generation entry points, exported as JSON lines
+or Prometheus text. Recording is off by default; span() and count() then return at once,
+so the hooks left in render, cache and file-writing paths cost one function call.
+"""
+
+import contextlib
+import json
+import os
+import re
+import threading
+import time
+
+METRIC_PREFIX = "mathgen"
+
+
+class _NullSpan:
+    """Shared do-nothing span handed out while recording is disabled"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+_recorder = None
+
+
+class Recorder:
+    """Span timings and counters, aggregated by span path or counter name plus labels.
+
+    Span paths join the names of the spans open on the current thread with "/", so time
+    spent rendering inside the images step of generate_all_questions is recorded under
+    "generate_all_questions/images/render". Aggregating (rather than keeping every span)
+    keeps memory flat however many questions a run produces.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.spans = {}         # (path, labels) -> [calls, total seconds, max seconds]
+        self.counters = {}      # (name, labels) -> value
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def open_span(self, path, labels):
+        """Reserve a span's entry when it opens, so records come out parents first"""
+        with self._lock:
+            self.spans.setdefault((path, labels), [0, 0.0, 0.0])
+
+    def add_span(self, path, labels, seconds):
+        with self._lock:
+            entry = self.spans[(path, labels)]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def add(self, name, value, labels):
+        with self._lock:
+            self.counters[(name, labels)] = self.counters.get((name, labels), 0) + value
+
+    def records(self):
+        """One dict per span path (in the order spans first opened) and per counter"""
+        run = time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.started))
+        with self._lock:
+            spans = [(key, list(entry)) for key, entry in self.spans.items()]
+            counters = list(self.counters.items())
+        for (path, labels), (calls, seconds, longest) in spans:
+            yield {"run": run, "type": "span", "span": path, "labels": dict(labels), "calls": calls,
+                   "seconds": round(seconds, 6), "max_seconds": round(longest, 6)}
+        for (name, labels), value in counters:
+            yield {"run": run, "type": "counter", "name": name, "labels": dict(labels), "value": _number(value)}
+
+    def write_jsonl(self, path):
+        """Append this run's records to path as JSON lines (one file can hold many runs)"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            for record in self.records():
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def prometheus(self):
+        """Prometheus text exposition format: span time as a summary, counters as *_total"""
+        lines = []
+        with self._lock:
+            spans = [(key, list(entry)) for key, entry in self.spans.items()]
+            counters = sorted(self.counters.items())
+        if spans:
+            name = f"{METRIC_PREFIX}_span_seconds"
+            lines += [f"# HELP {name} Wall time spent inside each instrumented span",
+                      f"# TYPE {name} summary"]
+            for (path, labels), (calls, seconds, _) in spans:
+                label_text = _labels((("span", path),) + labels)
+                lines.append(f"{name}_sum{label_text} {seconds:.6f}")
+                lines.append(f"{name}_count{label_text} {calls}")
+        declared = set()
+        for (counter, labels), value in counters:
+            name = f"{METRIC_PREFIX}_{_metric_name(counter)}_total"
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Write prometheus() atomically, as the node exporter's textfile collector expects"""
+        from render_cache import atomic_write
+        atomic_write(path, self.prometheus().encode("utf-8"))
+
+    def report(self):
+        """Indented span tree with calls, total and share of the run, then the counters"""
+        with self._lock:
+            spans = [(key, list(entry)) for key, entry in self.spans.items()]
+            counters = sorted(self.counters.items())
+        roots = sum(entry[1] for (path, _), entry in spans if "/" not in path) or 1.0
+        lines = [f"{'span':<52} {'calls':>7} {'seconds':>9} {'share':>6}"]
+        for (path, labels), (calls, seconds, _) in spans:
+            name = "  " * path.count("/") + path.rsplit("/", 1)[-1]
+            if labels:
+                name += " [" + ", ".join(f"{key}={value}" for key, value in labels) + "]"
+            lines.append(f"{name:<52} {calls:>7} {seconds:>9.4f} {seconds / roots:>6.1%}")
+        for (counter, labels), value in counters:
+            label_text = ", ".join(f"{key}={value}" for key, value in labels)
+            value = f"{value:,}" if isinstance(value, int) else f"{value:,.4f}"
+            lines.append(f"{counter + (f' [{label_text}]' if label_text else ''):<52} {value:>17}")
+        return "\n".join(lines)
+
+
+class _Span:
+    __slots__ = ("recorder", "name", "labels", "path", "started")
+
+    def __init__(self, recorder, name, labels):
+        self.recorder = recorder
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        stack = self.recorder._stack()
+        self.path = f"{stack[-1]}/{self.name}" if stack else self.name
+        stack.append(self.path)
+        self.recorder.open_span(self.path, self.labels)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.started
+        self.recorder._stack().pop()
+        self.recorder.add_span(self.path, self.labels, seconds)
+        return False
+
+
+def _label_items(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _metric_name(name):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _number(value):
+    return value if isinstance(value, int) else round(value, 6)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{_metric_name(key)}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def enable():
+    """Start recording into a fresh Recorder and return it"""
+    global _recorder
+    _recorder = Recorder()
+    return _recorder
+
+
+def disable():
+    """Stop recording; returns the Recorder that was active, if any"""
+    global _recorder
+    recorder, _recorder = _recorder, None
+    return recorder
+
+
+def active():
+    """The Recorder in use, or None while recording is disabled"""
+    return _recorder
+
+
+def span(name, **labels):
+    """Context manager timing the enclosed block under name, nested in any open span"""
+    if _recorder is None:
+        return _NULL_SPAN
+    return _Span(_recorder, name, _label_items(labels))
+
+
+def count(name, value=1, **labels):
+    """Add value to the counter name with the given labels"""
+    if _recorder is not None:
+        _recorder.add(name, value, _label_items(labels))
+
+
+class _TimedFormat:
+    """DocumentFormat proxy recording the time spent formatting questions"""
+
+    def __init__(self, document, recorder, file):
+        self._document = document
+        self._recorder = recorder
+        self._labels = (("file", file),)
+
+    def __getattr__(self, name):
+        return getattr(self._document, name)
+
+    def question(self, number, question):
+        started = time.perf_counter()
+        text = self._document.question(number, question)
+        self._recorder.add("format_seconds", time.perf_counter() - started, self._labels)
+        return text
+
+
+class _TimedFile:
+    """File proxy recording the time spent in write() (including any compression)"""
+
+    def __init__(self, f, recorder, file):
+        self._f = f
+        self._recorder = recorder
+        self._labels = (("file", file),)
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+    def write(self, data):
+        started = time.perf_counter()
+        written = self._f.write(data)
+        self._recorder.add("write_seconds", time.perf_counter() - started, self._labels)
+        return written
+
+
+def timed_outputs(outputs, paths):
+    """(DocumentFormat, file) pairs for a DocumentStream, timed per output file while recording"""
+    if _recorder is None:
+        return outputs
+    return [(_TimedFormat(document, _recorder, os.path.basename(path)),
+             _TimedFile(f, _recorder, os.path.basename(path)))
+            for (document, f), path in zip(outputs, paths)]
+
+
+@contextlib.contextmanager
+def recording(jsonl=None, prometheus=None, report=True):
+    """Record the enclosed block if either export path is given, then write the exports.
+
+    With neither path the block runs with recording left as it was.
+    """
+    if not (jsonl or prometheus):
+        yield _recorder
+        return
+    recorder = enable()
+    try:
+        yield recorder
+    finally:
+        # A failed run is exported too: its timings show where it got to
+        disable()
+        if jsonl:
+            recorder.write_jsonl(jsonl)
+        if prometheus:
+            recorder.write_prometheus(prometheus)
+        if report:
+            print(recorder.report())
@@ -0,0 +1,67 @@
+"""
+Incremental JSON Array Parser
+Yields each top-level element of a streamed JSON array as soon as its text is complete
+"""
+
+import json
+
+
+class JSONArrayStream:
+    """Feed text fragments of a JSON array of objects; complete objects come back from feed()"""
+
+    def __init__(self):
+        self._buffer = []       # fragments of the element currently being read
+        self._started = False   # the opening '[' has been seen
+        self._finished = False  # the closing ']' has been seen
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self.count = 0
+
+    @property
+    def finished(self):
+        return self._finished
+
+    def feed(self, text):
+        """Consume a fragment and return the list of elements it completed"""
+        completed = []
+        start = 0
+        for i, char in enumerate(text):
+            if self._finished:
+                break
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if not self._started:
+                # Skip anything the model put before the array (e.g. a ```json fence)
+                if char == "[":
+                    self._started = True
+                    start = i + 1
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0:
+                    self._buffer = []
+                    start = i
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0 and char == "]":
+                    self._finished = True
+                    continue
+                self._depth -= 1
+                if self._depth == 0:
+                    self._buffer.append(text[start:i + 1])
+                    completed.append(json.loads("".join(self._buffer)))
+                    self._buffer = []
+                    self.count += 1
+        if self._depth > 0 and not self._finished:
+            self._buffer.append(text[start:])
+        return completed
@@ -0,0 +1,172 @@
+"""
+Persistent Prompt/Response Cache
+Content-addressed SQLite cache for LLM responses with an in-process hot tier,
+size-bounded LRU eviction, TTL expiry and hit/miss statistics
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "llm_cache.sqlite")
+
+
+def normalize_text(text):
+    """Collapse whitespace so cosmetic prompt edits map to the same key"""
+    return " ".join(text.split())
+
+
+def make_key(messages, params):
+    """Content address for a request: normalized messages plus model parameters (including seed)"""
+    normalized = [{"role": m["role"], "content": normalize_text(m["content"])} for m in messages]
+    blob = json.dumps({"messages": normalized, "params": params}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class PromptCache:
+    """Two-tier response cache: an in-memory LRU in front of an on-disk SQLite store"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=200_000, max_bytes=1 << 30,
+                 ttl=None, hot_size=4096):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl                  # seconds an entry stays valid, or None for no expiry
+        self.hot_size = hot_size
+        self.stats = {"hot_hits": 0, "disk_hits": 0, "misses": 0, "expired": 0, "evictions": 0, "writes": 0}
+        self._hot = OrderedDict()       # key -> (value, created)
+        self._touched = {}              # key -> last-used time, flushed to disk in batches
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        self._db.commit()
+        self._count, self._bytes = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def _expired(self, created, now):
+        return self.ttl is not None and now - created > self.ttl
+
+    def _remember(self, key, value, created):
+        self._hot[key] = (value, created)
+        self._hot.move_to_end(key)
+        if len(self._hot) > self.hot_size:
+            self._hot.popitem(last=False)
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        now = time.time()
+        entry = self._hot.get(key)
+        if entry is not None and not self._expired(entry[1], now):
+            self._hot.move_to_end(key)
+            self._touched[key] = now
+            self.stats["hot_hits"] += 1
+            return entry[0]
+
+        row = self._db.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+        value, created = row
+        if self._expired(created, now):
+            self._delete([key])
+            self.stats["expired"] += 1
+            self.stats["misses"] += 1
+            return None
+        self._touched[key] = now
+        self._remember(key, value, created)
+        self.stats["disk_hits"] += 1
+        return value
+
+    def put(self, key, value):
+        """Store value under key, evicting least recently used entries past the size bounds"""
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        old = self._db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+        self._db.execute(
+            "INSERT OR REPLACE INTO entries (key, value, size, created, last_used) VALUES (?, ?, ?, ?, ?)",
+            (key, value, size, now, now))
+        if old:
+            self._bytes -= old[0]
+        else:
+            self._count += 1
+        self._bytes += size
+        self._remember(key, value, now)
+        self._touched.pop(key, None)
+        self.stats["writes"] += 1
+        if self._count > self.max_entries or self._bytes > self.max_bytes:
+            self.evict()
+        self._db.commit()
+
+    def delete(self, key):
+        """Drop key from both tiers"""
+        self._delete([key])
+        self._db.commit()
+
+    def _delete(self, keys):
+        for key in keys:
+            self._hot.pop(key, None)
+            self._touched.pop(key, None)
+        rows = self._db.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries WHERE key IN ({','.join('?' * len(keys))})",
+            keys).fetchone()
+        self._db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in keys])
+        self._count -= rows[0]
+        self._bytes -= rows[1]
+
+    def flush(self):
+        """Write pending last-used times to disk"""
+        if self._touched:
+            self._db.executemany("UPDATE entries SET last_used = ? WHERE key = ?",
+                                 [(used, key) for key, used in self._touched.items()])
+            self._touched.clear()
+            self._db.commit()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until both bounds hold"""
+        self.flush()
+        if self.ttl is not None:
+            self._db.execute("DELETE FROM entries WHERE created < ?", (time.time() - self.ttl,))
+            self._count, self._bytes = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        while self._count > self.max_entries or self._bytes > self.max_bytes:
+            # Evict in batches of ~1% so a full cache does not pay one query per insert
+            batch = min(10_000, max(1, self._count - self.max_entries, self.max_entries // 100))
+            victims = [key for key, in self._db.execute(
+                "SELECT key FROM entries ORDER BY last_used LIMIT ?", (batch,))]
+            if not victims:
+                break
+            self._delete(victims)
+            self.stats["evictions"] += len(victims)
+        self._db.commit()
+
+    def hit_rate(self):
+        """Fraction of lookups served from either tier"""
+        hits = self.stats["hot_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def close(self):
+        """Flush pending updates and close the database"""
+        self.flush()
+        self._db.close()
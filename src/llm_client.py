@@ -0,0 +1,557 @@
+#!/usr/bin/env python3
+"""
+Async LLM Question Generation Client
+Keeps many chat-completion requests in flight over a shared connection pool,
+with a concurrency limit, token-bucket rate limiting and jittered retries
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import ssl
+import time
+from urllib.parse import urlsplit
+
+from http_util import iter_chunks, read_body, read_response_head
+from json_stream import JSONArrayStream
+from llm_cache import DEFAULT_CACHE_PATH, PromptCache, make_key
+
+DEFAULT_MODEL = "gpt-3.5-turbo"
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+
+SYSTEM_PROMPT = (
+    "You write new multiple-choice math questions for a curriculum-aligned assessment. "
+    "Preserve mathematical notation in LaTeX ($...$). Respond with a single JSON object with the keys "
+    "title, description, question, instruction, difficulty, options (exactly 5 strings), "
+    "correct_answer (one of the options) and explanation."
+)
+
+PACKED_SYSTEM_PROMPT = (
+    "You write new multiple-choice math questions for a curriculum-aligned assessment. "
+    "Preserve mathematical notation in LaTeX ($...$). Respond with a single JSON array containing one "
+    "object per numbered request, in request order. Each object has the keys index (the request number), "
+    "title, description, question, instruction, difficulty, options (exactly 5 strings), "
+    "correct_answer (one of the options) and explanation."
+)
+
+# Statuses worth another attempt; any other error status is raised immediately
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """An error response from the model endpoint"""
+
+    def __init__(self, status, message):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+        self.retryable = status in RETRYABLE_STATUSES
+
+
+def build_prompt(spec):
+    """Build the user prompt for one question spec (unit, topic, difficulty, optional base question)"""
+    lines = [
+        "Write one new question.",
+        f"Subject: {spec.get('subject', 'Quantitative Math')}",
+        f"Unit: {spec['unit']}",
+        f"Topic: {spec['topic']}",
+        f"Difficulty: {spec.get('difficulty', 'moderate')}",
+    ]
+    if spec.get("variant") is not None:
+        # Distinguishes otherwise identical specs so each gets its own question (and cache entry)
+        lines.append(f"Variant: {spec['variant']}")
+    if spec.get("base_question"):
+        lines.append(f"Make it similar to this base question:\n{spec['base_question']}")
+    return "\n".join(lines)
+
+
+def curriculum_context(curriculum):
+    """Render the curriculum hierarchy once, for the system prompt of packed requests"""
+    lines = ["Curriculum (Subject > Unit: Topics):"]
+    for subject, units in curriculum.items():
+        for unit, topics in units.items():
+            lines.append(f"{subject} > {unit}: {'; '.join(topics)}")
+    return "\n".join(lines)
+
+
+def build_packed_prompt(specs):
+    """Build one user prompt asking for a question per spec, numbered from 1"""
+    lines = [f"Write {len(specs)} new questions, one for each numbered request:"]
+    for number, spec in enumerate(specs, 1):
+        fields = [f"Unit: {spec['unit']}", f"Topic: {spec['topic']}",
+                  f"Difficulty: {spec.get('difficulty', 'moderate')}"]
+        if spec.get("variant") is not None:
+            fields.append(f"Variant: {spec['variant']}")
+        lines.append(f"{number}. " + " | ".join(fields))
+    return "\n".join(lines)
+
+
+def parse_question(content, spec):
+    """Turn a model response into a question dict carrying the spec's curriculum tags"""
+    return question_from_data(json.loads(content), spec)
+
+
+def question_from_data(data, spec):
+    """Build a question dict from one decoded model object and its spec"""
+    options = [str(option) for option in data["options"]]
+    if len(options) != 5 or data["correct_answer"] not in options:
+        raise ValueError("model response must have 5 options including the correct answer")
+    return {
+        "title": data["title"],
+        "description": data["description"],
+        "question": data["question"],
+        "instruction": data["instruction"],
+        "difficulty": data.get("difficulty", spec.get("difficulty", "moderate")),
+        "order": spec.get("order", 1),
+        "options": options,
+        "correct_answer": data["correct_answer"],
+        "explanation": data["explanation"],
+        "subject": spec.get("subject", "Quantitative Math"),
+        "unit": spec["unit"],
+        "topic": spec["topic"],
+        "plusmarks": spec.get("plusmarks", 1)
+    }
+
+
+class TokenBucket:
+    """Token-bucket rate limiter: `rate` tokens per second with bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens=1):
+        """Wait until `tokens` tokens are available and take them"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+
+class ConnectionPool:
+    """Keep-alive HTTP/1.1 connections to one host, reused across requests"""
+
+    def __init__(self, base_url, timeout=60.0):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self._ssl = ssl.create_default_context() if parts.scheme == "https" else None
+        self._idle = []
+        self.opened = 0
+
+    async def _connect(self):
+        if self._idle:
+            return self._idle.pop(), True
+        self.opened += 1
+        reader, writer = await asyncio.open_connection(self.host, self.port, ssl=self._ssl)
+        return (reader, writer), False
+
+    def _encode_post(self, path, payload, headers):
+        body = json.dumps(payload).encode("utf-8")
+        head = [f"POST {self.prefix}{path} HTTP/1.1", f"Host: {self.host}",
+                "Content-Type: application/json", f"Content-Length: {len(body)}"]
+        head += [f"{name}: {value}" for name, value in headers.items()]
+        return ("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body
+
+    async def _send(self, request):
+        """Send a request and read the response head; returns (reader, writer, status, headers)"""
+        while True:
+            (reader, writer), reused = await self._connect()
+            try:
+                writer.write(request)
+                await writer.drain()
+                status, headers = await asyncio.wait_for(read_response_head(reader), self.timeout)
+                return reader, writer, status, headers
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                # A pooled connection may have been closed by the server while idle
+                if not reused:
+                    raise
+            except BaseException:
+                writer.close()
+                raise
+
+    def _release(self, reader, writer, headers):
+        if headers.get("connection", "").lower() == "close":
+            writer.close()
+        else:
+            self._idle.append((reader, writer))
+
+    async def post_json(self, path, payload, headers):
+        """POST a JSON payload and return (status, body bytes)"""
+        reader, writer, status, response_headers = await self._send(self._encode_post(path, payload, headers))
+        try:
+            data = await asyncio.wait_for(read_body(reader, response_headers), self.timeout)
+        except BaseException:
+            writer.close()
+            raise
+        self._release(reader, writer, response_headers)
+        return status, data
+
+    async def post_stream(self, path, payload, headers):
+        """POST a JSON payload and yield (status, chunk) pieces of the body as they arrive"""
+        reader, writer, status, response_headers = await self._send(self._encode_post(path, payload, headers))
+        try:
+            if response_headers.get("transfer-encoding", "").lower() == "chunked":
+                async for chunk in iter_chunks(reader):
+                    yield status, chunk
+            else:
+                yield status, await read_body(reader, response_headers)
+        except BaseException:
+            # Abandoned or broken mid-body: the connection cannot be reused
+            writer.close()
+            raise
+        self._release(reader, writer, response_headers)
+
+    async def close(self):
+        """Close every idle connection"""
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+            await writer.wait_closed()
+
+
+class AsyncQuestionClient:
+    """Concurrency-limited async client that generates question dicts from a chat model"""
+
+    def __init__(self, model=DEFAULT_MODEL, api_key=None, base_url=None, concurrency=16,
+                 rate_limit=None, max_retries=4, backoff=0.5, max_backoff=8.0, timeout=60.0,
+                 temperature=0.7, seed=None, cache=None):
+        self.model = model
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.temperature = temperature
+        self.seed = seed
+        self.cache = cache              # optional PromptCache consulted before every request
+        self.latencies = []
+        self.retries = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._bucket = TokenBucket(rate_limit) if rate_limit else None
+        self._headers = {"Authorization": f"Bearer {api_key or os.environ.get('OPENAI_API_KEY', '')}"}
+        # One pool shared by every request; the semaphore bounds it to `concurrency` connections
+        self.pool = ConnectionPool(base_url or os.environ.get("OPENAI_BASE_URL", DEFAULT_BASE_URL), timeout)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Close the shared connection pool"""
+        await self.pool.close()
+
+    def request_params(self):
+        """Model parameters sent with every request"""
+        params = {"model": self.model, "temperature": self.temperature}
+        if self.seed is not None:
+            params["seed"] = self.seed
+        return params
+
+    async def complete(self, messages, parse=None, **extra):
+        """Send one chat completion with rate limiting, concurrency control and retries.
+
+        With parse, returns parse(response); a response it rejects (by raising KeyError,
+        TypeError or ValueError) is not cached and is requested again like a failed request,
+        and a cached one it rejects is dropped and requested again.
+        """
+        parse = parse or (lambda response: response)
+        params = {**self.request_params(), **extra}
+        key = None
+        if self.cache is not None:
+            key = make_key(messages, params)
+            cached = self.cache.get(key)
+            if cached is not None:
+                try:
+                    return parse(json.loads(cached))
+                except (KeyError, TypeError, ValueError):
+                    self.cache.delete(key)
+
+        payload = {"messages": messages, **params}
+        attempt = 0
+        while True:
+            if self._bucket:
+                await self._bucket.acquire()
+            async with self._semaphore:
+                started = time.perf_counter()
+                try:
+                    status, body = await self.pool.post_json("/chat/completions", payload, self._headers)
+                    if status != 200:
+                        raise LLMError(status, body.decode("utf-8", "replace")[:200])
+                    self.latencies.append(time.perf_counter() - started)
+                    result = parse(json.loads(body))
+                    if key is not None:
+                        self.cache.put(key, body.decode("utf-8"))
+                    return result
+                except (LLMError, ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError,
+                        KeyError, TypeError, ValueError) as exc:    # the last three: a malformed reply
+                    if attempt >= self.max_retries or not getattr(exc, "retryable", True):
+                        raise
+            # Full jitter: sleep a random fraction of the capped exponential backoff
+            self.retries += 1
+            await asyncio.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+            attempt += 1
+
+    async def stream_complete(self, messages, accept=None, **extra):
+        """Stream one chat completion's content; retries only happen before any content arrives.
+
+        accept(content) is called once the caller has consumed the whole stream; content it
+        does not accept is not cached (or, if it came from the cache, is dropped from it).
+        """
+        accept = accept or (lambda content: True)
+        params = {**self.request_params(), **extra, "stream": True}
+        key = None
+        if self.cache is not None:
+            key = make_key(messages, params)
+            cached = self.cache.get(key)
+            if cached is not None:
+                yield cached
+                if not accept(cached):
+                    self.cache.delete(key)
+                return
+
+        payload = {"messages": messages, **params}
+        attempt = 0
+        while True:
+            if self._bucket:
+                await self._bucket.acquire()
+            parts = []
+            async with self._semaphore:
+                started = time.perf_counter()
+                try:
+                    async for content in self._stream_content(payload):
+                        parts.append(content)
+                        yield content
+                    self.latencies.append(time.perf_counter() - started)
+                    content = "".join(parts)
+                    if key is not None and accept(content):
+                        self.cache.put(key, content)
+                    return
+                except (LLMError, ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError) as exc:
+                    if parts or attempt >= self.max_retries or not getattr(exc, "retryable", True):
+                        raise
+            self.retries += 1
+            await asyncio.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+            attempt += 1
+
+    async def _stream_content(self, payload):
+        """Decode a server-sent-events completion stream into content deltas"""
+        buffer = b""
+        status = 200
+        done = False
+        async for status, chunk in self.pool.post_stream("/chat/completions", payload, self._headers):
+            buffer += chunk
+            if status != 200 or done:
+                continue
+            while b"\n\n" in buffer and not done:
+                event, buffer = buffer.split(b"\n\n", 1)
+                for line in event.splitlines():
+                    if not line.startswith(b"data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == b"[DONE]":
+                        # Keep draining so the connection goes back to the pool
+                        done = True
+                        break
+                    delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                    if delta:
+                        yield delta
+        if status != 200:
+            raise LLMError(status, buffer.decode("utf-8", "replace")[:200])
+
+    async def generate(self, spec):
+        """Generate one question dict for a spec"""
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": build_prompt(spec)},
+        ]
+        return await self.complete(
+            messages, parse=lambda response: parse_question(response["choices"][0]["message"]["content"], spec))
+
+    async def generate_many(self, specs):
+        """Generate questions for all specs concurrently, returned in spec order"""
+        return await asyncio.gather(*(self.generate(spec) for spec in specs))
+
+    async def iter_generate(self, specs):
+        """Yield questions as soon as each one completes"""
+        for future in asyncio.as_completed([self.generate(spec) for spec in specs]):
+            yield await future
+
+    async def _run_pack(self, pack, system, queue):
+        """Stream one packed request, re-requesting only the specs that did not come back"""
+        remaining = pack
+        failures = 0
+        while remaining:
+            messages = [
+                {"role": "system", "content": system},
+                {"role": "user", "content": build_packed_prompt([spec for _, spec in remaining])},
+            ]
+            parser = JSONArrayStream()
+            received = set()
+            try:
+                # Checked after the last delta has been parsed: cache only a pack that came back whole
+                accept = lambda content: len(received) == len(remaining)
+                async for text in self.stream_complete(messages, accept=accept):
+                    for data in parser.feed(text):
+                        number = data.get("index")
+                        slot = number - 1 if isinstance(number, int) else parser.count - 1
+                        if not 0 <= slot < len(remaining) or slot in received:
+                            continue
+                        position, spec = remaining[slot]
+                        try:
+                            question = question_from_data(data, spec)
+                        except (KeyError, TypeError, ValueError):
+                            continue
+                        received.add(slot)
+                        await queue.put((position, question))
+            except (LLMError, ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                pass
+            if len(received) < len(remaining):
+                failures += 1
+                if failures > self.max_retries:
+                    raise LLMError(502, f"{len(remaining) - len(received)} packed questions never arrived")
+                self.retries += 1
+            remaining = [item for slot, item in enumerate(remaining) if slot not in received]
+
+    async def iter_generate_packed(self, specs, pack_size=8, curriculum=None):
+        """Pack `pack_size` specs per call and yield (position, question) as each array element completes.
+
+        The curriculum context is sent once per call in the system prompt instead of once per
+        question; `position` is the index of the question's spec in `specs`.
+        """
+        system = PACKED_SYSTEM_PROMPT
+        if curriculum:
+            system += "\n\n" + curriculum_context(curriculum)
+        indexed = list(enumerate(specs))
+        queue = asyncio.Queue()
+        finished = object()
+
+        async def run(pack):
+            try:
+                await self._run_pack(pack, system, queue)
+                await queue.put(finished)
+            except Exception as exc:
+                await queue.put(exc)
+
+        tasks = [asyncio.create_task(run(indexed[i:i + pack_size]))
+                 for i in range(0, len(indexed), pack_size)]
+        try:
+            pending = len(tasks)
+            while pending:
+                item = await queue.get()
+                if item is finished:
+                    pending -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def generate_packed(self, specs, pack_size=8, curriculum=None):
+        """Generate questions with packed requests, returned in spec order"""
+        questions = [None] * len(specs)
+        async for position, question in self.iter_generate_packed(specs, pack_size, curriculum):
+            questions[position] = question
+        return questions
+
+
+def generate_questions(specs, cache_path=DEFAULT_CACHE_PATH, pack_size=None, curriculum=None,
+                       **client_options):
+    """Synchronous wrapper: generate questions for specs, reusing cached responses when possible.
+
+    With `pack_size`, that many specs share each model call (see iter_generate_packed).
+    """
+    async def run(cache):
+        async with AsyncQuestionClient(cache=cache, **client_options) as client:
+            if pack_size:
+                return await client.generate_packed(specs, pack_size, curriculum)
+            return await client.generate_many(specs)
+    if cache_path is None:
+        return asyncio.run(run(None))
+    with PromptCache(cache_path) as cache:
+        return asyncio.run(run(cache))
+
+
+def percentile(values, q):
+    """Return the q-th percentile (0-100) of a list of numbers"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+async def run_benchmark(count, concurrency, rate_limit, base_url, latency, failure_rate=0.0,
+                        cache_path=None, pack_size=None):
+    """Generate `count` questions against a server and report throughput and latency"""
+    server = None
+    if base_url is None:
+        from mock_llm_server import MockLLMServer
+        server = MockLLMServer(latency=latency, failure_rate=failure_rate)
+        await server.start()
+        base_url = server.base_url
+
+    specs = [{"unit": "Problem Solving", "topic": "Counting & Arrangement Problems",
+              "difficulty": "moderate", "order": i + 1, "variant": i} for i in range(count)]
+    cache = PromptCache(cache_path) if cache_path else None
+    try:
+        async with AsyncQuestionClient(base_url=base_url, concurrency=concurrency,
+                                       rate_limit=rate_limit, cache=cache) as client:
+            started = time.perf_counter()
+            if pack_size:
+                questions = []
+                async for _, question in client.iter_generate_packed(specs, pack_size):
+                    if not questions:
+                        print(f"First question after {(time.perf_counter() - started) * 1000:.1f} ms")
+                    questions.append(question)
+            else:
+                questions = await client.generate_many(specs)
+            elapsed = time.perf_counter() - started
+    finally:
+        if server:
+            await server.stop()
+        if cache:
+            cache.close()
+
+    print(f"Generated {len(questions)} questions in {elapsed:.2f}s "
+          f"({len(questions) / elapsed:.1f} questions/s, {client.retries} retries)")
+    print(f"Latency p50 {percentile(client.latencies, 50) * 1000:.1f} ms, "
+          f"p99 {percentile(client.latencies, 99) * 1000:.1f} ms")
+    if cache:
+        print(f"Cache hit rate {cache.hit_rate():.1%} {cache.stats}")
+    if server:
+        print(f"Mock server saw {server.connections} connections for {server.requests} requests")
+
+
+def main():
+    """Benchmark the client, by default against the bundled mock server"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rate-limit", type=float, default=None, help="requests per second")
+    parser.add_argument("--base-url", default=None, help="OpenAI-compatible endpoint (default: local mock)")
+    parser.add_argument("--latency", type=float, default=0.05, help="mock server latency in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="mock server 503 rate")
+    parser.add_argument("--cache", default=None, help="SQLite prompt cache path (default: no cache)")
+    parser.add_argument("--pack-size", type=int, default=None, help="questions packed into each call")
+    args = parser.parse_args()
+    asyncio.run(run_benchmark(args.count, args.concurrency, args.rate_limit, args.base_url,
+                              args.latency, args.failure_rate, args.cache, args.pack_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Question Service Load Test
+Drives the generation service with concurrent keep-alive clients sending a mix of topic,
+difficulty and size requests, some of them repeated so coalescing has work to do, then
+reports client-side throughput and latency next to the service's own /metrics.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from urllib.parse import urlsplit
+
+from http_util import read_response
+from llm_client import percentile
+from question_service import TOPIC_FAMILIES, GenerationService
+
+DIFFICULTIES = [None, "moderate", "hard"]
+
+
+def request_mix(count, repeat_rate=0.2, max_questions=10, seed=0):
+    """Request bodies: random topic, difficulty and size; repeat_rate of them reuse a hot seeded body"""
+    rng = random.Random(seed)
+    hot = [{"topic": topic, "count": 5, "seed": 7} for topic in TOPIC_FAMILIES]
+    bodies = []
+    for _ in range(count):
+        if rng.random() < repeat_rate:
+            bodies.append(rng.choice(hot))
+        else:
+            bodies.append({"topic": rng.choice(list(TOPIC_FAMILIES)), "difficulty": rng.choice(DIFFICULTIES),
+                           "count": rng.randint(1, max_questions)})
+    return bodies
+
+
+async def call(reader, writer, host, method, path, body=None):
+    """One keep-alive request; returns (status, parsed JSON)"""
+    data = json.dumps(body).encode("utf-8") if body is not None else b""
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                  f"Content-Length: {len(data)}\r\n\r\n").encode("latin-1") + data)
+    await writer.drain()
+    status, _, payload = await read_response(reader)
+    return status, json.loads(payload)
+
+
+async def run_load(base_url, bodies, concurrency):
+    """Send bodies from `concurrency` connections; returns (latencies, statuses, elapsed seconds)"""
+    url = urlsplit(base_url)
+    queue = asyncio.Queue()
+    for body in bodies:
+        queue.put_nowait(body)
+    latencies, statuses = [], {}
+
+    async def client():
+        reader, writer = await asyncio.open_connection(url.hostname, url.port)
+        try:
+            while not queue.empty():
+                body = queue.get_nowait()
+                started = time.perf_counter()
+                status, _ = await call(reader, writer, url.hostname, "POST", "/v1/questions", body)
+                latencies.append(time.perf_counter() - started)
+                statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - started
+
+
+async def main_async(args):
+    service = None
+    base_url = args.url
+    if base_url is None:
+        service = GenerationService(batch_window=args.batch_window)
+        await service.start()
+        base_url = service.base_url
+    try:
+        bodies = request_mix(args.requests, args.repeat_rate, args.max_questions)
+        latencies, statuses, elapsed = await run_load(base_url, bodies, args.concurrency)
+        url = urlsplit(base_url)
+        reader, writer = await asyncio.open_connection(url.hostname, url.port)
+        _, metrics = await call(reader, writer, url.hostname, "GET", "/metrics")
+        writer.close()
+    finally:
+        if service:
+            await service.stop()
+
+    print(f"{len(latencies)} requests in {elapsed:.2f} s ({len(latencies) / elapsed:,.0f} requests/s), statuses {statuses}")
+    print(f"client latency p50 {percentile(latencies, 50) * 1000:.1f} ms, p99 {percentile(latencies, 99) * 1000:.1f} ms")
+    print(f"service: {metrics['questions']} questions, {metrics['coalesced']} coalesced, {metrics['batches']} batches "
+          f"({metrics['mean_batch_requests']:.1f} requests each), p50 {metrics['latency_ms']['p50']:.1f} ms, "
+          f"p99 {metrics['latency_ms']['p99']:.1f} ms")
+
+
+def main():
+    """Load-test a running service, or one started in this process"""
+    parser = argparse.ArgumentParser(description="Load-test the question generation service")
+    parser.add_argument("--url", help="service base URL (default: start one in this process)")
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--repeat-rate", type=float, default=0.2, help="share of requests repeating a hot body")
+    parser.add_argument("--max-questions", type=int, default=10)
+    parser.add_argument("--batch-window", type=float, default=0.005, help="in-process service batch window")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
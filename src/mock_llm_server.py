@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Local Mock LLM Server
+OpenAI-compatible chat-completions stand-in for offline throughput and latency testing
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+
+from http_util import read_request, response_head, write_chunk, write_json
+
+SPEC_FIELDS = re.compile(r"^(Unit|Topic|Difficulty): (.+)$", re.MULTILINE)
+PACKED_REQUEST = re.compile(r"^(\d+)\. (Unit: .+)$", re.MULTILINE)
+
+
+def mock_question(prompt):
+    """Build a deterministic question JSON object for a prompt"""
+    spec = {name.lower(): value.strip() for name, value in SPEC_FIELDS.findall(prompt)}
+    digest = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8], 16)
+    a, b = 2 + digest % 7, 3 + (digest >> 4) % 6
+    answer = a * b
+    options = [f"{value} combinations" for value in (a + b, answer - b, answer, answer + a, answer * 2)]
+    return {
+        "title": "Math Assessment - Combinatorics and Counting",
+        "description": f"This assessment focuses on {spec.get('topic', 'counting principles').lower()}.",
+        "question": f"A café offers {a} sandwiches and {b} soups. How many different sandwich-and-soup lunches are possible?",
+        "instruction": "Use the counting principle to determine the total number of possible combinations.",
+        "difficulty": spec.get("difficulty", "moderate"),
+        "options": options,
+        "correct_answer": options[2],
+        "explanation": f"Using the counting principle: ${a} \\times {b} = {answer}$ different combinations.",
+    }
+
+
+def mock_content(prompt):
+    """Answer a single-question prompt with an object, or a packed prompt with an array"""
+    packed = PACKED_REQUEST.findall(prompt)
+    if not packed:
+        return json.dumps(mock_question(prompt))
+    items = []
+    for number, fields in packed:
+        item = mock_question(fields.replace(" | ", "\n"))
+        items.append({"index": int(number), **item})
+    return json.dumps(items)
+
+
+def completion_payload(model, content):
+    """Wrap content in a chat.completion response body"""
+    return {
+        "id": f"chatcmpl-mock-{random.getrandbits(48):012x}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+class MockLLMServer:
+    """asyncio HTTP server answering /v1/chat/completions with canned questions"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.05, jitter=0.2, failure_rate=0.0,
+                 chunk_size=64, chunk_delay=0.001):
+        self.host = host
+        self.port = port
+        self.latency = latency          # mean seconds before answering
+        self.jitter = jitter            # relative spread of the latency
+        self.failure_rate = failure_rate  # fraction of requests answered with 503
+        self.chunk_size = chunk_size    # characters of content per streamed event
+        self.chunk_delay = chunk_delay  # seconds between streamed events
+        self.requests = 0
+        self.connections = 0
+        self._server = None
+        self._handlers = set()
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def start(self):
+        """Start listening; with port 0 an ephemeral port is picked"""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """Stop listening and close open connections"""
+        self._server.close()
+        for task in self._handlers:
+            task.cancel()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        await self._server.wait_closed()
+
+    async def serve_forever(self):
+        await self.start()
+        print(f"Mock LLM server listening on {self.base_url}")
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                await self._respond(request, writer)
+                if not request["keep_alive"]:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # Cancelled by stop(); finish normally so asyncio does not log the cancellation
+            pass
+        finally:
+            self._handlers.discard(task)
+            writer.close()
+
+    async def _respond(self, request, writer):
+        self.requests += 1
+        if request["method"] != "POST" or not request["path"].endswith("/chat/completions"):
+            await write_json(writer, 404, {"error": {"message": "not found"}}, request["keep_alive"])
+            return
+
+        body = json.loads(request["body"] or b"{}")
+        await asyncio.sleep(max(0.0, random.gauss(self.latency, self.latency * self.jitter)))
+        if random.random() < self.failure_rate:
+            await write_json(writer, 503, {"error": {"message": "mock overload"}}, request["keep_alive"])
+            return
+
+        content = mock_content(body["messages"][-1]["content"])
+        if body.get("stream"):
+            await self._stream(writer, body.get("model", "mock"), content, request["keep_alive"])
+            return
+        await write_json(writer, 200, completion_payload(body.get("model", "mock"), content),
+                         request["keep_alive"])
+
+    async def _stream(self, writer, model, content, keep_alive):
+        """Send content as server-sent chat.completion.chunk events over a chunked body"""
+        writer.write(response_head(200, "text/event-stream", keep_alive=keep_alive))
+        for start in range(0, len(content), self.chunk_size):
+            event = {
+                "object": "chat.completion.chunk",
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": content[start:start + self.chunk_size]},
+                             "finish_reason": None}],
+            }
+            await write_chunk(writer, f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            if self.chunk_delay:
+                await asyncio.sleep(self.chunk_delay)
+        await write_chunk(writer, b"data: [DONE]\n\n")
+        await write_chunk(writer, b"")
+
+
+def main():
+    """Run the mock server until interrupted"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    server = MockLLMServer(args.host, args.port, args.latency, failure_rate=args.failure_rate)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Sphere Packing Variant Generator
+Enumerates and solves cylinder/sphere packing questions over a whole parameter grid with NumPy
+"""
+
+import numpy as np
+from distractors import DistractorEngine, ErrorModel
+from variants import VariantBatch
+
+# Layer arrangements seen from the top view
+RING = 0        # balls evenly spaced around the wall, touching their neighbours
+CENTERED = 1    # one ball on the axis with the rest in a ring around it
+ARRANGEMENTS = {RING: "ring", CENTERED: "centered ring"}
+
+# Dimensions are carried as integer tenths of a centimetre; options pack (diameter, height)
+KEY_SCALE = 10 ** 6
+
+
+def _cm(tenths):
+    """Format a length given in tenths of a centimetre"""
+    tenths = int(tenths)
+    return str(tenths // 10) if tenths % 10 == 0 else f"{tenths / 10:.1f}"
+
+
+def _latex_dimensions(key):
+    """Format a packed (diameter, height) key like `$14 \\times 14 \\times 21$ cm`"""
+    diameter, height = divmod(int(key), KEY_SCALE)
+    return f"${_cm(diameter)} \\times {_cm(diameter)} \\times {_cm(height)}$ cm"
+
+
+def _key(diameter, height):
+    return diameter * KEY_SCALE + height
+
+
+def key_distance(chosen, keys):
+    """Larger of the diameter and height differences between packed keys, in tenths"""
+    return np.maximum(np.abs(chosen // KEY_SCALE - keys // KEY_SCALE), np.abs(chosen % KEY_SCALE - keys % KEY_SCALE))
+
+
+# Packing mistakes over params in tenths of a cm: d, h (the answer), ball (ball diameter),
+# ring (diameter of the circle through the ring ball centres), plus k balls per layer
+PACKING_ERROR_MODELS = [
+    ErrorModel("radius-for-diameter", "using the container radius as its diameter",
+               lambda p: _key(p["d"] // 2, p["h"])),
+    ErrorModel("layer-too-few", "stacking one layer too few",
+               lambda p: np.where(p["h"] > p["ball"], _key(p["d"], p["h"] - p["ball"]), -1)),
+    ErrorModel("layer-too-many", "stacking one layer too many",
+               lambda p: _key(p["d"], p["h"] + p["ball"])),
+    ErrorModel("side-by-side", "laying the balls of a layer side by side across the base",
+               lambda p: _key(p["ball"] * p["k"], p["h"])),
+    ErrorModel("extra-clearance", "adding a ball's width of clearance to both dimensions",
+               lambda p: _key(p["d"] + p["ball"], p["h"] + p["ball"])),
+    ErrorModel("ring-only", "taking the diameter of the ring of ball centres as the container's",
+               lambda p: np.where(p["ring"] > 0, _key(p["ring"], p["h"]), -1)),
+    ErrorModel("radius-layers", "measuring each layer by the ball radius instead of its diameter",
+               lambda p: _key(p["d"], p["h"] // 2)),
+]
+
+PACKING_DISTRACTORS = DistractorEngine(
+    PACKING_ERROR_MODELS,
+    fallback=lambda answers, p, k: answers[:, None] + p["ball"][:, None] * KEY_SCALE * np.arange(1, k + 1),
+    # Options differ by at least half a centimetre in one dimension
+    min_gap=lambda answers: 5,
+    distance=key_distance,
+)
+
+
+def solve_packing(radius, balls_per_layer, layers, arrangement):
+    """Return container (diameter, height, ring radius) arrays for broadcastable parameter arrays"""
+    radius = np.asarray(radius, dtype=np.float64)
+    k = np.asarray(balls_per_layer)
+    arrangement = np.asarray(arrangement)
+
+    # Balls that sit on the ring: all of them, or all but the centre ball
+    on_ring = np.where(arrangement == CENTERED, k - 1, k)
+    with np.errstate(divide="ignore"):
+        # Neighbouring ring balls touch when the ring radius is r / sin(pi / m)
+        ring = radius / np.sin(np.pi / np.maximum(on_ring, 1))
+    ring = np.where(on_ring <= 1, 0.0, ring)
+    # Around a centre ball the ring can never be tighter than one diameter
+    ring = np.where(arrangement == CENTERED, np.maximum(ring, 2 * radius), ring)
+
+    diameter = 2 * (ring + radius)
+    height = 2 * radius * np.asarray(layers)
+    return diameter, height, ring
+
+
+class PackingVariantBatch(VariantBatch):
+    """Solved packing variants: parameters, container dimensions and options"""
+
+    def __init__(self, radius, balls_per_layer, layers, arrangement, diameter, height, ring,
+                 answers, options, correct_index, option_sources=None):
+        self.radius = radius                    # (N,) float, ball radius in cm
+        self.balls_per_layer = balls_per_layer  # (N,) int
+        self.layers = layers                    # (N,) int
+        self.arrangement = arrangement          # (N,) int, RING or CENTERED
+        self.diameter = diameter                # (N,) float, exact container diameter
+        self.height = height                    # (N,) float, exact container height
+        self.ring = ring                        # (N,) float, distance of ring centres from the axis
+        self.answers = answers                  # (N,) int, packed (diameter, height) key in tenths
+        self.options = options                  # (N, OPTION_COUNT) int, packed keys in presentation order
+        self.correct_index = correct_index      # (N,) int, position of the answer in options
+        self.option_sources = option_sources    # (N, OPTION_COUNT) int, error model behind each option
+        self.difficulty = np.where((np.asarray(balls_per_layer) <= 2) & (np.asarray(layers) <= 2),
+                                   "moderate", "hard")     # (N,) str
+
+    def check(self):
+        """Re-solve every variant and return a bool mask of items whose marked option is right"""
+        diameter, height, _ = solve_packing(self.radius, self.balls_per_layer, self.layers,
+                                            self.arrangement)
+        expected = np.rint(diameter * 10).astype(np.int64) * KEY_SCALE + np.rint(height * 10).astype(np.int64)
+        marked = self.options[np.arange(len(self)), self.correct_index]
+        unique = (np.diff(np.sort(self.options, axis=1), axis=1) != 0).all(axis=1)
+        return (marked == expected) & ((self.options == expected[:, None]).sum(axis=1) == 1) & unique
+
+    def diagram_params(self, index):
+        """Keyword arguments for diagrams.draw_packing_top_view showing one variant's layer"""
+        return {"container_radius": float(self.diameter[index]) / 2,
+                "ball_radius": float(self.radius[index]),
+                "balls": int(self.balls_per_layer[index]),
+                "ring_radius": float(self.ring[index]),
+                "centered": bool(self.arrangement[index] == CENTERED)}
+
+    def question(self, index, order=1):
+        """Materialize one variant as a question dict"""
+        r = float(self.radius[index])
+        k = int(self.balls_per_layer[index])
+        layers = int(self.layers[index])
+        arrangement = int(self.arrangement[index])
+        total = k * layers
+        radius_text = f"{r:g}"
+        ball_d = f"{2 * r:g}"
+        ring_text = _cm(round(self.ring[index] * 10))
+        diameter_text, height_text = _cm(self.answers[index] // KEY_SCALE), _cm(self.answers[index] % KEY_SCALE)
+        layer_word = "layer" if layers == 1 else "layers"
+        ball_word = "tennis ball" if total == 1 else "tennis balls"
+
+        if arrangement == CENTERED:
+            layout = f"1 ball in the centre surrounded by {k - 1} balls"
+            width = (f"With {k - 1} balls around a centre ball, the outer ball centres lie {ring_text} cm "
+                     f"from the axis, so the container diameter is 2 × ({ring_text} + {radius_text}) ≈ {diameter_text} cm.")
+        elif k == 1:
+            layout = "1 ball"
+            width = f"With 1 ball per layer, the container diameter equals the ball diameter, {ball_d} cm."
+        else:
+            layout = f"a circular arrangement of {k} balls"
+            width = (f"With {k} balls arranged in a ring, the ball centres lie {ring_text} cm from the axis, "
+                     f"so the container diameter is 2 × ({ring_text} + {radius_text}) ≈ {diameter_text} cm.")
+
+        options = [_latex_dimensions(key) for key in self.options[index]]
+        return {
+            "title": "Math Assessment - Geometry and Spatial Reasoning",
+            "description": "This assessment focuses on geometric concepts including area, volume, and spatial relationships.",
+            "question": f"A cylindrical container is designed to hold {total} {ball_word} tightly packed in {layers} {layer_word}. Each tennis ball has a radius of {radius_text} centimeters. The top view shows {layout} in each layer. Which of the following is closest to the dimensions of the cylindrical container?\n\n**Note**: The height accounts for {layers} {layer_word} of balls, and the diameter accommodates the circular arrangement.",
+            "instruction": "Calculate the dimensions needed to accommodate the tightly packed tennis balls in the cylindrical container.",
+            "difficulty": str(self.difficulty[index]),
+            "order": order,
+            "options": options,
+            "correct_answer": options[int(self.correct_index[index])],
+            "explanation": f"Each tennis ball has a radius of {radius_text} cm, so diameter = {ball_d} cm. {width} The height must accommodate {layers} {layer_word}: {layers} × {ball_d} cm = {height_text} cm. Therefore, the closest dimensions are {_latex_dimensions(self.answers[index])}.",
+            "subject": "Quantitative Math",
+            "unit": "Geometry and Measurement",
+            "topic": "Area & Volume",
+            "plusmarks": 1
+        }
+
+
+class PackingVariants:
+    """Parameterized family of sphere-in-cylinder packing questions"""
+
+    def __init__(self, radii=(2.5, 3.0, 3.25, 3.5, 4.0, 4.5), balls_per_layer=(1, 2, 3, 4, 5, 6, 7),
+                 layers=(1, 2, 3, 4), arrangements=(RING, CENTERED)):
+        self.radii = np.asarray(radii, dtype=np.float64)
+        self.balls_per_layer = np.asarray(balls_per_layer)
+        self.layers = np.asarray(layers)
+        self.arrangements = np.asarray(arrangements)
+
+    def grid(self):
+        """Enumerate every valid (radius, balls per layer, layers, arrangement) combination"""
+        r, k, n, a = (g.ravel() for g in np.meshgrid(self.radii, self.balls_per_layer, self.layers,
+                                                     self.arrangements, indexing="ij"))
+        # A centred layout needs at least three balls around the centre and at most six fit
+        valid = (a == RING) | ((k >= 4) & (k <= 7))
+        return r[valid], k[valid], n[valid], a[valid]
+
+    def enumerate(self, seed=None):
+        """Solve every combination of the parameter grid; seed orders the options"""
+        return self._solve(*self.grid(), rng=np.random.default_rng(seed))
+
+    def sample(self, count, seed=None):
+        """Solve `count` variants drawn uniformly from the parameter grid"""
+        rng = np.random.default_rng(seed)
+        r, k, n, a = self.grid()
+        pick = rng.integers(0, len(r), size=count)
+        return self._solve(r[pick], k[pick], n[pick], a[pick], rng)
+
+    def _solve(self, radius, balls_per_layer, layers, arrangement, rng):
+        diameter, height, ring = solve_packing(radius, balls_per_layer, layers, arrangement)
+        d = np.rint(diameter * 10).astype(np.int64)
+        h = np.rint(height * 10).astype(np.int64)
+        ball = np.rint(radius * 20).astype(np.int64)
+        answers = _key(d, h)
+
+        params = {"d": d, "h": h, "ball": ball, "k": np.asarray(balls_per_layer),
+                  "ring": 2 * np.rint(ring * 10).astype(np.int64)}
+        options, correct_index, sources = PACKING_DISTRACTORS.build(answers, params, rng)
+        return PackingVariantBatch(radius, balls_per_layer, layers, arrangement, diameter, height,
+                                   ring, answers, options, correct_index, sources)
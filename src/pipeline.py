@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Staged Question Pipeline
+Runs generation, verification, diagram rendering and document writing as concurrent
+stages joined by bounded queues. A stage blocks as soon as the next one falls behind, so
+memory stays flat however large the bank, and a run takes about as long as its slowest
+stage rather than the sum of all of them.
+"""
+
+import argparse
+import contextlib
+import functools
+import os
+import queue
+import resource
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+_DONE = object()    # end-of-stream marker passed down the queues
+_SKIP = object()    # an item that failed or arrived after a failure
+
+
+class Stage:
+    """One pipeline step: fn(item) returns the item passed on, or None to drop it.
+
+    Thread stages call fn in `workers` threads. Process stages call it in a pool of
+    `workers` processes, so fn and what it is sent must pickle; send(item) picks the part
+    of an item to ship to the worker (default: all of it) and receive(item, result) builds
+    the item passed on from the worker's result (default: the result itself).
+    """
+
+    def __init__(self, name, fn, workers=1, processes=False, send=None, receive=None):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.processes = processes
+        self.send = send or (lambda item: item)
+        self.receive = receive or (lambda item, result: result)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.processed = 0
+        self.dropped = 0
+        self.busy = 0.0     # seconds spent in fn, summed over workers
+
+    def __call__(self, item, pool=None):
+        started = time.perf_counter()
+        if pool is None:
+            result = self.fn(self.send(item))
+        else:
+            result = pool.submit(self.fn, self.send(item)).result()
+        result = self.receive(item, result) if result is not None else None
+        with self._lock:
+            self.busy += time.perf_counter() - started
+            self.processed += 1
+            self.dropped += result is None
+        return result
+
+
+class _Emitter:
+    """Passes a stage's results downstream in input order, renumbered to skip dropped items"""
+
+    def __init__(self, outbox, workers):
+        self.outbox = outbox
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.next_in = 0
+        self.next_out = 0
+        self.running = workers
+
+    def emit(self, seq, result):
+        with self.lock:
+            self.pending[seq] = result
+            while self.next_in in self.pending:
+                result = self.pending.pop(self.next_in)
+                self.next_in += 1
+                if result is not None and result is not _SKIP:
+                    self.outbox.put((self.next_out, result))
+                    self.next_out += 1
+
+    def finish(self):
+        """Record one worker's exit; True for the last one"""
+        with self.lock:
+            self.running -= 1
+            return self.running == 0
+
+
+class Pipeline:
+    """Stages connected by queues holding at most queue_size items each"""
+
+    def __init__(self, stages, queue_size=4):
+        self.stages = list(stages)
+        self.queue_size = queue_size
+        self.wall = 0.0
+        self._error = None
+        self._stop = threading.Event()
+
+    def _fail(self, exc):
+        if self._error is None:
+            self._error = exc
+        self._stop.set()
+
+    def _feed(self, source, outbox):
+        try:
+            for seq, item in enumerate(source):
+                if self._stop.is_set():
+                    break
+                outbox.put((seq, item))
+        except BaseException as exc:
+            self._fail(exc)
+        finally:
+            outbox.put(_DONE)
+
+    def _work(self, stage, inbox, emitter, pool):
+        while True:
+            entry = inbox.get()
+            if entry is _DONE:
+                if emitter.finish():
+                    emitter.outbox.put(_DONE)
+                else:
+                    inbox.put(_DONE)    # let the stage's other workers see it too
+                return
+            seq, item = entry
+            result = _SKIP
+            if not self._stop.is_set():
+                try:
+                    result = stage(item, pool)
+                except BaseException as exc:
+                    self._fail(exc)
+            emitter.emit(seq, result)
+
+    def run(self, source):
+        """Feed source through every stage, yielding surviving items in source order.
+
+        The first exception raised by the source or a stage stops the run and is re-raised
+        here once every thread has wound down.
+        """
+        self._error = None
+        self._stop.clear()
+        for stage in self.stages:
+            stage.reset()
+        queues = [queue.Queue(self.queue_size) for _ in range(len(self.stages) + 1)]
+        started = time.perf_counter()
+        with contextlib.ExitStack() as pools:
+            threads = [threading.Thread(target=self._feed, args=(iter(source), queues[0]), daemon=True)]
+            for stage, inbox, outbox in zip(self.stages, queues, queues[1:]):
+                pool = pools.enter_context(ProcessPoolExecutor(stage.workers)) if stage.processes else None
+                emitter = _Emitter(outbox, stage.workers)
+                threads += [threading.Thread(target=self._work, args=(stage, inbox, emitter, pool), daemon=True)
+                            for _ in range(stage.workers)]
+            for thread in threads:
+                thread.start()
+            entry = None
+            try:
+                while True:
+                    entry = queues[-1].get()
+                    if entry is _DONE:
+                        break
+                    yield entry[1]
+            finally:
+                if entry is not _DONE:      # the caller stopped early: wind the stages down
+                    self._stop.set()
+                    while queues[-1].get() is not _DONE:
+                        pass
+                for thread in threads:
+                    thread.join()
+                self.wall = time.perf_counter() - started
+        if self._error is not None:
+            raise self._error
+
+    def run_sequential(self, source):
+        """Apply the stages one item at a time in this thread (the baseline run() is measured against)"""
+        for stage in self.stages:
+            stage.reset()
+        started = time.perf_counter()
+        try:
+            for item in source:
+                for stage in self.stages:
+                    item = stage(item)
+                    if item is None:
+                        break
+                else:
+                    yield item
+        finally:
+            self.wall = time.perf_counter() - started
+
+    def report(self):
+        """One line per stage: items, drops, busy time and utilization of its workers"""
+        lines = []
+        for stage in self.stages:
+            utilization = stage.busy / (self.wall * stage.workers) if self.wall else 0.0
+            lines.append(f"{stage.name:>10}: {stage.processed:7d} items, {stage.dropped:5d} dropped, "
+                         f"{stage.busy:7.2f} s busy x{stage.workers} {'processes' if stage.processes else 'threads'}"
+                         f" ({utilization:5.1%})")
+        lines.append(f"{'wall':>10}: {self.wall:7.2f} s (sum of stages {sum(s.busy for s in self.stages):.2f} s)")
+        return "\n".join(lines)
+
+
+# Question bank stages
+
+FAMILIES = ("menu", "packing")
+DIAGRAM_VERSION = 1
+
+
+class Chunk:
+    """A run of consecutive questions with the diagram jobs drawn for them"""
+
+    __slots__ = ("questions", "jobs", "stale", "images")
+
+    def __init__(self, questions, jobs, images=None):
+        self.questions = questions
+        self.jobs = jobs            # RenderJob per question, aligned with questions
+        self.stale = None           # (job, input hash) of the diagrams that need rendering
+        self.images = images        # paths of the diagrams rendered
+
+    def __len__(self):
+        return len(self.questions)
+
+
+def plan_chunks(count, chunk_size=256, seed=None, families=FAMILIES):
+    """(family, first order, size, seed) per chunk; chunks alternate between families.
+
+    Each chunk draws from its own child of one SeedSequence, so the bank is the same
+    whatever the number of workers.
+    """
+    sizes = [min(chunk_size, count - start) for start in range(0, count, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    order = 1
+    for number, (size, child) in enumerate(zip(sizes, seeds)):
+        yield families[number % len(families)], order, size, child
+        order += size
+
+
+class ChunkGenerator:
+    """Generate stage: solve a chunk of variants and plan one diagram per question"""
+
+    def __init__(self, images_dir="images"):
+        from generate_questions import MathQuestionGenerator
+        self.generator = MathQuestionGenerator()
+        self.images_dir = images_dir
+
+    def __call__(self, task):
+        import diagrams
+        from batch_render import RenderJob
+        family, first, size, seed = task
+        if family == "menu":
+            batch, render = self.generator.generate_question_1_variants(size, seed=seed), diagrams.draw_table
+        else:
+            batch, render = self.generator.generate_question_2_variants(size, seed=seed), diagrams.draw_packing_top_view
+        jobs = [RenderJob(f"{family}_diagram", batch.diagram_params(i), render, DIAGRAM_VERSION,
+                          os.path.join(self.images_dir, f"question_{first + i:07d}.png"))
+                for i in range(size)]
+        return Chunk(batch.to_questions(first), jobs)
+
+
+def verify_chunk(chunk, log=print):
+    """Verify stage: drop questions (and their diagrams) whose answers do not check out"""
+    from verify import verify_questions
+    report = verify_questions(chunk.questions)
+    if report.ok.all():
+        return chunk
+    for i in (~report.ok).nonzero()[0]:
+        log(f"Rejected question {chunk.questions[i]['order']} ({chunk.questions[i]['topic']}): {report.reason(i)}")
+    keep = report.ok.nonzero()[0]
+    return Chunk([chunk.questions[i] for i in keep], [chunk.jobs[i] for i in keep]) if len(keep) else None
+
+
+class ChunkDeduplicator:
+    """Dedup stage: drop questions (and their diagrams) that near-duplicate one already indexed.
+
+    Runs in a single thread, so items are checked against the index in plan order and a
+    seeded bank keeps the same questions from run to run.
+    """
+
+    def __init__(self, index):
+        self.index = index          # dedup.NearDuplicateIndex, grown with every accepted question
+        self.rejected = 0
+
+    def __call__(self, chunk):
+        keep = [i for i, question in enumerate(chunk.questions) if self.index.check_and_add(question)]
+        self.rejected += len(chunk) - len(keep)
+        if len(keep) == len(chunk):
+            return chunk
+        return Chunk([chunk.questions[i] for i in keep], [chunk.jobs[i] for i in keep]) if keep else None
+
+
+_process_cache = {}     # cache_dir -> RenderCache, one per worker process
+
+
+def render_jobs(jobs, cache_dir=None):
+    """Render stage (runs in worker processes): draw and write each job, returning the paths"""
+    from batch_render import render_job
+    from render_cache import RenderCache
+    if cache_dir and cache_dir not in _process_cache:
+        _process_cache[cache_dir] = RenderCache(cache_dir)
+    cache = _process_cache.get(cache_dir)
+    return [render_job(job, cache) for job in jobs]
+
+
+class ChunkWriter:
+    """Write stage: append each chunk to documents held open for the whole run.
+
+    after(chunk), if given, runs once the chunk is written, before the next one starts.
+    """
+
+    def __init__(self, stream, after=None):
+        self.stream = stream
+        self.after = after
+
+    def __call__(self, chunk):
+        for question in chunk.questions:
+            self.stream.write(question)
+        if self.after is not None:
+            self.after(chunk)
+        return chunk
+
+
+def question_pipeline(stream, manifest, images_dir="images", render_workers=None, verify=True, render=True,
+                      cache_dir=None, after_write=None, dedup=None):
+    """Pipeline of generate -> verify -> [dedup] -> render -> write stages writing into a DocumentStream.
+
+    Diagrams whose inputs the BuildManifest already has on record are not re-rendered.
+    after_write(chunk) runs in the write stage after each chunk (see ChunkWriter). With a
+    NearDuplicateIndex as dedup, questions near-duplicating one in it are dropped.
+    """
+    from render_cache import render_key
+
+    def stale_jobs(chunk):
+        keyed = ((job, render_key(job.kind, job.params, job.version)) for job in chunk.jobs)
+        chunk.stale = [(job, key) for job, key in keyed if not manifest.is_current(job.path, key)]
+        return [job for job, _ in chunk.stale]
+
+    def rendered(chunk, images):
+        for job, key in chunk.stale:
+            manifest.record(job.path, key)
+        manifest.skip(len(chunk.jobs) - len(chunk.stale))     # runs on every render thread
+        chunk.images = images
+        return chunk
+
+    stages = [Stage("generate", ChunkGenerator(images_dir))]
+    if verify:
+        stages.append(Stage("verify", verify_chunk))
+    if dedup is not None:
+        stages.append(Stage("dedup", ChunkDeduplicator(dedup)))
+    if render:
+        os.makedirs(images_dir, exist_ok=True)
+        stages.append(Stage("render", functools.partial(render_jobs, cache_dir=cache_dir),
+                            workers=render_workers or os.cpu_count() or 1, processes=True,
+                            send=stale_jobs, receive=rendered))
+    stages.append(Stage("write", ChunkWriter(stream, after_write)))
+    return Pipeline(stages)
+
+
+def build_bank(count, output_dir="output", images_dir="images", chunk_size=256, seed=None, docx=False,
+               sequential=False, incremental=False, **options):
+    """Generate, verify, render and write a bank of count variant questions.
+
+    Returns (pipeline, questions written, BuildManifest). An incremental build renders only
+    diagrams and replaces only documents whose inputs changed since the last one. The
+    documents close with the number of questions written, which verification can make
+    smaller than count.
+    """
+    from document_writer import QuestionFormat
+    from generate_questions import MathQuestionGenerator
+    from incremental import MANIFEST_PATH, BuildManifest
+
+    paths = {QuestionFormat(MathQuestionGenerator().format_question_output): os.path.join(output_dir, "bank_formatted.txt")}
+    if docx:
+        from docx_writer import DocxFormat
+        paths[DocxFormat()] = os.path.join(output_dir, "bank_assessment.docx")
+    with BuildManifest(MANIFEST_PATH if incremental else None) as manifest:
+        with manifest.documents(paths) as stream:
+            pipeline = question_pipeline(stream, manifest, images_dir, **options)
+            tasks = plan_chunks(count, chunk_size, seed)
+            for _ in pipeline.run_sequential(tasks) if sequential else pipeline.run(tasks):
+                pass
+    return pipeline, stream.count, manifest
+
+
+def main():
+    """Build a variant bank through the pipeline (or sequentially) and report per-stage timing"""
+    parser = argparse.ArgumentParser(description="Run the staged question pipeline")
+    parser.add_argument("--count", type=int, default=10_000)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, help="render processes (default: one per CPU)")
+    parser.add_argument("--output-dir", default="output")
+    parser.add_argument("--images-dir", default="images/bank")
+    parser.add_argument("--no-render", action="store_true")
+    parser.add_argument("--docx", action="store_true", help="also stream a .docx assessment")
+    parser.add_argument("--sequential", action="store_true", help="run the stages one after another per chunk")
+    parser.add_argument("--incremental", action="store_true", help="skip diagrams and documents whose inputs are unchanged")
+    parser.add_argument("--dedup", nargs="?", const=True, metavar="INDEX",
+                        help="drop near-duplicates of questions in this index (default .cache/dedup_index.npz), "
+                             "then add the new ones to it")
+    args = parser.parse_args()
+
+    index = None
+    if args.dedup:
+        from dedup import DEDUP_INDEX_PATH, open_index
+        args.dedup = DEDUP_INDEX_PATH if args.dedup is True else args.dedup
+        index = open_index(args.dedup)
+    pipeline, written, manifest = build_bank(args.count, args.output_dir, args.images_dir, args.chunk_size,
+                                             args.seed, docx=args.docx, sequential=args.sequential,
+                                             incremental=args.incremental, render_workers=args.workers,
+                                             render=not args.no_render, dedup=index)
+    if index is not None:
+        index.save(args.dedup)
+    print(pipeline.report())
+    if index is not None:
+        deduplicator = next(stage.fn for stage in pipeline.stages if stage.name == "dedup")
+        print(f"dedup: {deduplicator.rejected} near-duplicates dropped, {len(index):,} questions indexed")
+    if args.incremental:
+        print(f"incremental: {manifest.built} files rebuilt, {manifest.skipped} unchanged")
+    print(f"{written} questions written, {written / pipeline.wall:,.0f} questions/s, "
+          f"peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Plugin Registry
+Named generators, renderers and exporters registered as "module:attribute" strings, so a
+backend's module (and whatever heavy libraries it pulls in) is imported only when selected
+"""
+
+import importlib
+
+
+class PluginNotFound(LookupError):
+    """Raised when a plugin name is not registered"""
+
+
+class Registry:
+    """Name -> lazily imported object for one kind of plugin"""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self._targets = {}      # name -> "module:attribute" or an already loaded object
+        self._descriptions = {}
+
+    def register(self, name, target, description=""):
+        """Register a plugin by import path ("module:attribute.path") or by object"""
+        self._targets[name] = target
+        self._descriptions[name] = description
+
+    def names(self):
+        return list(self._targets)
+
+    def describe(self):
+        """(name, description) pairs in registration order"""
+        return [(name, self._descriptions[name]) for name in self._targets]
+
+    def load(self, name):
+        """Import and return the plugin registered under name"""
+        try:
+            target = self._targets[name]
+        except KeyError:
+            raise PluginNotFound(f"unknown {self.kind} {name!r}; choose from {', '.join(self._targets)}") from None
+        if isinstance(target, str):
+            module_name, _, attribute = target.partition(":")
+            target = importlib.import_module(module_name)
+            for part in attribute.split("."):
+                target = getattr(target, part)
+            self._targets[name] = target
+        return target
+
+
+GENERATORS = Registry("generator")
+RENDERERS = Registry("renderer")
+EXPORTERS = Registry("exporter")
+
+GENERATORS.register("full", "generate_questions:MathQuestionGenerator", "base questions with images and .docx")
+GENERATORS.register("simple", "simple_generator:SimpleMathQuestionGenerator", "base questions, text outputs only")
+GENERATORS.register("final", "final_generator:FinalMathQuestionGenerator", "base questions with curriculum analysis")
+
+RENDERERS.register("question-images", "backends:render_question_images", "menu table and container diagram (PIL)")
+RENDERERS.register("container-matplotlib", "backends:render_container_matplotlib",
+                   "container diagram through the matplotlib reference renderer")
+RENDERERS.register("simple-images", "backends:render_simple_images", "SimpleImageGenerator image set")
+
+EXPORTERS.register("format", "backends:export_format", "@format text (questions_formatted.txt)")
+EXPORTERS.register("markdown", "backends:export_markdown", "Markdown assessment")
+EXPORTERS.register("text", "backends:export_text", "plain-text assessment")
+EXPORTERS.register("word-text", "backends:export_word_text", "Word-like text assessment")
+EXPORTERS.register("curriculum", "backends:export_curriculum", "curriculum hierarchy and mapping")
+EXPORTERS.register("comprehensive", "backends:export_comprehensive", "final comprehensive assessment")
+EXPORTERS.register("docx", "backends:export_docx", "Word document, streamed from a template package")
+EXPORTERS.register("bank", "backends:export_bank", "columnar question bank directory")
+EXPORTERS.register("python-docx", "backends:export_python_docx", "Word document built in memory with python-docx")
+
+
+def load_plugins(modules):
+    """Import third-party plugin modules; they register themselves on the registries above"""
+    for module_name in modules:
+        importlib.import_module(module_name)
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Columnar Question Bank
+A compact `Question` record type and a column store for millions of them: fixed-width
+fields and dictionary codes in a NumPy structured array, free text in one UTF-8 heap.
+Banks append in bulk, save to a directory and load back memory-mapped, and filter on
+curriculum codes or difficulty without decoding any question text.
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from curriculum import CURRICULUM_INDEX
+from render_cache import atomic_open, atomic_write
+
+DIFFICULTIES = ["easy", "moderate", "hard"]
+
+# Columns stored as small integer codes into a per-bank vocabulary
+CODED_FIELDS = ("subject", "unit", "topic", "difficulty")
+CODE_LIMIT = np.iinfo(np.int16).max + 1
+
+# Free-text columns, stored in this order at the start of each record's heap strings
+TEXT_FIELDS = ("question", "explanation", "title", "description", "instruction")
+
+RECORD_DTYPE = np.dtype([
+    ("subject", np.int16), ("unit", np.int16), ("topic", np.int16), ("difficulty", np.int16),
+    ("order", np.int32), ("plusmarks", np.int16),
+    ("correct", np.int8),       # correct option position; == options when the answer is not an option
+    ("options", np.int8),       # number of options
+    ("first_string", np.int64), # first heap string: TEXT_FIELDS, options..., [answer]
+])
+
+
+class Question:
+    """One question; reads like the generators' question dicts (q["topic"]) at a fraction of the memory"""
+
+    __slots__ = ("title", "description", "question", "instruction", "difficulty", "order", "options",
+                 "correct_answer", "explanation", "subject", "unit", "topic", "plusmarks")
+
+    def __init__(self, title, description, question, instruction, difficulty, order, options,
+                 correct_answer, explanation, subject, unit, topic, plusmarks):
+        self.title = title
+        self.description = description
+        self.question = question
+        self.instruction = instruction
+        self.difficulty = difficulty
+        self.order = order
+        self.options = options
+        self.correct_answer = correct_answer
+        self.explanation = explanation
+        self.subject = subject
+        self.unit = unit
+        self.topic = topic
+        self.plusmarks = plusmarks
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{name: data[name] for name in cls.__slots__})
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+    def __eq__(self, other):
+        return isinstance(other, Question) and all(getattr(self, n) == getattr(other, n) for n in self.__slots__)
+
+    def __repr__(self):
+        return f"Question(order={self.order}, topic={self.topic!r}, difficulty={self.difficulty!r})"
+
+
+def _default_vocabularies():
+    # Seed with the curriculum so codes match CURRICULUM_INDEX ids for known names
+    topics = list(dict.fromkeys(CURRICULUM_INDEX.topics))
+    return {"subject": list(CURRICULUM_INDEX.subjects), "unit": list(CURRICULUM_INDEX.units),
+            "topic": topics, "difficulty": list(DIFFICULTIES)}
+
+
+class QuestionBank:
+    """Column store of questions; see the module docstring"""
+
+    def __init__(self):
+        self.vocabularies = _default_vocabularies()
+        self._codes = {field: {name: code for code, name in enumerate(names)}
+                       for field, names in self.vocabularies.items()}
+        self._record_chunks = []
+        self._offset_chunks = [np.zeros(1, dtype=np.int64)]   # heap string boundaries
+        self._heap = bytearray()
+        self._records = np.empty(0, dtype=RECORD_DTYPE)
+        self._offsets = self._offset_chunks[0]
+        self._strings = 0
+
+    # Building
+
+    def _encode(self, field, values):
+        codes, names = self._codes[field], self.vocabularies[field]
+        out = np.empty(len(values), dtype=np.int16)
+        for i, value in enumerate(values):
+            code = codes.get(value)
+            if code is None:
+                if len(names) >= CODE_LIMIT:
+                    raise OverflowError(f"more than {CODE_LIMIT} distinct {field} values")
+                code = codes[value] = len(names)
+                names.append(value)
+            out[i] = code
+        return out
+
+    def append(self, questions):
+        """Bulk-append question dicts or Question objects; returns the number appended"""
+        questions = list(questions)
+        if not questions:
+            return 0
+        self._thaw()
+        records = np.empty(len(questions), dtype=RECORD_DTYPE)
+        for field in CODED_FIELDS:
+            records[field] = self._encode(field, [q[field] for q in questions])
+        records["order"] = [q["order"] for q in questions]
+        records["plusmarks"] = [q["plusmarks"] for q in questions]
+
+        strings, correct, counts = [], [], []
+        for q in questions:
+            options = q["options"]
+            strings += [q[field] for field in TEXT_FIELDS]
+            strings += options
+            try:
+                correct.append(options.index(q["correct_answer"]))
+            except ValueError:
+                correct.append(len(options))
+                strings.append(q["correct_answer"])
+            counts.append(len(options))
+        records["correct"] = correct
+        records["options"] = counts
+        per_record = len(TEXT_FIELDS) + records["options"].astype(np.int64) + (records["correct"] == records["options"])
+        records["first_string"] = self._strings + np.concatenate([[0], np.cumsum(per_record)[:-1]])
+
+        encoded = [s.encode("utf-8") for s in strings]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        self._offset_chunks.append(len(self._heap) + np.cumsum(lengths))
+        self._heap += b"".join(encoded)
+        self._record_chunks.append(records)
+        self._strings += len(encoded)
+        return len(questions)
+
+    def _thaw(self):
+        """Copy memory-mapped columns into writable memory before the first append after load"""
+        if isinstance(self._heap, np.memmap):
+            self._heap = bytearray(self._heap)
+            self._records = np.array(self.records)
+            self._offsets = np.array(self.offsets)
+            self._offset_chunks = [self._offsets]
+
+    @property
+    def records(self):
+        """The structured record array (fixed-width columns and codes)"""
+        if self._record_chunks:
+            self._records = np.concatenate([self._records] + self._record_chunks)
+            self._record_chunks = []
+        return self._records
+
+    @property
+    def offsets(self):
+        """(strings + 1,) byte offsets of heap strings"""
+        if len(self._offset_chunks) > 1 or self._offset_chunks[0] is not self._offsets:
+            self._offsets = np.concatenate(self._offset_chunks)
+            self._offset_chunks = [self._offsets]
+        return self._offsets
+
+    def __len__(self):
+        return len(self.records)
+
+    # Reading
+
+    def _string(self, index):
+        offsets = self.offsets
+        return bytes(self._heap[offsets[index]:offsets[index + 1]]).decode("utf-8")
+
+    def code(self, field, value):
+        """Code of a value in a coded column, or -1 if the bank has never seen it"""
+        return self._codes[field].get(value, -1)
+
+    def column(self, field, rows=None):
+        """Project one column for the given rows (default all).
+
+        Coded and numeric columns come back as arrays of values without touching the heap;
+        text columns (TEXT_FIELDS, "options", "correct_answer") decode only the requested rows.
+        """
+        records = self.records if rows is None else self.records[rows]
+        if field in CODED_FIELDS:
+            return np.array(self.vocabularies[field], dtype=object)[records[field]]
+        if field in ("order", "plusmarks"):
+            return records[field]
+        if field == "correct_index":
+            return records["correct"]
+        firsts = records["first_string"]
+        start = len(TEXT_FIELDS)
+        if field in TEXT_FIELDS:
+            return [self._string(i + TEXT_FIELDS.index(field)) for i in firsts]
+        if field == "options":
+            return [[self._string(i + start + j) for j in range(n)] for i, n in zip(firsts, records["options"])]
+        if field == "correct_answer":
+            return [self._string(i + start + c) for i, c in zip(firsts, records["correct"])]
+        raise KeyError(field)
+
+    def where(self, **criteria):
+        """Row indices matching every criterion, e.g. where(unit="Algebra", difficulty=["moderate", "hard"])"""
+        records = self.records
+        mask = np.ones(len(records), dtype=bool)
+        for field, wanted in criteria.items():
+            if field not in CODED_FIELDS:
+                raise KeyError(f"can only filter on coded columns {CODED_FIELDS}, not {field!r}")
+            values = [wanted] if isinstance(wanted, str) else list(wanted)
+            mask &= np.isin(records[field], [self.code(field, value) for value in values])
+        return np.flatnonzero(mask)
+
+    def question(self, row):
+        """Materialize one row as a Question"""
+        record = self.records[row]
+        first, count, correct = int(record["first_string"]), int(record["options"]), int(record["correct"])
+        texts = len(TEXT_FIELDS)
+        bounds = self.offsets[first:first + texts + 1 + count + (correct == count)].tolist()
+        blob = bytes(self._heap[bounds[0]:bounds[-1]])
+        strings = [blob[start - bounds[0]:end - bounds[0]].decode("utf-8") for start, end in zip(bounds, bounds[1:])]
+        vocab = self.vocabularies
+        return Question(
+            **dict(zip(TEXT_FIELDS, strings)),
+            difficulty=vocab["difficulty"][record["difficulty"]], order=int(record["order"]),
+            options=strings[texts:texts + count], correct_answer=strings[texts + correct],
+            subject=vocab["subject"][record["subject"]], unit=vocab["unit"][record["unit"]],
+            topic=vocab["topic"][record["topic"]], plusmarks=int(record["plusmarks"]))
+
+    __getitem__ = question
+
+    def questions(self, rows=None):
+        """Lazily materialize rows (default all) as Questions"""
+        for row in range(len(self)) if rows is None else rows:
+            yield self.question(int(row))
+
+    def __iter__(self):
+        return self.questions()
+
+    # Persistence
+
+    def save(self, directory):
+        """Write records.npy, offsets.npy, heap.bin and vocabularies.json into directory.
+
+        Every file is replaced atomically, so a bank memory-mapped from directory can be
+        saved back to it: the mapping keeps reading the old files.
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name, array in (("records.npy", self.records), ("offsets.npy", self.offsets)):
+            with atomic_open(os.path.join(directory, name)) as f:
+                np.save(f, array)
+        atomic_write(os.path.join(directory, "heap.bin"), bytes(self._heap))
+        atomic_write(os.path.join(directory, "vocabularies.json"),
+                     json.dumps(self.vocabularies, ensure_ascii=False).encode("utf-8"))
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """Open a saved bank; with mmap the columns and heap stay on disk until touched"""
+        bank = cls()
+        with open(os.path.join(directory, "vocabularies.json"), encoding="utf-8") as f:
+            bank.vocabularies = json.load(f)
+        if set(bank.vocabularies) != set(CODED_FIELDS):
+            raise ValueError(f"{directory} was saved by an incompatible version of the bank layout")
+        bank._codes = {field: {name: code for code, name in enumerate(names)}
+                       for field, names in bank.vocabularies.items()}
+        mode = "r" if mmap else None
+        bank._records = np.load(os.path.join(directory, "records.npy"), mmap_mode=mode)
+        bank._offsets = np.load(os.path.join(directory, "offsets.npy"), mmap_mode=mode)
+        bank._offset_chunks = [bank._offsets]
+        bank._strings = len(bank._offsets) - 1
+        heap_path = os.path.join(directory, "heap.bin")
+        if not mmap:
+            with open(heap_path, "rb") as f:
+                bank._heap = bytearray(f.read())
+        elif os.path.getsize(heap_path):
+            bank._heap = np.memmap(heap_path, dtype=np.uint8, mode="r")
+        return bank
+
+
+def main():
+    """Compare the memory of question dicts with a columnar bank, and time bank operations"""
+    import tempfile
+    import tracemalloc
+    from generate_questions import MathQuestionGenerator
+
+    parser = argparse.ArgumentParser(description="Benchmark the columnar question bank")
+    parser.add_argument("--count", type=int, default=200_000)
+    args = parser.parse_args()
+
+    generator = MathQuestionGenerator()
+    half = args.count // 2
+    batches = [generator.generate_question_1_variants(half, seed=1),
+               generator.generate_question_2_variants(args.count - half, seed=2)]
+
+    tracemalloc.start()
+    dicts = [q for batch in batches for q in batch.iter_questions()]
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    bank = QuestionBank()
+    bank.append(dicts)
+    len(bank)
+    elapsed = time.perf_counter() - started
+    bank_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{len(dicts)} questions: dicts {dict_bytes / 1e6:.0f} MB, bank {bank_bytes / 1e6:.0f} MB "
+          f"(appended in {elapsed:.2f} s)")
+    del dicts
+
+    with tempfile.TemporaryDirectory() as directory:
+        bank.save(directory)
+        started = time.perf_counter()
+        loaded = QuestionBank.load(directory)
+        rows = loaded.where(unit="Geometry and Measurement", difficulty="moderate")
+        elapsed = time.perf_counter() - started
+        print(f"mmap load + filter: {len(rows)} rows in {elapsed * 1000:.1f} ms")
+        started = time.perf_counter()
+        texts = loaded.column("question", rows[:1000])
+        print(f"project 'question' for 1000 rows: {(time.perf_counter() - started) * 1000:.1f} ms "
+              f"({len(texts[0])} chars in the first)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Question Generation Service
+Long-running asyncio HTTP server around the variant generators. Families, renderers and the
+render cache stay warm between requests; identical concurrent requests share one answer,
+and unseeded requests arriving within a few milliseconds of each other are solved
+together in one bulk batch.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from http_util import read_request, write_json, write_text
+from llm_client import percentile
+
+# Topics served, with the variant family generating each
+TOPIC_FAMILIES = {"Counting & Arrangement Problems": "menu", "Area & Volume": "packing"}
+MAX_COUNT = 10_000
+DIAGRAM_VERSION = 1
+
+
+class ServiceError(Exception):
+    """A request the service cannot answer, with the HTTP status to answer it with"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class GenerationService:
+    """HTTP front end to the variant families with request coalescing and micro-batching"""
+
+    def __init__(self, host="127.0.0.1", port=0, batch_window=0.005, max_batch=4096, workers=4, seed=None):
+        from generate_questions import MathQuestionGenerator
+        from packing import PackingVariants
+        from render_cache import RenderCache
+        from variants import MenuCombinationVariants
+
+        self.host = host
+        self.port = port
+        self.batch_window = batch_window    # seconds a request waits for others to batch with
+        self.max_batch = max_batch          # questions that trigger a batch without waiting
+        self.families = {"menu": MenuCombinationVariants(), "packing": PackingVariants()}
+        self.generator = MathQuestionGenerator()
+        self.render_cache = RenderCache()
+        self._render_lock = threading.Lock()    # the render cache is shared by the worker threads
+        self.executor = ThreadPoolExecutor(workers)
+        self.seeds = np.random.SeedSequence(seed)
+
+        # Difficulties each family actually produces, from a warm-up batch
+        self.difficulties = {name: set(family.sample(512, seed=0).difficulty.tolist())
+                             for name, family in self.families.items()}
+
+        self.stats = {"requests": 0, "questions": 0, "coalesced": 0, "batches": 0, "batched_requests": 0,
+                      "errors": 0}
+        self.latencies = deque(maxlen=100_000)     # seconds per answered request
+        self._inflight = {}     # request key -> task answering it
+        self._pending = {name: [] for name in self.families}    # family -> [(count, difficulty, images, future)]
+        self._flush_handles = {}
+        self._server = None
+        self._handlers = set()
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        """Start listening; with port 0 an ephemeral port is picked"""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """Stop listening, close open connections and release the worker threads"""
+        self._server.close()
+        for task in self._handlers:
+            task.cancel()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        await self._server.wait_closed()
+        self.executor.shutdown(wait=False)
+
+    async def serve_forever(self):
+        await self.start()
+        print(f"Question service listening on {self.base_url}")
+        async with self._server:
+            await self._server.serve_forever()
+
+    # Generation
+
+    def _family(self, topic, difficulty):
+        family = TOPIC_FAMILIES.get(topic, topic if topic in self.families else None)
+        if family is None:
+            raise ServiceError(404, f"unknown topic {topic!r}; available: {sorted(TOPIC_FAMILIES)}")
+        if difficulty is not None and difficulty not in self.difficulties[family]:
+            raise ServiceError(422, f"topic {topic!r} has no {difficulty!r} questions; "
+                                    f"available: {sorted(self.difficulties[family])}")
+        return family
+
+    async def generate(self, topic, count=1, difficulty=None, seed=None, images=False):
+        """Questions for one request; identical concurrent requests share a single answer"""
+        if not 1 <= count <= MAX_COUNT:
+            raise ServiceError(400, f"count must be between 1 and {MAX_COUNT}")
+        family = self._family(topic, difficulty)
+        key = (family, count, difficulty, seed, images)
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            if seed is None:
+                task = self._enqueue(family, count, difficulty, images)
+            else:
+                # Seeded requests are solved on their own so the same seed always gives the same questions
+                task = asyncio.ensure_future(self._solve_alone(family, count, difficulty, images, seed))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _solve_alone(self, family, count, difficulty, images, seed):
+        loop = asyncio.get_running_loop()
+        answers = await loop.run_in_executor(self.executor, self._solve, family, [(count, difficulty, images)], seed)
+        return answers[0]
+
+    def _enqueue(self, family, count, difficulty, images):
+        """Add a request to its family's next micro-batch and return a future for its questions"""
+        future = asyncio.get_running_loop().create_future()
+        pending = self._pending[family]
+        pending.append((count, difficulty, images, future))
+        if sum(request[0] for request in pending) >= self.max_batch:
+            self._flush(family)
+        elif family not in self._flush_handles:
+            self._flush_handles[family] = asyncio.get_running_loop().call_later(self.batch_window, self._flush, family)
+        return future
+
+    def _flush(self, family):
+        handle = self._flush_handles.pop(family, None)
+        if handle is not None:
+            handle.cancel()
+        requests, self._pending[family] = self._pending[family], []
+        if requests:
+            self.stats["batches"] += 1
+            self.stats["batched_requests"] += len(requests)
+            asyncio.ensure_future(self._run_batch(family, requests))
+
+    async def _run_batch(self, family, requests):
+        loop = asyncio.get_running_loop()
+        wants = [(count, difficulty, images) for count, difficulty, images, _ in requests]
+        try:
+            answers = await loop.run_in_executor(self.executor, self._solve, family, wants,
+                                                 self.seeds.spawn(1)[0])
+        except Exception as exc:
+            for *_, future in requests:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for (*_, future), questions in zip(requests, answers):
+            if not future.done():
+                future.set_result(questions)
+
+    def _solve(self, family, wants, seed):
+        """Worker thread: sample one bulk batch (more if needed) and deal verified variants to each want"""
+        rng = np.random.default_rng(seed)
+        answers = [[] for _ in wants]
+        short = {i: count for i, (count, _, _) in enumerate(wants)}
+        while short:
+            batch = self.families[family].sample(max(64, 2 * sum(short.values())), seed=rng)
+            usable = batch.check()
+            for i in list(short):
+                _, difficulty, images = wants[i]
+                rows = np.flatnonzero(usable if difficulty is None else usable & (batch.difficulty == difficulty))
+                rows = rows[:short[i]]
+                usable[rows] = False
+                for row in rows:
+                    answers[i].append(self._question(batch, int(row), len(answers[i]) + 1, family, images))
+                short[i] -= len(rows)
+                if not short[i]:
+                    del short[i]
+        return answers
+
+    def _question(self, batch, row, order, family, images):
+        question = batch.question(row, order=order)
+        if images:
+            import diagrams
+            render = diagrams.draw_table if family == "menu" else diagrams.draw_packing_top_view
+            with self._render_lock:
+                png = self.render_cache.get_or_render(f"{family}_diagram", batch.diagram_params(row), render,
+                                                      DIAGRAM_VERSION)
+            question["image_png_base64"] = base64.b64encode(png).decode("ascii")
+        return question
+
+    # HTTP
+
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                await self._respond(request, writer)
+                if not request["keep_alive"]:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # Cancelled by stop(); finish normally so asyncio does not log the cancellation
+            pass
+        finally:
+            self._handlers.discard(task)
+            writer.close()
+
+    async def _respond(self, request, writer):
+        started = time.perf_counter()
+        keep_alive = request["keep_alive"]
+        path, method = request["path"].split("?")[0], request["method"]
+        if method == "GET" and path == "/metrics":
+            await write_json(writer, 200, self.metrics(), keep_alive)
+            return
+        if method == "GET" and path == "/v1/topics":
+            await write_json(writer, 200, {topic: sorted(self.difficulties[family])
+                                           for topic, family in TOPIC_FAMILIES.items()}, keep_alive)
+            return
+        if method != "POST" or path != "/v1/questions":
+            await write_json(writer, 404, {"error": {"message": "not found"}}, keep_alive)
+            return
+
+        self.stats["requests"] += 1
+        try:
+            try:
+                body = json.loads(request["body"] or b"{}")
+                topic, difficulty = body["topic"], body.get("difficulty")
+                if not isinstance(topic, str) or not isinstance(difficulty, (str, type(None))):
+                    raise TypeError("topic and difficulty must be strings")
+                count = int(body.get("count", 1))
+                seed = None if body.get("seed") is None else int(body["seed"])
+            except (ValueError, KeyError, TypeError):
+                raise ServiceError(400, "body must be JSON with a topic and an optional count, difficulty, "
+                                        "seed, images and format")
+            try:
+                questions = await self.generate(topic, count, difficulty, seed, bool(body.get("images")))
+            except ServiceError:
+                raise
+            except Exception as exc:
+                # Answer rather than drop the connection; the service keeps serving other requests
+                raise ServiceError(500, f"generation failed: {type(exc).__name__}: {exc}")
+        except ServiceError as exc:
+            self.stats["errors"] += 1
+            await write_json(writer, exc.status, {"error": {"message": str(exc)}}, keep_alive)
+            return
+
+        self.stats["questions"] += len(questions)
+        if body.get("format") == "@format":
+            await write_text(writer, 200, "".join(map(self.generator.format_question_output, questions)),
+                             keep_alive=keep_alive)
+        else:
+            await write_json(writer, 200, {"questions": questions}, keep_alive)
+        self.latencies.append(time.perf_counter() - started)
+
+    def metrics(self):
+        """Counters plus request latency percentiles in milliseconds"""
+        latencies = list(self.latencies)
+        batches = self.stats["batches"]
+        return {**self.stats,
+                "mean_batch_requests": self.stats["batched_requests"] / batches if batches else 0.0,
+                "latency_ms": {"p50": percentile(latencies, 50) * 1000, "p99": percentile(latencies, 99) * 1000,
+                               "samples": len(latencies)},
+                "render_cache": self.render_cache.stats}
+
+
+def main():
+    """Run the service until interrupted"""
+    parser = argparse.ArgumentParser(description="Serve generated questions over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8020)
+    parser.add_argument("--batch-window", type=float, default=0.005, help="seconds to gather a micro-batch")
+    parser.add_argument("--max-batch", type=int, default=4096, help="questions that close a micro-batch early")
+    parser.add_argument("--workers", type=int, default=4, help="generation threads")
+    args = parser.parse_args()
+    service = GenerationService(args.host, args.port, args.batch_window, args.max_batch, args.workers)
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Diagram Render Cache
+Content-addressed PNG cache keyed on a diagram's parameters and renderer version,
+with a bounded in-memory tier in front of an on-disk store
+"""
+
+import contextlib
+import hashlib
+import io
+import json
+import os
+import tempfile
+from collections import OrderedDict
+
+import instrumentation
+
+RENDER_CACHE_DIR = os.path.join(".cache", "renders")
+
+
+def render_key(kind, params, version):
+    """Stable hash of a diagram kind, its parameters and the renderer version"""
+    blob = json.dumps({"kind": kind, "version": version, "params": params}, sort_keys=True,
+                      separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+@contextlib.contextmanager
+def atomic_open(path, mode="wb", encoding=None):
+    """Open a temporary file beside path for writing; it replaces path only if the block succeeds"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, mode, encoding=encoding) as f:
+            yield f
+        os.chmod(tmp_path, 0o644)  # mkstemp creates files private to the owner
+        os.replace(tmp_path, path)
+        count_written(path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def count_written(path):
+    """Count a finished file and its size towards the bytes-written metrics"""
+    if instrumentation.active() is not None:
+        kind = os.path.splitext(path)[1].lstrip(".") or "other"
+        instrumentation.count("files_written", kind=kind)
+        instrumentation.count("bytes_written", os.path.getsize(path), kind=kind)
+
+
+def atomic_write(path, data):
+    """Write bytes to path via a temporary file and rename, so readers never see a partial file"""
+    with atomic_open(path) as f:
+        f.write(data)
+
+
+def write_if_changed(path, data):
+    """Write bytes to path unless it already holds exactly them; returns True if written"""
+    try:
+        if os.path.getsize(path) == len(data):
+            with open(path, "rb") as f:
+                if f.read() == data:
+                    return False
+    except OSError:
+        pass
+    atomic_write(path, data)
+    return True
+
+
+class RenderCache:
+    """Two-tier cache of rendered diagrams as PNG bytes"""
+
+    def __init__(self, directory=RENDER_CACHE_DIR, max_memory_bytes=64 << 20):
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "renders": 0}
+        self._memory = OrderedDict()    # key -> PNG bytes
+        self._memory_bytes = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".png")
+
+    def _remember(self, key, png):
+        self._memory[key] = png
+        self._memory_bytes += len(png)
+        while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    @staticmethod
+    def encode(image):
+        """PNG bytes of a PIL image"""
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        return buffer.getvalue()
+
+    def get_or_render(self, kind, params, render, version=1):
+        """Return PNG bytes for a diagram, calling render(**params) -> PIL image only on a miss"""
+        key = render_key(kind, params, version)
+        png = self._memory.get(key)
+        if png is not None:
+            self._memory.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            instrumentation.count("cache_hits", cache="render", tier="memory")
+            return png
+
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                png = f.read()
+            self.stats["disk_hits"] += 1
+            instrumentation.count("cache_hits", cache="render", tier="disk")
+        except FileNotFoundError:
+            with instrumentation.span("render", kind=kind):
+                png = self.encode(render(**params))
+            atomic_write(path, png)
+            self.stats["renders"] += 1
+            instrumentation.count("cache_misses", cache="render")
+        self._remember(key, png)
+        return png
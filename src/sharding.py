@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Sharded Bank Generation
+Splits a bank's chunk plan between shards that run as separate processes or on separate
+machines. Every chunk draws from its own child of one SeedSequence, so the number of
+shards changes which shard draws a chunk but never what it draws. Each shard writes its
+questions as JSON lines, its diagrams and a manifest into its own directory; a k-way
+merge on the original order then combines the shards into one bank numbered 1..N.
+"""
+
+import argparse
+import hashlib
+import heapq
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+from document_writer import DocumentFormat
+from render_cache import atomic_write
+
+SHARD_ROOT = os.path.join("output", "shards")
+SHARD_FORMAT = 1    # bump when the shard layout changes
+
+
+class JSONLinesFormat(DocumentFormat):
+    """One compact JSON object per question per line"""
+
+    def question(self, number, question):
+        return json.dumps(question, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def shard_dir(root, index, shards):
+    return os.path.join(root, f"shard-{index:04d}-of-{shards:04d}")
+
+
+def shard_tasks(count, chunk_size, seed, index, shards):
+    """The chunks of the bank's plan that shard index (0-based) of shards draws: every shards-th one"""
+    from pipeline import plan_chunks
+    if seed is None:
+        raise ValueError("a sharded run needs an explicit seed, shared by every shard")
+    if not 0 <= index < shards:
+        raise ValueError(f"shard index {index} is outside 0..{shards - 1}")
+    return list(plan_chunks(count, chunk_size, seed))[index::shards]
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def run_shard(root, index, shards, count, chunk_size=256, seed=0, render=True, **options):
+    """Generate one shard into its own directory; returns the shard manifest.
+
+    The manifest is written last, so a shard directory without one is incomplete and is
+    rejected by the merge. Options go to pipeline.question_pipeline.
+    """
+    from incremental import BuildManifest
+    from pipeline import question_pipeline
+
+    tasks = shard_tasks(count, chunk_size, seed, index, shards)
+    directory = shard_dir(root, index, shards)
+    questions_path = os.path.join(directory, "questions.jsonl")
+    manifest_path = os.path.join(directory, "manifest.json")
+    if os.path.exists(manifest_path):
+        os.unlink(manifest_path)
+
+    started = time.perf_counter()
+    with BuildManifest(None) as builds:
+        with builds.documents({JSONLinesFormat(): questions_path}) as stream:
+            pipeline = question_pipeline(stream, builds, os.path.join(directory, "images"), render=render, **options)
+            for _ in pipeline.run(tasks):
+                pass
+
+    manifest = {
+        "format": SHARD_FORMAT,
+        "shard": index,
+        "shards": shards,
+        "count": count,
+        "chunk_size": chunk_size,
+        "seed": seed,
+        "chunks": [[family, first, size] for family, first, size, _ in tasks],
+        "questions": stream.count,
+        "images": render,
+        "sha256": file_digest(questions_path),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    atomic_write(manifest_path, json.dumps(manifest, indent=2).encode("utf-8"))
+    return manifest
+
+
+def load_manifests(root, shards=None):
+    """Manifests of the shards of one run under root, checked to be complete; sorted by shard.
+
+    With shards, only the directories of a run split that many ways are read, so shards
+    left under root by runs with another shard count are ignored.
+    """
+    from pipeline import plan_chunks
+
+    suffix = "" if shards is None else f"-of-{shards:04d}"
+    manifests, directories = [], []
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name, "manifest.json")
+        if name.startswith("shard-") and name.endswith(suffix) and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                manifests.append(json.load(f))
+            directories.append(name)
+    if not manifests:
+        raise ValueError(f"no finished shards{f' of {shards}' if shards else ''} under {root}")
+
+    first = manifests[0]
+    run = ("format", "shards", "count", "chunk_size", "seed")
+    for manifest, directory in zip(manifests, directories):
+        if any(manifest[key] != first[key] for key in run):
+            raise ValueError(f"{os.path.join(root, directory)} belongs to a different run than "
+                             f"{os.path.join(root, directories[0])}; pass the run's shard count or clear {root}")
+    missing = sorted(set(range(first["shards"])) - {manifest["shard"] for manifest in manifests})
+    if missing:
+        raise ValueError(f"shards {missing} of {first['shards']} have not finished")
+    plan = [[family, order, size] for family, order, size, _ in plan_chunks(first["count"], first["chunk_size"],
+                                                                             first["seed"])]
+    for manifest in manifests:
+        if manifest["chunks"] != plan[manifest["shard"]::first["shards"]]:
+            raise ValueError(f"shard {manifest['shard']} did not draw its share of the plan")
+    return manifests
+
+
+def _read_shard(position, directory, digests):
+    """(original order, position, question) from one shard's JSON lines, in order.
+
+    The file's hash is stored in digests[position] once it has been read to the end.
+    """
+    digest = hashlib.sha256()
+    with open(os.path.join(directory, "questions.jsonl"), "rb") as f:
+        for line in f:
+            digest.update(line)
+            question = json.loads(line)
+            yield question["order"], position, question
+    digests[position] = digest.hexdigest()
+
+
+def _place(source, target):
+    """Hard-link source to target (copying across file systems), replacing any old target"""
+    tmp = target + ".tmp"
+    try:
+        os.link(source, tmp)
+    except OSError:
+        shutil.copyfile(source, tmp)
+    os.replace(tmp, target)
+
+
+def merge_shards(root=SHARD_ROOT, output_dir="output", images_dir="images/bank", docx=False, incremental=False,
+                 shards=None):
+    """K-way merge the shards of one run under root into one bank with @order renumbered 1..N.
+
+    Writes output_dir/bank_formatted.txt (and bank_assessment.docx), the same files
+    pipeline.build_bank writes for the same count, chunk size and seed, and links each
+    shard diagram to images_dir under its new number. shards picks the run as in
+    load_manifests. Returns (questions, BuildManifest).
+    """
+    from document_writer import QuestionFormat
+    from generate_questions import MathQuestionGenerator
+    from incremental import MANIFEST_PATH, BuildManifest
+
+    manifests = load_manifests(root, shards)
+    directories = [shard_dir(root, manifest["shard"], manifest["shards"]) for manifest in manifests]
+    images = all(manifest["images"] for manifest in manifests)
+    if images:
+        os.makedirs(images_dir, exist_ok=True)
+
+    paths = {QuestionFormat(MathQuestionGenerator().format_question_output): os.path.join(output_dir, "bank_formatted.txt")}
+    if docx:
+        from docx_writer import DocxFormat
+        paths[DocxFormat()] = os.path.join(output_dir, "bank_assessment.docx")
+
+    digests = {}
+    readers = [_read_shard(position, directory, digests) for position, directory in enumerate(directories)]
+    with BuildManifest(MANIFEST_PATH if incremental else None) as builds:
+        with builds.documents(paths) as stream:
+            previous = 0
+            for order, position, question in heapq.merge(*readers, key=lambda entry: entry[0]):
+                if order <= previous:
+                    raise ValueError(f"question {order} appears twice (again in shard {manifests[position]['shard']})")
+                previous = order
+                question["order"] = stream.count + 1
+                stream.write(question)
+                if images:
+                    _place(os.path.join(directories[position], "images", f"question_{order:07d}.png"),
+                           os.path.join(images_dir, f"question_{question['order']:07d}.png"))
+            for position, manifest in enumerate(manifests):
+                # Raising here discards the merged documents: the old ones stay in place
+                if digests.get(position) != manifest["sha256"]:
+                    raise ValueError(f"shard {manifest['shard']} questions do not match its manifest")
+    return stream.count, builds
+
+
+def main():
+    """Run one shard, run every shard as local processes, or merge finished shards"""
+    parser = argparse.ArgumentParser(description="Sharded bank generation")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_run_arguments(command):
+        command.add_argument("--count", type=int, default=10_000)
+        command.add_argument("--chunk-size", type=int, default=256)
+        command.add_argument("--seed", type=int, default=0, help="shared by every shard of a run")
+        command.add_argument("--root", default=SHARD_ROOT, help="directory holding the shard directories")
+        command.add_argument("--workers", type=int, help="render processes per shard")
+        command.add_argument("--no-render", action="store_true")
+
+    run = commands.add_parser("run", help="generate one shard, e.g. on one node")
+    run.add_argument("--shard", required=True, help="K/N: shard K (0-based) of N")
+    add_run_arguments(run)
+
+    run_all = commands.add_parser("run-all", help="generate every shard as local processes")
+    run_all.add_argument("--shards", type=int, required=True)
+    run_all.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="shards running at once")
+    run_all.add_argument("--merge", action="store_true", help="merge once every shard has finished")
+    run_all.add_argument("--docx", action="store_true", help="with --merge, also stream a .docx assessment")
+    add_run_arguments(run_all)
+
+    merge = commands.add_parser("merge", help="merge finished shards into one bank")
+    merge.add_argument("--root", default=SHARD_ROOT)
+    merge.add_argument("--shards", type=int, help="merge the run split this many ways (default: the only run)")
+    merge.add_argument("--output-dir", default="output")
+    merge.add_argument("--images-dir", default="images/bank")
+    merge.add_argument("--docx", action="store_true", help="also stream a .docx assessment")
+    merge.add_argument("--incremental", action="store_true", help="keep documents whose inputs are unchanged")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        index, shards = map(int, args.shard.split("/"))
+        manifest = run_shard(args.root, index, shards, args.count, args.chunk_size, args.seed,
+                             render=not args.no_render, render_workers=args.workers)
+        print(f"shard {index}/{shards}: {manifest['questions']} questions in {len(manifest['chunks'])} chunks, "
+              f"{manifest['seconds']:.2f} s")
+        return
+
+    if args.command == "run-all":
+        started = time.perf_counter()
+        command = [sys.executable, os.path.abspath(__file__), "run", "--count", str(args.count),
+                   "--chunk-size", str(args.chunk_size), "--seed", str(args.seed), "--root", args.root]
+        if args.workers:
+            command += ["--workers", str(args.workers)]
+        if args.no_render:
+            command.append("--no-render")
+        processes = []
+        for index in range(args.shards):
+            while sum(process.poll() is None for process in processes) >= args.jobs:
+                time.sleep(0.05)
+            processes.append(subprocess.Popen(command + ["--shard", f"{index}/{args.shards}"]))
+        failed = [index for index, process in enumerate(processes) if process.wait() != 0]
+        print(f"{args.shards} shards in {time.perf_counter() - started:.2f} s")
+        if failed:
+            sys.exit(f"shards {failed} failed")
+        if not args.merge:
+            return
+        args.output_dir, args.images_dir, args.incremental = "output", "images/bank", False
+
+    started = time.perf_counter()
+    written, _ = merge_shards(args.root, args.output_dir, args.images_dir, args.docx, args.incremental, args.shards)
+    seconds = time.perf_counter() - started
+    print(f"merged {written} questions in {seconds:.2f} s ({written / seconds:,.0f} questions/s)")
+
+
+if __name__ == "__main__":
+    main()
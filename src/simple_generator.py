@@ -5,18 +5,18 @@ Generates new math questions similar to base questions
 """
 
 import os
+from curriculum_data import CURRICULUM
+from document_writer import FORMATS, QuestionFormat, render_document, write_document_files
 
 class SimpleMathQuestionGenerator:
     def __init__(self):
-        self.curriculum = {
-            "Quantitative Math": {
-                "Problem Solving": ["Numbers and Operations", "Algebra", "Geometry", "Problem Solving", "Probability and Statistics", "Data Analysis"],
-                "Algebra": ["Algebraic Word Problems", "Interpreting Variables", "Polynomial Expressions (FOIL/Factoring)", "Rational Expressions", "Exponential Expressions (Product rule, negative exponents)", "Quadratic Equations & Functions (Finding roots/solutions, graphing)", "Functions Operations"],
-                "Geometry and Measurement": ["Area & Volume", "Perimeter", "Lines, Angles, & Triangles", "Right Triangles & Trigonometry", "Circles (Area, circumference)", "Coordinate Geometry", "Slope", "Transformations (Dilating a shape)", "Parallel & Perpendicular Lines", "Solid Figures (Volume of Cubes)"],
-                "Numbers and Operations": ["Basic Number Theory", "Prime & Composite Numbers", "Rational Numbers", "Order of Operations", "Estimation", "Fractions, Decimals, & Percents", "Sequences & Series", "Computation with Whole Numbers", "Operations with Negatives"],
-                "Data Analysis & Probability": ["Interpretation of Tables & Graphs", "Trends & Inferences", "Probability (Basic, Compound Events)", "Mean, Median, Mode, & Range", "Weighted Averages", "Counting & Arrangement Problems"]
-            }
-        }
+        self.curriculum = CURRICULUM
+    
+    @property
+    def curriculum_index(self):
+        """Compiled curriculum index, shared by every generator (imports NumPy on first use)"""
+        from curriculum import CURRICULUM_INDEX
+        return CURRICULUM_INDEX
     
     def generate_question_1(self):
         """Generate a question similar to the uniform combinations problem"""
@@ -42,6 +42,11 @@ class SimpleMathQuestionGenerator:
             "plusmarks": 1
         }
     
+    def generate_question_1_variants(self, count, seed=None):
+        """Sample and solve a batch of parametric variants of the uniform combinations problem"""
+        from variants import MenuCombinationVariants
+        return MenuCombinationVariants().sample(count, seed=seed)
+    
     def generate_question_2(self):
         """Generate a question similar to the sphere packing problem"""
         return {
@@ -53,21 +58,34 @@ class SimpleMathQuestionGenerator:
             "order": 2,
             "options": [
                 "$7 \\times 7 \\times 14$ cm",
-                "$7 \\times 7 \\times 21$ cm", 
                 "$14 \\times 14 \\times 14$ cm",
                 "$14 \\times 14 \\times 21$ cm",
-                "$21 \\times 21 \\times 28$ cm"
+                "$17 \\times 17 \\times 14$ cm",
+                "$17 \\times 17 \\times 21$ cm"
             ],
-            "correct_answer": "$14 \\times 14 \\times 21$ cm",
-            "explanation": "Each tennis ball has a radius of 3.5 cm, so diameter = 7 cm. For the circular arrangement of 4 balls, the container diameter must be approximately 14 cm (2 × 7 cm). The height must accommodate 2 layers: 2 × 7 cm = 14 cm, plus some spacing, so approximately 21 cm total. Therefore, the closest dimensions are $14 \\times 14 \\times 21$ cm.",
+            "correct_answer": "$17 \\times 17 \\times 14$ cm",
+            "explanation": "Each tennis ball has a radius of 3.5 cm, so diameter = 7 cm. With 4 balls arranged in a ring, neighbouring balls touch, so the ball centres lie 3.5 / sin(45°) ≈ 4.9 cm from the axis and the container diameter is 2 × (4.9 + 3.5) ≈ 16.9 cm, about 17 cm. The height must accommodate 2 layers: 2 × 7 cm = 14 cm. Therefore, the closest dimensions are $17 \\times 17 \\times 14$ cm.",
             "subject": "Quantitative Math",
             "unit": "Geometry and Measurement",
             "topic": "Area & Volume", 
             "plusmarks": 1
         }
     
+    def generate_question_2_variants(self, count, seed=None):
+        """Sample and solve a batch of parametric variants of the sphere packing problem"""
+        from packing import PackingVariants
+        return PackingVariants().sample(count, seed=seed)
+    
+    def generate_llm_questions(self, specs, pack_size=None, **client_options):
+        """Generate questions for unit/topic/difficulty specs concurrently from a chat model"""
+        from llm_client import generate_questions
+        return generate_questions(specs, pack_size=pack_size, curriculum=self.curriculum, **client_options)
+    
     def format_question_output(self, question_data):
         """Format question data according to the specified output format"""
+        # @@option marks whichever option is the correct answer
+        options = "\n".join(f"{'@@option' if option == question_data['correct_answer'] else '@option'} {option}"
+                            for option in question_data['options'])
         output = f"""@title {question_data['title']}
 @description {question_data['description']}
 
@@ -75,11 +93,7 @@ class SimpleMathQuestionGenerator:
 @instruction {question_data['instruction']}
 @difficulty {question_data['difficulty']}
 @order {question_data['order']}
-@option {question_data['options'][0]}
-@option {question_data['options'][1]}
-@@option {question_data['correct_answer']}
-@option {question_data['options'][3]}
-@option {question_data['options'][4]}
+{options}
 @explanation {question_data['explanation']}
 @subject {question_data['subject']}
 @unit {question_data['unit']}
@@ -91,31 +105,7 @@ class SimpleMathQuestionGenerator:
     
     def create_markdown_document(self, questions):
         """Create a markdown document with the generated questions"""
-        md_content = "# Math Question Generation - Assessment\n\n"
-        md_content += "This document contains two newly generated math questions following the specified format and curriculum hierarchy.\n\n"
-        
-        for i, question in enumerate(questions, 1):
-            md_content += f"## Question {i}\n\n"
-            md_content += f"{question['question']}\n\n"
-            
-            md_content += "### Options:\n"
-            for j, option in enumerate(question['options'], 1):
-                marker = "✓" if option == question['correct_answer'] else "○"
-                md_content += f"{marker} {option}\n"
-            
-            md_content += f"\n### Explanation:\n{question['explanation']}\n\n"
-            
-            md_content += "### Question Metadata:\n"
-            md_content += f"- **Subject**: {question['subject']}\n"
-            md_content += f"- **Unit**: {question['unit']}\n"
-            md_content += f"- **Topic**: {question['topic']}\n"
-            md_content += f"- **Difficulty**: {question['difficulty']}\n"
-            md_content += f"- **Marks**: {question['plusmarks']}\n\n"
-            
-            if i < len(questions):
-                md_content += "---\n\n"
-        
-        return md_content
+        return render_document(FORMATS["markdown"], questions)
     
     def generate_all_questions(self):
         """Generate all questions and create outputs"""
@@ -126,23 +116,19 @@ class SimpleMathQuestionGenerator:
         question2 = self.generate_question_2()
         questions = [question1, question2]
         
+        # Drop any item whose marked answer does not check out
+        from verify import accept_verified
+        questions = accept_verified(questions)
+        
         # Create output directory
         os.makedirs('output', exist_ok=True)
         
-        # Save raw formatted output
-        with open('output/questions_formatted.txt', 'w', encoding='utf-8') as f:
-            for question in questions:
-                f.write(self.format_question_output(question))
-        
-        # Create markdown document
-        md_content = self.create_markdown_document(questions)
-        with open('output/Math_Questions_Assessment.md', 'w', encoding='utf-8') as f:
-            f.write(md_content)
-        
-        # Create text document (Word-like format)
-        text_content = self.create_text_document(questions)
-        with open('output/Math_Questions_Assessment.txt', 'w', encoding='utf-8') as f:
-            f.write(text_content)
+        # Write the raw formatted output, markdown and text (Word-like) documents in one pass
+        write_document_files(questions, {
+            QuestionFormat(self.format_question_output): 'output/questions_formatted.txt',
+            "markdown": 'output/Math_Questions_Assessment.md',
+            "text": 'output/Math_Questions_Assessment.txt',
+        })
         
         print("Questions generated successfully!")
         print("Output files created in 'output/' directory")
@@ -151,36 +137,7 @@ class SimpleMathQuestionGenerator:
     
     def create_text_document(self, questions):
         """Create a text document that mimics Word document formatting"""
-        content = "=" * 60 + "\n"
-        content += "MATH QUESTION GENERATION - ASSESSMENT\n"
-        content += "=" * 60 + "\n\n"
-        
-        content += "This document contains two newly generated math questions following the specified format and curriculum hierarchy.\n\n"
-        
-        for i, question in enumerate(questions, 1):
-            content += f"QUESTION {i}\n"
-            content += "-" * 40 + "\n\n"
-            
-            content += f"QUESTION TEXT:\n{question['question']}\n\n"
-            
-            content += "OPTIONS:\n"
-            for j, option in enumerate(question['options'], 1):
-                marker = "[CORRECT]" if option == question['correct_answer'] else "[ ]"
-                content += f"{marker} {option}\n"
-            
-            content += f"\nEXPLANATION:\n{question['explanation']}\n\n"
-            
-            content += "METADATA:\n"
-            content += f"Subject: {question['subject']}\n"
-            content += f"Unit: {question['unit']}\n"
-            content += f"Topic: {question['topic']}\n"
-            content += f"Difficulty: {question['difficulty']}\n"
-            content += f"Marks: {question['plusmarks']}\n\n"
-            
-            if i < len(questions):
-                content += "=" * 60 + "\n\n"
-        
-        return content
+        return render_document(FORMATS["text"], questions)
 
 def main():
     """Main function to run the question generator"""
@@ -0,0 +1,181 @@
+"""
+Parametric Question Variant Engine
+Samples and solves whole families of counting-principle questions in bulk with NumPy
+"""
+
+import numpy as np
+
+from distractors import DistractorEngine, ErrorModel
+
+# Menu categories as (table header, plural noun, item vocabulary)
+MENU_CATEGORIES = [
+    ("Main Dish", "main dishes", ["Grilled Chicken", "Beef Burger", "Fish Fillet", "Vegetarian Pasta",
+                                  "Chicken Wrap", "Veggie Burger", "Shrimp Tacos", "Turkey Sandwich"]),
+    ("Side Dish", "side dishes", ["French Fries", "Coleslaw", "Mashed Potatoes", "Garden Salad",
+                                  "Onion Rings", "Steamed Rice", "Corn on the Cob", "Baked Beans"]),
+    ("Drink", "drinks", ["Lemonade", "Iced Tea", "Orange Juice", "Sparkling Water",
+                         "Apple Juice", "Milk"]),
+    ("Dessert", "desserts", ["Apple Pie", "Chocolate Cake", "Fruit Cup", "Ice Cream",
+                             "Brownie", "Cheesecake"]),
+]
+
+class VariantBatch:
+    """A batch of solved question variants held as NumPy arrays"""
+
+    def __len__(self):
+        return len(self.answers)
+
+    def question(self, index, order=1):
+        """Materialize one variant as a question dict"""
+        raise NotImplementedError
+
+    def iter_questions(self, start_order=1):
+        """Yield question dicts one at a time without building a list"""
+        for i in range(len(self)):
+            yield self.question(i, order=start_order + i)
+
+    def to_questions(self, start_order=1):
+        """Materialize every variant as a list of question dicts"""
+        return list(self.iter_questions(start_order))
+
+
+def _smallest_used(p):
+    return np.where(p["used"], p["counts"], np.iinfo(p["counts"].dtype).max).min(axis=1)
+
+
+# Counting-principle mistakes, in the order they are offered as distractors
+MENU_ERROR_MODELS = [
+    ErrorModel("added", "adding the category sizes instead of multiplying them",
+               lambda p: p["counts"].sum(axis=1)),
+    ErrorModel("smallest-minus-one", "one item too few in the smallest category",
+               lambda p: p["answers"] - p["answers"] // _smallest_used(p)),
+    ErrorModel("smallest-plus-one", "one item too many in the smallest category",
+               lambda p: p["answers"] + p["answers"] // _smallest_used(p)),
+    ErrorModel("extra-largest", "adding the largest category once more",
+               lambda p: p["answers"] + p["counts"].max(axis=1)),
+    ErrorModel("doubled", "counting every combination twice, as if order mattered",
+               lambda p: p["answers"] * 2),
+    ErrorModel("dropped-largest", "leaving the largest category out of the product",
+               lambda p: np.where(p["used"].sum(axis=1) > 2, p["answers"] // p["counts"].max(axis=1), -1)),
+    ErrorModel("squared-sum", "squaring the number of items on the menu",
+               lambda p: p["counts"].sum(axis=1) ** 2),
+]
+
+MENU_DISTRACTORS = DistractorEngine(
+    MENU_ERROR_MODELS,
+    fallback=lambda answers, p, k: answers[:, None] + np.maximum(1, answers // 4)[:, None] * np.arange(1, k + 1),
+    # Options at least 5% of the answer apart, so no two differ by a rounding slip
+    min_gap=lambda answers: np.maximum(1, answers // 20),
+)
+
+
+class MenuVariantBatch(VariantBatch):
+    """Solved menu-combination variants: counts, chosen items, answers and options"""
+
+    def __init__(self, categories, used, counts, items, answers, options, correct_index, difficulty,
+                 option_sources=None):
+        self.categories = categories          # list of (header, plural, vocabulary)
+        self.used = used                      # (N, K) bool, category appears on the menu
+        self.counts = counts                  # (N, K) int, items offered per category (0 if unused)
+        self.items = items                    # list of K arrays (N, max_items) of vocabulary indices
+        self.answers = answers                # (N,) int, number of combinations
+        self.options = options                # (N, OPTION_COUNT) int, option values in presentation order
+        self.correct_index = correct_index    # (N,) int, position of the answer in options
+        self.difficulty = difficulty          # (N,) str
+        self.option_sources = option_sources  # (N, OPTION_COUNT) int, error model behind each option
+
+    def check(self):
+        """Re-count every variant and return a bool mask of items whose marked option is right"""
+        expected = np.where(self.used, self.counts, 1).prod(axis=1)
+        marked = self.options[np.arange(len(self)), self.correct_index]
+        unique = (np.diff(np.sort(self.options, axis=1), axis=1) != 0).all(axis=1)
+        return (marked == expected) & ((self.options == expected[:, None]).sum(axis=1) == 1) & unique
+
+    def diagram_params(self, index):
+        """Keyword arguments for diagrams.draw_table showing one variant's menu"""
+        columns = [c for c in range(len(self.categories)) if self.used[index, c]]
+        return {"headers": [self.categories[c][0] for c in columns],
+                "columns": [[self.categories[c][2][k] for k in self.items[c][index, :self.counts[index, c]]]
+                            for c in columns],
+                "title": "Lunch Special Menu"}
+
+    def question(self, index, order=1):
+        """Materialize one variant as a question dict"""
+        columns = [c for c in range(len(self.categories)) if self.used[index, c]]
+        headers = [self.categories[c][0] for c in columns]
+        counts = [int(self.counts[index, c]) for c in columns]
+        menus = [[self.categories[c][2][k] for k in self.items[c][index, :self.counts[index, c]]]
+                 for c in columns]
+
+        choices = ", ".join(f"1 {h.lower()}" for h in headers[:-1]) + f" and 1 {headers[-1].lower()}"
+        table = "| " + " | ".join(headers) + " |\n"
+        table += "| " + " | ".join(":---:" for _ in headers) + " |\n"
+        for row in range(max(counts)):
+            cells = [menu[row] if row < len(menu) else "" for menu in menus]
+            table += "| " + " | ".join(cells) + " |\n"
+
+        answer = int(self.answers[index])
+        product = " × ".join(str(n) for n in counts)
+        factors = " × ".join(f"Number of {self.categories[c][1]}" for c in columns)
+        options = [f"{int(value)} combinations" for value in self.options[index]]
+
+        return {
+            "title": "Math Assessment - Combinatorics and Counting",
+            "description": "This assessment focuses on counting principles and combinatorial problems involving real-world scenarios.",
+            "question": f"A restaurant offers a lunch special where customers can choose {choices}. The menu shows the following options:\n\n## Lunch Special Menu\n{table}\nHow many different lunch combinations are possible?",
+            "instruction": "Use the counting principle to determine the total number of possible combinations.",
+            "difficulty": str(self.difficulty[index]),
+            "order": order,
+            "options": options,
+            "correct_answer": options[int(self.correct_index[index])],
+            "explanation": f"Using the counting principle: {factors} = {product} = {answer} different combinations. Each choice in one category can be paired with every choice in the others, giving us {product} = {answer} total possibilities.",
+            "subject": "Quantitative Math",
+            "unit": "Problem Solving",
+            "topic": "Counting & Arrangement Problems",
+            "plusmarks": 1
+        }
+
+
+class MenuCombinationVariants:
+    """Parameterized family of menu-combination (counting principle) questions"""
+
+    def __init__(self, categories=None, min_categories=2, max_categories=3, min_items=2, max_items=6):
+        self.categories = categories or MENU_CATEGORIES
+        if not 2 <= min_categories <= max_categories <= len(self.categories):
+            raise ValueError("category range must satisfy 2 <= min <= max <= number of categories")
+        sizes = [len(vocabulary) for _, _, vocabulary in self.categories]
+        if min_items < 1 or min_items > min(sizes):
+            raise ValueError("min_items must be between 1 and the smallest vocabulary size")
+        self.min_categories = min_categories
+        self.max_categories = max_categories
+        self.min_items = min_items
+        self.max_items = max_items
+        self.vocab_sizes = np.array(sizes)
+
+    def sample(self, count, seed=None):
+        """Sample and solve `count` variants in one vectorized pass"""
+        rng = np.random.default_rng(seed)
+        n_categories = len(self.categories)
+
+        # Choose which categories appear; columns keep their canonical menu order
+        per_row = rng.integers(self.min_categories, self.max_categories + 1, size=count)
+        ranks = rng.random((count, n_categories)).argsort(axis=1).argsort(axis=1)
+        used = ranks < per_row[:, None]
+
+        upper = np.minimum(self.max_items, self.vocab_sizes) + 1
+        counts = rng.integers(self.min_items, upper, size=(count, n_categories)) * used
+
+        # Random item subsets: the first counts[i, c] entries of a random permutation
+        items = []
+        for c, size in enumerate(self.vocab_sizes):
+            width = min(self.max_items, size)
+            items.append(rng.random((count, size)).argsort(axis=1)[:, :width].astype(np.int16))
+
+        factors = np.where(used, counts, 1)
+        answers = factors.prod(axis=1)
+        params = {"used": used, "counts": counts, "answers": answers}
+        options, correct_index, sources = MENU_DISTRACTORS.build(answers, params, rng)
+
+        difficulty = np.where(per_row >= 3, "hard", "moderate")
+        return MenuVariantBatch(self.categories, used, counts, items, answers, options,
+                                correct_index, difficulty, sources)
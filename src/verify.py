@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Answer Verification
+Recomputes each item's answer from the parameters in its own text, then checks that exactly
+one option matches it and that the marked answer is that option. Parsing is per item;
+solving and comparison run as batched NumPy operations. Variant batches skip parsing
+altogether through their check() methods.
+"""
+
+import argparse
+import re
+import time
+
+import numpy as np
+
+from packing import CENTERED, RING, solve_packing
+
+MENU = "menu"
+PACKING = "packing"
+
+NUMBER_WORDS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
+                "nine": 9, "ten": 10, "eleven": 11, "twelve": 12}
+NUMBER = r"(\d+|" + "|".join(NUMBER_WORDS) + r")"
+
+TABLE_ROW = re.compile(r"^\|(.*)\|\s*$", re.M)
+COMBINATIONS = re.compile(r"^(\d+) combinations$")
+PACKING_TOTAL = re.compile(r"hold " + NUMBER + r" tennis balls?")
+PACKING_LAYERS = re.compile(r"in " + NUMBER + r" layers?")
+PACKING_RADIUS = re.compile(r"radius of (\d+(?:\.\d+)?) centimet")
+PACKING_CENTRED = re.compile(r"cent(?:re|er) ball|in the cent(?:re|er)")
+DIMENSIONS = re.compile(r"^\$(\d+(?:\.\d+)?) \\times (\d+(?:\.\d+)?) \\times (\d+(?:\.\d+)?)\$ cm$")
+
+
+def _number(text):
+    return int(text) if text.isdigit() else NUMBER_WORDS[text]
+
+
+def _half_unit(text):
+    """Half of the last printed digit: a value shown as 17 stands for [16.5, 17.5]"""
+    decimals = len(text.partition(".")[2])
+    return 0.5 * 10.0 ** -decimals
+
+
+def _menu_counts(text):
+    """Items per menu column from the markdown table, or None"""
+    rows = [[cell.strip() for cell in row.split("|")] for row in TABLE_ROW.findall(text)]
+    if len(rows) < 3:
+        return None
+    body = rows[2:]     # skip the header and the :---: alignment row
+    return [sum(1 for row in body if c < len(row) and row[c]) for c in range(len(rows[0]))]
+
+
+class VerificationReport:
+    """Per-item verification results as parallel arrays"""
+
+    def __init__(self, family, recognized, matches, marked, index_ok):
+        self.family = family            # (N,) object, MENU / PACKING / None
+        self.recognized = recognized    # (N,) bool, parameters could be read from the text
+        self.matches = matches          # (N,) int, options agreeing with the recomputed answer
+        self.marked = marked            # (N,) bool, correct_answer is the agreeing option
+        self.index_ok = index_ok        # (N,) bool, correct_index (if present) points at correct_answer
+        self.ok = recognized & (matches == 1) & marked & index_ok
+
+    def __len__(self):
+        return len(self.ok)
+
+    def reason(self, i):
+        """Why item i was rejected, or None if it passed"""
+        if self.ok[i]:
+            return None
+        if not self.recognized[i]:
+            return "parameters not recognized"
+        if self.matches[i] == 0:
+            return "no option matches the recomputed answer"
+        if self.matches[i] > 1:
+            return f"{self.matches[i]} options match the recomputed answer"
+        if not self.marked[i]:
+            return "the marked answer is not the matching option"
+        return "the @@option marker is not on the marked answer"
+
+
+def verify_questions(questions):
+    """Verify question dicts (or Questions) and return a VerificationReport"""
+    n = len(questions)
+    family = np.full(n, None, dtype=object)
+    recognized = np.zeros(n, dtype=bool)
+    matches = np.zeros(n, dtype=np.int64)
+    marked = np.zeros(n, dtype=bool)
+
+    index_ok = np.ones(n, dtype=bool)
+    for i, q in enumerate(questions):
+        index = q.get("correct_index") if isinstance(q, dict) else None
+        if index is not None:
+            index_ok[i] = 0 <= index < len(q["options"]) and q["options"][index] == q["correct_answer"]
+
+    menu_rows, menu_answers, menu_values, menu_marked = [], [], [], []
+    pack_rows, pack_params, pack_values, pack_tolerances, pack_marked = [], [], [], [], []
+    for i, q in enumerate(questions):
+        text = q["question"]
+        if "combinations" in q["correct_answer"]:
+            counts = _menu_counts(text)
+            values = [COMBINATIONS.match(option) for option in q["options"]]
+            if counts and all(values):
+                family[i] = MENU
+                menu_rows.append(i)
+                menu_answers.append(int(np.prod(counts)))
+                menu_values.append([int(v.group(1)) for v in values])
+                menu_marked.append([option == q["correct_answer"] for option in q["options"]])
+        elif "tennis ball" in text:
+            total, layers, radius = (PACKING_TOTAL.search(text), PACKING_LAYERS.search(text),
+                                     PACKING_RADIUS.search(text))
+            values = [DIMENSIONS.match(option) for option in q["options"]]
+            if total and layers and radius and all(values):
+                total, layers = _number(total.group(1)), _number(layers.group(1))
+                if total % layers == 0:
+                    family[i] = PACKING
+                    pack_rows.append(i)
+                    pack_params.append((float(radius.group(1)), total // layers, layers,
+                                        CENTERED if PACKING_CENTRED.search(text) else RING))
+                    pack_values.append([[float(v.group(1)), float(v.group(3))] for v in values])
+                    pack_tolerances.append([[_half_unit(v.group(1)), _half_unit(v.group(3))] for v in values])
+                    pack_marked.append([option == q["correct_answer"] for option in q["options"]])
+
+    # Batched checks per family; options of one family may differ in count, so pad with NaN
+    if menu_rows:
+        rows = np.array(menu_rows)
+        values, is_marked = _pad(menu_values, np.nan), _pad(menu_marked, False)
+        agree = values == np.array(menu_answers, dtype=float)[:, None]
+        recognized[rows] = True
+        matches[rows] = agree.sum(axis=1)
+        marked[rows] = (agree & is_marked).any(axis=1) & (is_marked.sum(axis=1) == 1)
+    if pack_rows:
+        rows = np.array(pack_rows)
+        radius, balls, layers, arrangement = (np.array(column) for column in zip(*pack_params))
+        diameter, height, _ = solve_packing(radius, balls, layers, arrangement)
+        values, tolerances = _pad(pack_values, np.nan), _pad(pack_tolerances, 0.0)
+        is_marked = _pad(pack_marked, False)
+        agree = ((np.abs(values[..., 0] - diameter[:, None]) <= tolerances[..., 0] + 1e-9)
+                 & (np.abs(values[..., 1] - height[:, None]) <= tolerances[..., 1] + 1e-9))
+        recognized[rows] = np.isfinite(diameter)
+        matches[rows] = agree.sum(axis=1)
+        marked[rows] = (agree & is_marked).any(axis=1) & (is_marked.sum(axis=1) == 1)
+    return VerificationReport(family, recognized, matches, marked, index_ok)
+
+
+def _pad(rows, fill):
+    """Ragged nested lists -> array padded along the option axis"""
+    width = max(len(row) for row in rows)
+    first = np.asarray(rows[0])
+    out = np.full((len(rows), width) + first.shape[1:], fill, dtype=np.result_type(first, np.asarray(fill)))
+    for i, row in enumerate(rows):
+        out[i, :len(row)] = row
+    return out
+
+
+def accept_verified(questions, log=print):
+    """Return the questions that pass verification, logging each rejected one"""
+    questions = list(questions)
+    report = verify_questions(questions)
+    for i in np.flatnonzero(~report.ok):
+        log(f"Rejected question {questions[i]['order']} ({questions[i]['topic']}): {report.reason(i)}")
+    return [q for q, ok in zip(questions, report.ok) if ok]
+
+
+def verify_batch(batch):
+    """Bool mask of a variant batch's items that pass, straight from its arrays"""
+    return batch.check()
+
+
+def main():
+    """Time batch checks and text-based verification on generated variants"""
+    from packing import PackingVariants
+    from variants import MenuCombinationVariants
+
+    parser = argparse.ArgumentParser(description="Benchmark answer verification")
+    parser.add_argument("--batch-size", type=int, default=1_000_000)
+    parser.add_argument("--dict-count", type=int, default=100_000)
+    args = parser.parse_args()
+
+    for name, family in [("menu", MenuCombinationVariants()), ("packing", PackingVariants())]:
+        batch = family.sample(args.batch_size, seed=1)
+        started = time.perf_counter()
+        ok = verify_batch(batch)
+        elapsed = time.perf_counter() - started
+        print(f"{name:>8} batch check: {len(batch) / elapsed:12,.0f} items/s, {int(ok.sum())}/{len(batch)} pass")
+
+        questions = family.sample(args.dict_count, seed=2).to_questions()
+        started = time.perf_counter()
+        report = verify_questions(questions)
+        elapsed = time.perf_counter() - started
+        print(f"{name:>8} from text:   {len(questions) / elapsed:12,.0f} items/s, "
+              f"{int(report.ok.sum())}/{len(questions)} pass")
+
+
+if __name__ == "__main__":
+    main()